@@ -0,0 +1,254 @@
+"""
+Sync of share codes and durations from the Audiobookshelf database.
+
+Audiobookshelf keeps its library in ``ABS_DB_PATH`` (``absdatabase.sqlite``).
+``AbsSync`` opens it read-only (``mode=ro``; ``immutable=1`` unless
+``ABS_DB_IMMUTABLE=0``, so it takes no locks on a database it does not own)
+and matches ABS library items to ``Title`` rows:
+
+* by path: ``libraryItems.relPath`` == ``Title.library_path``, as set by
+  ``app.library_indexer`` (both are relative to the library folder);
+* otherwise by normalized title + authors (``Title.search_text``), only when
+  the match is unique on both sides.
+
+A matched title gets ``abs_share_code`` (the slug of the newest unexpired
+share of the book, else the library item id), all in one batched
+transaction.  ``duration_sec`` is only filled when it is 0 or NULL: the
+exact duration comes from ``app.seek_index``.  A pass only reads the items whose
+``updatedAt`` (item, book or share) or share ``expiresAt`` (once past) is
+newer than the ``abs_sync`` watermark, plus the items of titles that still
+have no share code; an expired slug is thus replaced on the next pass.
+
+With ``immutable=1`` SQLite ignores the ``-wal`` file: changes show up once
+ABS checkpoints them, on a later pass.
+
+Run it by hand with ``python -m app.abs_sync [--full]`` or set
+``ABS_SYNC_INTERVAL_SEC`` to sync from the ``lifespan`` hook.
+"""
+
+import argparse
+import asyncio
+import logging
+import math
+import os
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+from sqlalchemy import and_, bindparam, case, insert, or_, select, update
+from sqlalchemy.engine import Connection, Engine
+
+from app import chapters, title_search
+from app.db import engine, init_db
+from app.models import AggregateWatermark, Title
+from app.models.title import normalize_search_text
+
+logger = logging.getLogger(__name__)
+
+ABS_DB_PATH = Path(os.getenv(
+    "ABS_DB_PATH", Path(__file__).resolve().parents[2] / "audiobookshelf" / "config" / "absdatabase.sqlite"))
+ABS_DB_IMMUTABLE = os.getenv("ABS_DB_IMMUTABLE", "1") != "0"
+SYNC_INTERVAL_SEC = float(os.getenv("ABS_SYNC_INTERVAL_SEC", 0))  # 0 = només per CLI
+WATERMARK = "abs_sync"
+SQL_CHUNK = 500
+
+_EPOCH = datetime(1970, 1, 1)
+
+# Canvi més recent de l'item, del llibre o de les seves comparticions; la caducitat
+# d'una compartició també compta, perquè caducar no toca cap updatedAt
+_ITEMS = """
+SELECT li.id, li.relPath, li.title, li.authorNamesFirstLast, b.duration,
+       (SELECT s.slug FROM mediaItemShares s
+         WHERE s.mediaItemId = b.id AND s.mediaItemType = 'book'
+           AND (s.expiresAt IS NULL OR s.expiresAt > :now)
+         ORDER BY s.createdAt DESC LIMIT 1) AS slug,
+       MAX(li.updatedAt, b.updatedAt,
+           COALESCE((SELECT MAX(s.updatedAt) FROM mediaItemShares s WHERE s.mediaItemId = b.id), ''),
+           COALESCE((SELECT MAX(s.expiresAt) FROM mediaItemShares s
+                      WHERE s.mediaItemId = b.id AND s.expiresAt <= :now), '')) AS updated
+  FROM libraryItems li JOIN books b ON b.id = li.mediaId
+ WHERE li.mediaType = 'book' AND NOT li.isMissing AND NOT li.isInvalid
+"""
+
+
+@dataclass
+class SyncResult:
+    read: int = 0
+    matched: int = 0
+    updated: int = 0
+
+
+def _abs_time(value: datetime) -> str:
+    """Naive UTC -> ABS ``DATETIME`` text (``2024-12-08 22:21:36.633 +00:00``)."""
+    return f"{value:%Y-%m-%d %H:%M:%S.%f}"[:-3] + " +00:00"
+
+
+def _parse_abs_time(value: str) -> datetime:
+    return datetime.strptime(value, "%Y-%m-%d %H:%M:%S.%f %z").astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def open_abs_db(path: Path, immutable: bool = ABS_DB_IMMUTABLE) -> sqlite3.Connection:
+    """Read-only connection to the Audiobookshelf database."""
+    if not Path(path).is_file():
+        raise FileNotFoundError(f"Audiobookshelf database not found: {path}")
+    uri = f"{Path(path).resolve().as_uri()}?mode=ro{'&immutable=1' if immutable else ''}"
+    conn = sqlite3.connect(uri, uri=True)
+    # Els triggers d'ABS fan servir GROUP_CONCAT(... ORDER BY), que un SQLite < 3.44
+    # no sap llegir; així s'ignoren en carregar l'esquema (la connexió és de només lectura)
+    conn.execute("PRAGMA writable_schema = ON")
+    return conn
+
+
+def _chunks(items: list, size: int = SQL_CHUNK):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class AbsSync:
+    def __init__(self, bind: Engine, db_path: Path = ABS_DB_PATH, interval: float = SYNC_INTERVAL_SEC):
+        self.bind = bind
+        self.db_path = Path(db_path)
+        self.interval = interval
+
+    def _watermark(self, conn: Connection) -> datetime:
+        value = conn.execute(
+            select(AggregateWatermark.updated_at).where(AggregateWatermark.name == WATERMARK)
+        ).scalar()
+        return value or _EPOCH
+
+    def _set_watermark(self, conn: Connection, value: datetime) -> None:
+        updated = conn.execute(
+            AggregateWatermark.__table__.update()
+            .where(AggregateWatermark.name == WATERMARK)
+            .values(updated_at=value)
+        ).rowcount
+        if not updated:
+            conn.execute(insert(AggregateWatermark).values(name=WATERMARK, updated_at=value))
+
+    def _read_items(self, since: datetime, pending: list[str], now: datetime) -> list[sqlite3.Row]:
+        now = _abs_time(now.astimezone(timezone.utc).replace(tzinfo=None))
+        abs_db = open_abs_db(self.db_path)
+        try:
+            abs_db.row_factory = sqlite3.Row
+            items = {row["id"]: row for row in abs_db.execute(
+                f"SELECT * FROM ({_ITEMS}) WHERE updated > :since", {"now": now, "since": _abs_time(since)})}
+            # Títols encara sense codi: es reprova el seu item encara que no hagi canviat
+            for chunk in _chunks(pending):
+                params = {f"p{i}": path for i, path in enumerate(chunk)}
+                marks = ", ".join(f":{name}" for name in params)
+                items.update((row["id"], row) for row in abs_db.execute(
+                    f"{_ITEMS} AND li.relPath IN ({marks})", {"now": now, **params}))
+        finally:
+            abs_db.close()
+        return list(items.values())
+
+    def _match(self, items: list[sqlite3.Row], titles: list) -> list[tuple]:
+        """``(title row, item)`` pairs: by path first, then by unique title + authors."""
+        by_path = {t.library_path: t for t in titles if t.library_path}
+        by_text: dict[str, list] = {}
+        for t in titles:
+            by_text.setdefault(t.search_text, []).append(t)
+        texts = [normalize_search_text(f"{item['title'] or ''} {item['authorNamesFirstLast'] or ''}")
+                 for item in items]
+        item_texts: dict[str, int] = {}
+        for text in texts:
+            item_texts[text] = item_texts.get(text, 0) + 1
+
+        pairs, used = [], set()
+        for item, text in zip(items, texts):
+            title = by_path.get(item["relPath"])
+            if title is None:
+                candidates = by_text.get(text, [])
+                if len(candidates) != 1 or item_texts[text] != 1:
+                    continue
+                title = candidates[0]
+            if title.id not in used:
+                used.add(title.id)
+                pairs.append((title, item))
+        return pairs
+
+    def sync(self, full: bool = False, now: datetime | None = None) -> SyncResult:
+        """Copy share codes and durations of changed ABS items; ``full`` ignores the watermark."""
+        now = now or datetime.now(timezone.utc)
+        with self.bind.connect() as conn:
+            since = _EPOCH if full else self._watermark(conn)
+            titles = conn.execute(
+                select(Title.id, Title.library_path, Title.search_text, Title.abs_share_code, Title.duration_sec)
+            ).all()
+        pending = [t.library_path for t in titles if t.library_path and not t.abs_share_code]
+        items = self._read_items(since, pending, now)
+        result = SyncResult(read=len(items))
+        if not items:
+            return result
+
+        pairs = self._match(items, titles)
+        result.matched = len(pairs)
+        changes = []
+        for title, item in pairs:
+            code = item["slug"] or item["id"]
+            duration = title.duration_sec
+            if not duration and item["duration"]:
+                duration = math.ceil(item["duration"])
+            if (code, duration) != (title.abs_share_code, title.duration_sec):
+                changes.append({"tid": title.id, "code": code, "duration": duration})
+        newest = max(_parse_abs_time(item["updated"]) for item in items)
+
+        table = Title.__table__
+        with self.bind.begin() as conn:
+            if changes:
+                # Un codi que passa d'un títol a un altre: allibera'l abans (és únic)
+                for chunk in _chunks(changes):
+                    conn.execute(
+                        update(table)
+                        .where(and_(table.c.abs_share_code.in_([c["code"] for c in chunk]),
+                                    table.c.id.not_in([c["tid"] for c in chunk])))
+                        .values(abs_share_code=None)
+                    )
+                # La durada només omple un buit: la del seek index és l'exacta
+                empty = or_(table.c.duration_sec.is_(None), table.c.duration_sec == 0)
+                conn.execute(
+                    update(table)
+                    .where(table.c.id == bindparam("tid"))
+                    .values(abs_share_code=bindparam("code"),
+                            duration_sec=case((empty, bindparam("duration")), else_=table.c.duration_sec)),
+                    changes,
+                )
+            self._set_watermark(conn, max(newest, since))
+        result.updated = len(changes)
+        if changes:
+            title_search.invalidate()
+            chapters.invalidate()
+        return result
+
+    async def run(self) -> None:
+        """Sync periodically until cancelled (disabled if interval is 0)."""
+        if self.interval <= 0:
+            return
+        while True:
+            try:
+                result = await asyncio.to_thread(self.sync)
+                if result.updated:
+                    logger.info("Audiobookshelf synced: %s", result)
+            except Exception:
+                logger.exception("Audiobookshelf sync failed; will retry")
+            await asyncio.sleep(self.interval)
+
+
+abs_sync = AbsSync(engine)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy share codes and durations from Audiobookshelf.")
+    parser.add_argument("--db", type=Path, default=ABS_DB_PATH)
+    parser.add_argument("--full", action="store_true", help="re-read every item, ignoring the watermark")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    result = AbsSync(engine, db_path=args.db).sync(full=args.full)
+    print(f"{result.read} items read, {result.matched} matched, {result.updated} titles updated")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 from . import v1
 from . import admin
+from . import metrics
 
-__all__ = ["v1", "admin"]
+__all__ = ["v1", "admin", "metrics"]
@@ -1,12 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel import Session, select, func, tuple_
+from datetime import datetime
 from app.models import Title, User, Card, Store, Batch
+from app.models.card_event import EVENT_RETAIL_STATE
 from app.db import get_session
-from app.auth import get_current_config_superuser
+from app.auth import get_current_config_superuser, invalidate_cached_user
+from app import card_export, dashboard, title_search
+from app.card_events import card_event_insert
+from app.card_minting import MAX_BATCH_QTY, mint_cards
+from app.pagination import decode_cursor, encode_cursor
+from app.schemas import CardBatchSummary, CardPage
 from uuid import uuid4, UUID
 from fastapi.responses import StreamingResponse
-import io
-import csv
 
 router = APIRouter(
     tags=["Admin"],
@@ -26,15 +31,22 @@ def create_title(title: Title, db: Session = Depends(get_session)):
     db.add(title)
     db.commit()
     db.refresh(title)
+    title_search.invalidate()
     return title
 
 @router.get("/titles", response_model=list[Title])
-def read_titles(search: str = "", active: bool = True, db: Session = Depends(get_session)):
-    query = select(Title).where(Title.active == active)
-    if search:
-        query = query.where(Title.title.contains(search))
-    titles = db.exec(query).all()
-    return titles
+def read_titles(
+    search: str = "",
+    active: bool = True,
+    limit: int = Query(None, gt=0, le=500),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_session),
+):
+    """List titles, or rank them against ``search`` (title and author,
+    accent-insensitive, word prefixes).  Searches return at most 50 results
+    per page unless ``limit`` says otherwise.
+    """
+    return title_search.search_titles(db, search, active=active, limit=limit, offset=offset)
 
 @router.get("/titles/{title_id}", response_model=Title)
 def read_title(title_id: int, db: Session = Depends(get_session)):
@@ -54,42 +66,101 @@ def update_title(title_id: int, title: Title, db: Session = Depends(get_session)
     db.add(db_title)
     db.commit()
     db.refresh(db_title)
+    title_search.invalidate()
     return db_title
 
-@router.post("/titles/{title_id}/cards/batch", response_model=list[Card])
-def create_cards_batch(title_id: int, qty: int, db: Session = Depends(get_session)):
+@router.post("/titles/{title_id}/cards/batch", response_model=CardBatchSummary)
+def create_cards_batch(
+    title_id: int,
+    qty: int = Query(gt=0, le=MAX_BATCH_QTY),
+    printer_vendor: str = None,
+    notes: str = None,
+    stream: bool = False,
+    db: Session = Depends(get_session),
+):
     title = db.get(Title, title_id)
     if not title:
         raise HTTPException(status_code=404, detail="Title not found")
 
-    cards = []
-    for _ in range(qty):
-        qr = f"QR-{uuid4()}"
-        card = Card(qr=qr, title_id=title_id)
-        db.add(card)
-        cards.append(card)
-
-    db.commit()
-    for card in cards:
-        db.refresh(card)
-    return cards
-
-@router.get("/cards", response_model=list[Card])
-def read_cards(title: int = None, store: int = None, user_state: int = None, retail_state: str = None, q: str = None, db: Session = Depends(get_session)):
-    query = select(Card)
-    if title:
-        query = query.where(Card.title_id == title)
-    if store:
-        query = query.where(Card.store_id == store)
-    if user_state:
-        query = query.where(Card.user_state == user_state)
+    batch, codes = mint_cards(db, title_id, qty, printer_vendor=printer_vendor, notes=notes)
+
+    if stream:
+        def iter_codes():
+            yield "qr\n"
+            for start in range(0, len(codes), 1000):
+                yield "\n".join(codes[start:start + 1000]) + "\n"
+        return StreamingResponse(iter_codes(), media_type="text/csv", headers={"Content-Disposition": f"attachment; filename=cards_batch_{batch.id}.csv"})
+
+    return CardBatchSummary(
+        batch_id=batch.id,
+        title_id=title_id,
+        qty=len(codes),
+        first_qr=codes[0],
+        last_qr=codes[-1],
+        export_url=f"/api/v1/admin/titles/{title_id}/cards/export.csv?batch={batch.id}",
+    )
+
+CARDS_PAGE_MAX = 1000
+
+@router.get("/cards", response_model=CardPage)
+def read_cards(
+    title: int = None,
+    store: int = None,
+    user_state: int = None,
+    retail_state: str = None,
+    q: str = None,
+    order: str = Query("qr", pattern="^(qr|updated_at)$"),
+    cursor: str = None,
+    limit: int = Query(100, gt=0, le=CARDS_PAGE_MAX),
+    with_total: bool = False,
+    db: Session = Depends(get_session),
+):
+    """Keyset-paginated card listing.
+
+    ``order=qr`` pages by QR ascending; ``order=updated_at`` pages by most
+    recently updated first (ties broken by QR).  Pass ``next_cursor`` back as
+    ``cursor`` to get the following page.
+    """
+    filters = []
+    if title is not None:
+        filters.append(Card.title_id == title)
+    if store is not None:
+        filters.append(Card.store_id == store)
+    if user_state is not None:
+        filters.append(Card.user_state == user_state)
     if retail_state:
-        query = query.where(Card.retail_state == retail_state)
+        filters.append(Card.retail_state == retail_state)
     if q:
-        query = query.where(Card.qr.contains(q))
-
-    cards = db.exec(query).all()
-    return cards
+        filters.append(Card.qr.contains(q))
+
+    query = select(Card).where(*filters)
+    if order == "qr":
+        if cursor:
+            (last_qr,) = decode_cursor(cursor, 1)
+            query = query.where(Card.qr > last_qr)
+        query = query.order_by(Card.qr)
+    else:
+        if cursor:
+            last_updated, last_qr = decode_cursor(cursor, 2)
+            try:
+                last_updated = datetime.fromisoformat(last_updated)
+            except (TypeError, ValueError):
+                raise HTTPException(status_code=400, detail="INVALID_CURSOR")
+            query = query.where(tuple_(Card.updated_at, Card.qr) < tuple_(last_updated, last_qr))
+        query = query.order_by(Card.updated_at.desc(), Card.qr.desc())
+
+    cards = db.exec(query.limit(limit + 1)).all()
+    next_cursor = None
+    if len(cards) > limit:
+        cards = cards[:limit]
+        last = cards[-1]
+        next_cursor = encode_cursor(last.qr) if order == "qr" else encode_cursor(last.updated_at, last.qr)
+
+    total = None
+    if with_total:
+        total = db.exec(select(func.count()).select_from(Card).where(*filters)).one()
+
+    return CardPage(items=cards, next_cursor=next_cursor, total=total)
 
 @router.put("/cards/{qr}", response_model=Card)
 def update_card(qr: str, card: Card, db: Session = Depends(get_session)):
@@ -98,10 +169,14 @@ def update_card(qr: str, card: Card, db: Session = Depends(get_session)):
         raise HTTPException(status_code=404, detail="Card not found")
 
     card_data = card.dict(exclude_unset=True)
+    previous_retail_state = db_card.retail_state
     for key, value in card_data.items():
         setattr(db_card, key, value)
 
     db.add(db_card)
+    if db_card.retail_state != previous_retail_state:
+        db.exec(card_event_insert(EVENT_RETAIL_STATE, qr, db_card.title_id,
+                                  detail=db_card.retail_state))
     db.commit()
     db.refresh(db_card)
     return db_card
@@ -154,6 +229,12 @@ def read_batches(db: Session = Depends(get_session)):
     batches = db.exec(select(Batch)).all()
     return batches
 
+@router.get("/analytics")
+def read_analytics(days: int = Query(30, gt=0, le=366), db: Session = Depends(get_session)):
+    """Dashboard figures per title and store, from precomputed aggregates
+    (refreshed in the background; see ``app/dashboard.py``)."""
+    return dashboard.read_analytics(db, days)
+
 @router.get("/users", response_model=list[User])
 def read_users(db: Session = Depends(get_session)):
     print("DEBUG: Entering read_users endpoint")
@@ -171,32 +252,31 @@ def make_admin(user_id, db: Session = Depends(get_session)):
     db.add(user)
     db.commit()
     db.refresh(user)
+    invalidate_cached_user(user.id)
     return user
 
+@router.get("/titles/{title_id}/cards/export")
+def export_cards(title_id: int, batch: int = None, format: str = "csv", gzip: bool = False):
+    if format not in card_export.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+    if format == "parquet":
+        if gzip:
+            raise HTTPException(status_code=400, detail="Parquet exports are already compressed")
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=501, detail="Parquet export requires pyarrow")
+
+    media_type, extension = card_export.FORMATS[format]
+    filename = f"cards_export_{title_id}.{extension}"
+    if gzip:
+        media_type, filename = "application/gzip", filename + ".gz"
+    return StreamingResponse(
+        card_export.export_cards(title_id, batch, format, gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
 @router.get("/titles/{title_id}/cards/export.csv")
-def export_cards_csv(title_id: int, batch: int = None, db: Session = Depends(get_session)):
-    query = select(Card).where(Card.title_id == title_id)
-    if batch:
-        query = query.where(Card.batch_id == batch)
-
-    cards = db.exec(query).all()
-
-    output = io.StringIO()
-    writer = csv.writer(output)
-
-    writer.writerow(["qr", "title", "abs_share_code", "store", "retail_state", "notes"])
-
-    for card in cards:
-        title = db.get(Title, card.title_id)
-        store = db.get(Store, card.store_id) if card.store_id else None
-        writer.writerow([
-            card.qr,
-            title.title if title else "",
-            title.abs_share_code if title else "",
-            store.name if store else "",
-            card.retail_state,
-            card.notes
-        ])
-
-    output.seek(0)
-    return StreamingResponse(output, media_type="text/csv", headers={"Content-Disposition": f"attachment; filename=cards_export_{title_id}.csv"})
+def export_cards_csv(title_id: int, batch: int = None, gzip: bool = False):
+    return export_cards(title_id, batch=batch, format="csv", gzip=gzip)
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Header, HTTPException, Response
+from fastapi.responses import FileResponse
+
+from app.covers import CACHE_CONTROL, COVERS_DIR, NAME
+from app.etags import if_none_match
+
+router = APIRouter(tags=["Covers"])
+
+@router.get("/covers/{name}")
+def get_cover(name: str, if_none_match_header: str | None = Header(None, alias="If-None-Match")):
+    """Cover thumbnail by content-addressed name (see ``app/covers.py``)."""
+    if not NAME.match(name):
+        raise HTTPException(status_code=404, detail="Cover not found")
+    # El nom depèn del contingut: serveix d'ETag fort i no caduca mai
+    headers = {"ETag": f'"{name}"', "Cache-Control": CACHE_CONTROL}
+    if if_none_match(if_none_match_header, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    path = COVERS_DIR / name
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail="Cover not found")
+    return FileResponse(path, headers=headers)
@@ -0,0 +1,26 @@
+import hmac
+import os
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from app.metrics import render_latest
+
+router = APIRouter(tags=["Metrics"])
+
+# Si és buit, /metrics és públic (només per a desenvolupament local)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+
+def require_metrics_token(authorization: str | None = Header(None)):
+    if not METRICS_TOKEN:
+        return
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), METRICS_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token",
+                            headers={"WWW-Authenticate": "Bearer"})
+
+
+@router.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(require_metrics_token)])
+def metrics():
+    """Prometheus scrape endpoint (``Authorization: Bearer $METRICS_TOKEN``)."""
+    return PlainTextResponse(render_latest(), media_type="text/plain; version=0.0.4")
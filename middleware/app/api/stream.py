@@ -0,0 +1,98 @@
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response
+from sqlmodel import select
+from starlette.concurrency import run_in_threadpool
+
+from app.cache import TTLCache
+from app.db import async_session_scope
+from app.etags import if_none_match
+from app.models import Card, Title
+from app.streaming import RangeFileResponse, audio_tracks, file_handles, parse_range
+from app.url_signer import url_signer
+
+router = APIRouter(tags=["Streaming"])
+
+# qr -> (owner, borrower, library_path): evita la BD en cada petició de rang
+_card_cache = TTLCache(maxsize=10000, ttl=30)
+
+
+async def _card_access(qr: str):
+    access = _card_cache.get(qr)
+    if access is None:
+        # Sessió només en cas de fallada de la memòria cau, i tancada abans de servir
+        # el fitxer: un stream llarg no ha d'ocupar una connexió del pool
+        async with async_session_scope() as db:
+            row = (await db.exec(
+                select(Card.owner_user_id, Card.borrower_user_id, Title.library_path)
+                .join(Title, Title.id == Card.title_id)
+                .where(Card.qr == qr)
+            )).first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="QR_NOT_FOUND")
+        access = (str(row[0]) if row[0] else None, str(row[1]) if row[1] else None, row[2])
+        _card_cache.set(qr, access)
+    return access
+
+
+def _open_track(library_path: str | None, track: int):
+    """Acquire the ``track``-th file of the folder, or ``None`` (blocking: listing, open, fstat)."""
+    tracks = audio_tracks(library_path) if library_path else ()
+    if track >= len(tracks):
+        return None
+    try:
+        return file_handles.acquire(tracks[track])
+    except FileNotFoundError:
+        return None
+
+
+@router.api_route("/stream/{qr}", methods=["GET", "HEAD"])
+async def stream(
+    qr: str,
+    request: Request,
+    track: int = Query(0, ge=0),
+    range_header: str | None = Header(None, alias="Range"),
+    if_range: str | None = Header(None, alias="If-Range"),
+    if_none_match_header: str | None = Header(None, alias="If-None-Match"),
+):
+    """Serve one audio file of the card's title to the holder of a signed URL.
+
+    ``uid``, ``exp``, ``kid`` and ``sig`` are the query parameters added by
+    play-auth; ``track`` picks the file (in name order) for multi-file books.
+    Supports single byte ranges (``206``) and conditional requests.
+    """
+    params = request.query_params
+    if not url_signer.verify_query(qr, params):
+        raise HTTPException(status_code=403, detail="INVALID_SIGNATURE")
+
+    owner, borrower, library_path = await _card_access(qr)
+    if params["uid"] not in (owner, borrower):
+        raise HTTPException(status_code=403, detail="NOT_ALLOWED_TO_PLAY")
+
+    # Fora del bucle d'esdeveniments: llistar la carpeta i obrir el fitxer són crides bloquejants
+    entry = await run_in_threadpool(_open_track, library_path, track)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="TRACK_NOT_FOUND")
+
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": entry.etag,
+        "Last-Modified": entry.last_modified,
+        "Cache-Control": "private, max-age=3600",
+    }
+    if if_none_match(if_none_match_header, entry.etag):
+        file_handles.release(entry)
+        return Response(status_code=304, headers=headers)
+
+    size = entry.size
+    if if_range and if_range not in (entry.etag, entry.last_modified):
+        range_header = None
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        file_handles.release(entry)
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    if byte_range is None:
+        return RangeFileResponse(entry, file_handles, 0, size - 1, headers=headers)
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return RangeFileResponse(entry, file_handles, start, end, status_code=206, headers=headers)
@@ -1,29 +1,33 @@
-import json
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
-from app.auth import create_access_token, verify_password, get_current_config_superuser
+from app.auth import create_access_token, get_current_config_superuser
+from app.passwords import password_hasher
 from app.schemas import Token
+from app.superuser import login_throttle, superuser_config
 
 router = APIRouter()
 
-SUPERUSER_CONFIG_PATH = "superuser.json"
-
 @router.post("/login", response_model=Token, tags=["Superuser"])
-def su_login(form_data: OAuth2PasswordRequestForm = Depends()):
-    try:
-        with open(SUPERUSER_CONFIG_PATH, "r") as f:
-            superuser_data = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
+async def su_login(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
+    credentials = superuser_config.get()
+    if credentials is None:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Superuser is not configured correctly.",
         )
 
-    email = superuser_data.get("email")
-    password_hash = superuser_data.get("password_hash")
+    # L'intent es gasta abans del bcrypt; un login correcte el retorna
+    client = request.client.host if request.client else "unknown"
+    retry_after = login_throttle.acquire(client)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many failed login attempts",
+            headers={"Retry-After": str(retry_after)},
+        )
 
-    is_valid_user = form_data.username == email
-    is_valid_password = verify_password(form_data.password, password_hash)
+    is_valid_user = credentials.matches_email(form_data.username)
+    is_valid_password = await password_hasher.verify(form_data.password, credentials.password_hash)
 
     if not is_valid_user or not is_valid_password:
         raise HTTPException(
@@ -31,9 +35,10 @@ def su_login(form_data: OAuth2PasswordRequestForm = Depends()):
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    login_throttle.success(client)
 
     # The 'sub' can be the superuser's email. Add a specific scope for protection.
-    token = create_access_token({"sub": email, "scope": "superuser"})
+    token = create_access_token({"sub": credentials.email, "scope": "superuser"})
     return {"access_token": token, "token_type": "bearer"}
 
 @router.get("/ping", tags=["Superuser"])
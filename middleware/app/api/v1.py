@@ -1,177 +1,193 @@
-from fastapi import APIRouter, Depends, HTTPException, Body, Query
+from fastapi import APIRouter, Depends, HTTPException, Body, Header, Query, Response
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import and_, or_, update
+from sqlalchemy.orm import aliased
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from datetime import datetime, timedelta, timezone
-import hmac, hashlib, base64, os
 from uuid import uuid4
-from pydantic import BaseModel
-from app.models import ListeningProgress, Claim, PlaySession, User, Card
-from app.auth import create_access_token, get_current_user, verify_password, get_password_hash
-from app.db import get_session, get_user_by_email, hash_password
+from pydantic import BaseModel, Field
+from app.models import ListeningProgress, Claim, PlaySession, User, Card, Title
+from app.models.card_event import EVENT_CLAIM, EVENT_LEND, EVENT_PLAY_AUTH, EVENT_RETURN
+from app.auth import (
+    Principal, create_access_token, get_current_principal, get_current_user,
+    invalidate_cached_user,
+)
+from app.card_events import card_event_insert
+from app.chapters import get_chapter_indexes
+from app.db import get_async_session, get_user_by_email_async
+from app.etags import if_none_match, make_etag
+from app.pagination import decode_cursor, encode_cursor
+from app.passwords import password_hasher
+from app.progress_buffer import progress_buffer
+from app.seek_index import load_index
+from app.session_store import session_store
+from app.url_signer import ABS_HOST, TTL_HOURS, url_signer
+from app.translations import MAX_AGE_SEC as TRANSLATIONS_MAX_AGE_SEC, translations
 from app.schemas import PlayAuthResponse, UserCreate, User as UserSchema, Token, UserUpdate
 
 
 router = APIRouter()
 
-ABS_HOST = os.getenv("ABS_HOST", "localhost:13378")
-TTL_HOURS = int(os.getenv("URL_TTL_HOURS", 4))
-SECRET_KEY = os.getenv("SECRET_KEY", "change-me")
 
-
-def _generate_signed_url(qr: str, user_id: str) -> str:
-    """Generate a signed playback URL for Audiobookshelf.
-
-    The signature is an HMAC‐SHA256 digest over the QR code, the user id and
-    an expiry timestamp.  The resulting digest is base64url encoded without
-    padding.  The URL includes the QR, the user id (``uid``) and the expiry
-    (``exp``) as query parameters along with the signature.
-
-    Args:
-        qr: the QR identifier for the book being requested.
-        user_id: the UUID of the authenticated user as a string.
-
-    Returns:
-        A fully qualified URL pointing at the Audiobookshelf host with
-        signed query parameters.
-    """
-    # Compute an expiry timestamp TTL_HOURS into the future.  We use UTC to
-    # avoid timezone issues.  Cast to int to avoid floating point in the URL.
-    expiry_dt = datetime.utcnow() + timedelta(hours=TTL_HOURS)
-    expiry_ts = int(expiry_dt.timestamp())
-
-    # Construct the message to sign.  Including the QR and user id binds the
-    # signature to both the resource and the requester.
-    message = f"{qr}:{user_id}:{expiry_ts}".encode()
-    secret = SECRET_KEY.encode()
-
-    # Create the HMAC digest and encode using URL‑safe base64 (no padding).
-    digest = hmac.new(secret, message, hashlib.sha256).digest()
-    signature = base64.urlsafe_b64encode(digest).decode().rstrip("=")
-
-    # Build the URL.  We default to HTTP if no scheme is present.  A real
-    # deployment should use HTTPS.
-    host = ABS_HOST
-    if not host.startswith("http://") and not host.startswith("https://"):
-        host = f"http://{host}"
-    return f"{host}/stream/{qr}?uid={user_id}&exp={expiry_ts}&sig={signature}"
+async def _get_start_position(db: AsyncSession, user_id, qr: str) -> float:
+    """Return the last known position, preferring heartbeats not yet flushed."""
+    buffered = progress_buffer.get(user_id, qr)
+    if buffered is not None:
+        return buffered
+    progress = (await db.exec(
+        select(ListeningProgress)
+        .where(ListeningProgress.user_id == user_id, ListeningProgress.qr == qr)
+    )).first()
+    return progress.position if progress else 0.0
 
 @router.get("/ping")
 def ping():
     return {"pong": True}
 
 @router.post("/login", response_model=Token)
-def login(
+async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_async_session),
 ):
-    user = get_user_by_email(form_data.username, db)
+    user = await get_user_by_email_async(form_data.username, db)
     print("🧪 login intent:", user)
-    if not user or not verify_password(form_data.password, user.password_hash):
+    valid, new_hash = (
+        await password_hasher.verify_and_update(form_data.password, user.password_hash)
+        if user else (False, None)
+    )
+    if not valid:
         raise HTTPException(status_code=400, detail="Credencials incorrectes")
-    token = create_access_token({"sub": str(user.id)})
+    if new_hash:
+        # Hash amb paràmetres antics: es refà de manera transparent
+        user.password_hash = new_hash
+        db.add(user)
+        await db.commit()
+        invalidate_cached_user(user.id)
+    token = create_access_token({"sub": str(user.id), "email": user.email, "is_admin": user.is_admin})
     return {"access_token": token, "token_type": "bearer"}
 
 @router.post("/register", response_model=UserSchema)
-def register(user: UserCreate, db: Session = Depends(get_session)):
-    existing = db.exec(select(User).where(User.email == user.email)).first()
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_session)):
+    existing = await get_user_by_email_async(user.email, db)
     if existing:
         raise HTTPException(status_code=400, detail="Ja existeix un usuari amb aquest correu")
 
     user_db = User(
         id=uuid4(),
         email=user.email,
-        password_hash=hash_password(user.password),
+        password_hash=await password_hasher.hash(user.password),
         name=user.name,
         location=user.location
     )
     db.add(user_db)
-    db.commit()
-    db.refresh(user_db)
+    await db.commit()
+    await db.refresh(user_db)
     return user_db
 
 @router.get("/users/me", response_model=UserSchema)
-def read_users_me(current_user: User = Depends(get_current_user)):
+async def read_users_me(current_user: User = Depends(get_current_user)):
     return current_user
 
 @router.put("/users/me", response_model=UserSchema)
-def update_user_me(
+async def update_user_me(
     user_update: UserUpdate,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(get_current_user),
 ):
+    # current_user pot venir de la cache: es modifica la fila de la sessió
+    db_user = await db.get(User, current_user.id)
     if user_update.password:
         if user_update.password != user_update.password_confirm:
             raise HTTPException(status_code=400, detail="Les contrasenyes no coincideixen")
-        current_user.password_hash = hash_password(user_update.password)
+        db_user.password_hash = await password_hasher.hash(user_update.password)
 
     if user_update.name:
-        current_user.name = user_update.name
+        db_user.name = user_update.name
 
     if user_update.location:
-        current_user.location = user_update.location
-
-    db.add(current_user)
-    db.commit()
-    db.refresh(current_user)
-    return current_user
+        db_user.location = user_update.location
+
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    invalidate_cached_user(db_user.id)
+    return db_user
+
+async def _transition(db: AsyncSession, qr: str, conditions: list, event_kind: int,
+                      user_id, peer_user_id=None, **values):
+    """Apply a card state change atomically, or return ``None``.
+
+    A single ``UPDATE card SET … WHERE qr = ? AND <conditions> RETURNING …``:
+    of several concurrent requests for the same QR exactly one matches the
+    expected state, without locks or a prior SELECT.  The matching
+    ``CardEvent`` is appended in the same transaction.
+    """
+    row = (await db.exec(
+        update(Card)
+        .where(Card.qr == qr, *conditions)
+        .values(**values)
+        .returning(Card.qr, Card.user_state, Card.title_id)
+        .execution_options(synchronize_session=False)
+    )).first()
+    if row is not None:
+        await db.exec(card_event_insert(event_kind, qr, row.title_id, user_id, peer_user_id))
+    await db.commit()
+    return row
+
+async def _raise_transition_error(db: AsyncSession, qr: str, user_id, state: int,
+                                  detail: str, owner_only: bool = True, always: bool = True):
+    """Failure path only: raise the error the old read-then-check code raised."""
+    card = await db.get(Card, qr)
+    if not card:
+        raise HTTPException(status_code=404, detail="QR_NOT_FOUND")
+    if owner_only and card.owner_user_id != user_id:
+        raise HTTPException(status_code=403, detail="NOT_OWNER")
+    if always or card.user_state != state:
+        raise HTTPException(status_code=400, detail=detail)
 
 @router.post("/claim/{qr}")
-def claim_qr(
+async def claim_qr(
     qr: str,
-    db: Session = Depends(get_session),
-    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_session),
+    user: Principal = Depends(get_current_principal),
 ):
-    card = db.get(Card, qr)
-    if not card:
-        raise HTTPException(status_code=404, detail="QR_NOT_FOUND")
-    if card.user_state != 0:
-        raise HTTPException(status_code=400, detail="ALREADY_CLAIMED")
-
-    card.owner_user_id = user.id
-    card.claimed_at = datetime.now(timezone.utc)
-    card.user_state = 1
-    db.add(card)
-    db.commit()
-    db.refresh(card)
+    row = await _transition(
+        db, qr, [Card.user_state == 0], EVENT_CLAIM, user.id,
+        owner_user_id=user.id, claimed_at=datetime.now(timezone.utc), user_state=1,
+    )
+    if row is None:
+        await _raise_transition_error(db, qr, user.id, 0, "ALREADY_CLAIMED", owner_only=False)
 
-    owner = db.get(User, card.owner_user_id)
-    return {"qr": card.qr, "status": card.user_state, "owner_email": owner.email}
+    return {"qr": row.qr, "status": row.user_state, "owner_email": user.email}
 
 @router.post("/lend/{qr}")
-def lend_book(
+async def lend_book(
     qr: str,
     borrower_email: str = Body(embed=True),
-    db: Session = Depends(get_session),
-    user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_session),
+    user: Principal = Depends(get_current_principal)
 ) -> dict:
-    card = db.get(Card, qr)
-    if not card:
-        raise HTTPException(status_code=404, detail="QR_NOT_FOUND")
-    if card.owner_user_id != user.id:
-        raise HTTPException(status_code=403, detail="NOT_OWNER")
-    if card.user_state != 1:
-        raise HTTPException(status_code=400, detail="ALREADY_LENT")
-
-    borrower = get_user_by_email(borrower_email, db)
+    borrower = await get_user_by_email_async(borrower_email, db)
     if not borrower or borrower.id == user.id:
+        await _raise_transition_error(db, qr, user.id, 1, "ALREADY_LENT", always=False)
         raise HTTPException(status_code=400, detail="INVALID_BORROWER")
 
-    card.borrower_user_id = borrower.id
-    card.lent_at = datetime.now(timezone.utc)
-    card.user_state = 2
-
-    db.add(card)
-    db.commit()
-    db.refresh(card)
+    row = await _transition(
+        db, qr, [Card.owner_user_id == user.id, Card.user_state == 1], EVENT_LEND, user.id,
+        peer_user_id=borrower.id, borrower_user_id=borrower.id, lent_at=datetime.now(timezone.utc), user_state=2,
+    )
+    if row is None:
+        await _raise_transition_error(db, qr, user.id, 1, "ALREADY_LENT")
     return {"ok": True, "msg": "Lent successfully"}
 
 @router.get("/abook/{qr}/play-auth", response_model=PlayAuthResponse)
-def get_play_auth(
+async def get_play_auth(
     qr: str,
-    db: Session = Depends(get_session),
-    user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_session),
+    user: Principal = Depends(get_current_principal)
 ) -> PlayAuthResponse:
-    card = db.get(Card, qr)
+    card = await db.get(Card, qr)
     if not card:
         raise HTTPException(status_code=404, detail="QR_NOT_FOUND")
 
@@ -179,49 +195,51 @@ def get_play_auth(
     if not can_play:
         raise HTTPException(status_code=403, detail="NOT_ALLOWED_TO_PLAY")
 
-    # Check for active play sessions
-    active_session = db.exec(select(PlaySession).where(PlaySession.qr == qr, PlaySession.expires_at > datetime.now(timezone.utc))).first()
-    if active_session and active_session.device_id != str(user.id): # simple check, can be improved
-        raise HTTPException(status_code=409, detail="ACTIVE_SESSION_EXISTS")
-
-    title = db.get(Title, card.title_id)
+    title = await db.get(Title, card.title_id)
     if not title:
         raise HTTPException(status_code=404, detail="TITLE_NOT_FOUND")
 
-    progress = db.exec(
-        select(ListeningProgress)
-        .where(ListeningProgress.user_id == user.id, ListeningProgress.qr == qr)
-    ).first()
-    start_position = progress.position if progress else 0.0
+    # Single-device check: atomic acquire-or-refresh, off the database
+    if not await session_store.acquire(qr, str(user.id)):
+        raise HTTPException(status_code=409, detail="ACTIVE_SESSION_EXISTS")
 
-    signed_url = _generate_signed_url(qr, str(user.id))
+    start_position = await _get_start_position(db, user.id, qr)
+    chapters = await get_chapter_indexes(db, [card.title_id])
+    seek_index = load_index(card.title_id)
 
-    # Create a new play session
+    # Record the issued session: extend the caller's live row, or add one
+    now = datetime.now(timezone.utc)
     session_ttl = timedelta(hours=TTL_HOURS)
-    new_session = PlaySession(
-        qr=qr,
-        device_id=str(user.id),
-        issued_at=datetime.now(timezone.utc),
-        expires_at=datetime.now(timezone.utc) + session_ttl,
+    signed = url_signer.sign(qr, str(user.id), session_ttl.total_seconds(), now=now.timestamp())
+    extended = await db.exec(
+        update(PlaySession)
+        .where(PlaySession.qr == qr, PlaySession.device_id == str(user.id),
+               PlaySession.expires_at > now)
+        .values(issued_at=now, expires_at=now + session_ttl)
     )
-    db.add(new_session)
-    db.commit()
+    if not extended.rowcount:
+        db.add(PlaySession(qr=qr, device_id=str(user.id), issued_at=now,
+                           expires_at=now + session_ttl))
+    await db.exec(card_event_insert(EVENT_PLAY_AUTH, qr, card.title_id, user.id))
+    await db.commit()
 
     return PlayAuthResponse(
         can_play=True,
         reason="owner" if user.id == card.owner_user_id else "borrower",
         start_position=start_position,
-        signed_url=signed_url,
-        redirect_url=f"https://{ABS_HOST}/#/book/{title.abs_share_code}?pt={signed_url.split('sig=')[1]}",
+        **_resume_point(chapters.get(card.title_id), start_position),
+        seek=seek_index.locate(start_position) if seek_index else None,
+        signed_url=signed.url,
+        redirect_url=f"https://{ABS_HOST}/#/book/{title.abs_share_code}?pt={signed.signature}",
         expires_in=int(session_ttl.total_seconds()),
     )
 
 
 @router.get("/play-auth/{qr}", response_model=PlayAuthResponse)
-def get_play_auth_alias(
+async def get_play_auth_alias(
     qr: str,
-    db: Session = Depends(get_session),
-    user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_session),
+    user: Principal = Depends(get_current_principal)
 ) -> PlayAuthResponse:
     """Alias for backwards compatibility.
 
@@ -229,29 +247,26 @@ def get_play_auth_alias(
     `/play-auth/{qr}`.  Some existing clients use the shorter path so we
     expose both.
     """
-    return get_play_auth(qr=qr, db=db, user=user)
+    return await get_play_auth(qr=qr, db=db, user=user)
 
 @router.post("/abook/{qr}/stop-lend")
-def stop_lend(
+async def stop_lend(
     qr: str,
-    db: Session = Depends(get_session),
-    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_session),
+    user: Principal = Depends(get_current_principal),
 ):
-    card = db.get(Card, qr)
-    if not card:
-        raise HTTPException(status_code=404, detail="QR_NOT_FOUND")
-    if card.owner_user_id != user.id:
-        raise HTTPException(status_code=403, detail="NOT_OWNER")
-    if card.user_state != 2:
-        raise HTTPException(status_code=400, detail="Book is not on loan")
+    row = await _transition(
+        db, qr, [Card.owner_user_id == user.id, Card.user_state == 2], EVENT_RETURN, user.id,
+        borrower_user_id=None, lent_at=None, user_state=1,
+    )
+    if row is None:
+        await _raise_transition_error(db, qr, user.id, 2, "Book is not on loan")
 
-    card.borrower_user_id = None
-    card.lent_at = None
-    card.user_state = 1
-    db.add(card)
-    db.commit()
-    db.refresh(card)
-    return {"message": "Lend stopped", "qr": card.qr, "status": card.user_state}
+    # The borrower's playback session must not keep the owner out
+    holder = await session_store.holder(qr)
+    if holder is not None and holder != str(user.id):
+        await session_store.release(qr, holder)
+    return {"message": "Lend stopped", "qr": row.qr, "status": row.user_state}
 
 def get_status_label(status: int, lent_at: datetime | None = None) -> str:
     """Return a human‑readable label for a claim status.
@@ -275,101 +290,207 @@ def get_status_label(status: int, lent_at: datetime | None = None) -> str:
         case _:
             return "Desconegut"
 
+LIBRARY_PAGE_MAX = 200
+STATUS_BATCH_MAX = 200
+
+def _status_query(user_id, *columns):
+    """Card ⟕ owner ⟕ borrower ⟕ the caller's progress (plus ``columns``).
+
+    Callers add the ``WHERE``; one round-trip serves one card or a page.
+    """
+    owner, borrower = aliased(User), aliased(User)
+    return (
+        select(Card.qr, Card.title_id, Card.user_state, Card.owner_user_id, Card.borrower_user_id,
+               Card.claimed_at, Card.lent_at, Card.updated_at,
+               owner.email.label("owner_email"), borrower.email.label("borrower_email"),
+               ListeningProgress.position,
+               ListeningProgress.updated_at.label("progress_at"),
+               *columns)
+        .outerjoin(owner, owner.id == Card.owner_user_id)
+        .outerjoin(borrower, borrower.id == Card.borrower_user_id)
+        .outerjoin(ListeningProgress, and_(ListeningProgress.qr == Card.qr,
+                                           ListeningProgress.user_id == user_id))
+    )
+
+def _current_progress(row, user_id) -> tuple[float | None, datetime | None]:
+    """Stored progress of ``row``, overridden by heartbeats not flushed yet."""
+    position, progress_at = row.position, row.progress_at
+    buffered = progress_buffer.peek(user_id, row.qr)
+    if buffered:
+        position, progress_at = buffered
+    if progress_at is not None and progress_at.tzinfo is not None:
+        # Same value as it will read back from the DB once flushed (naive UTC)
+        progress_at = progress_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return position, progress_at
+
+def _status_payload(row, user_id, position: float | None, chapters) -> dict:
+    payload = {
+        "qr": row.qr,
+        "status": row.user_state,
+        "status_label": get_status_label(row.user_state),
+        "owner_email": row.owner_email,
+        "borrower_email": row.borrower_email,
+        "claimed_at": row.claimed_at,
+        "lent_at": row.lent_at,
+        "can_claim": row.user_state == 0,
+        "can_lend": user_id == row.owner_user_id and row.user_state == 1,
+        "can_stop_lend": user_id == row.owner_user_id and row.user_state == 2,
+        "can_play": user_id == row.owner_user_id or user_id == row.borrower_user_id,
+        "start_position": position or 0.0,
+    }
+    payload.update(_resume_point(chapters.get(row.title_id), position))
+    return payload
+
+def _resume_point(index, position: float | None) -> dict:
+    """Chapter, offset in it and percent complete (``app/chapters.py``)."""
+    if index is None:
+        return {"chapter": None, "percent_complete": None}
+    return index.locate(position or 0.0)
+
+_TITLE_COLUMNS = (Title.title, Title.author, Title.language,
+                  Title.duration_sec, Title.cover_url)
+
+def _library_item(row, user_id, chapters) -> dict:
+    position, progress_at = _current_progress(row, user_id)
+    item = _status_payload(row, user_id, position, chapters)
+    item["progress_updated_at"] = progress_at
+    item["title"] = {
+        "id": row.title_id,
+        "title": row.title,
+        "author": row.author,
+        "language": row.language,
+        "duration_sec": row.duration_sec,
+        "cover_url": row.cover_url,
+    }
+    return item
+
 @router.get("/abook/{qr}/status")
-def abook_status(
+async def abook_status(
     qr: str,
-    db: Session = Depends(get_session),
-    user: User = Depends(get_current_user),
+    response: Response,
+    db: AsyncSession = Depends(get_async_session),
+    user: Principal = Depends(get_current_principal),
+    if_none_match_header: str | None = Header(None, alias="If-None-Match"),
 ):
-    card = db.get(Card, qr)
-    if not card:
+    row = (await db.exec(_status_query(user.id).where(Card.qr == qr))).first()
+    if not row:
         raise HTTPException(status_code=404, detail="QR_NOT_FOUND")
+    position, progress_at = _current_progress(row, user.id)
+    chapters = await get_chapter_indexes(db, [row.title_id])
+    payload = _status_payload(row, user.id, position, chapters)
+
+    # The app polls this screen: unchanged state -> 304 without a body
+    etag = make_etag(row.qr, user.id, row.updated_at, row.user_state, row.owner_email,
+                     row.borrower_email, position, progress_at, payload["chapter"])
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if if_none_match(if_none_match_header, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+
+    return payload
+
+@router.get("/me/library")
+async def read_my_library(
+    cursor: str | None = None,
+    limit: int = Query(50, gt=0, le=LIBRARY_PAGE_MAX),
+    db: AsyncSession = Depends(get_async_session),
+    user: Principal = Depends(get_current_principal),
+):
+    """Owned and borrowed cards with status, title and progress, by QR.
 
-    owner = db.get(User, card.owner_user_id) if card.owner_user_id else None
-    borrower = db.get(User, card.borrower_user_id) if card.borrower_user_id else None
-
-    can_claim = card.user_state == 0
-    can_lend = user.id == card.owner_user_id and card.user_state == 1
-    can_stop_lend = user.id == card.owner_user_id and card.user_state == 2
-    can_play = user.id == card.owner_user_id or user.id == card.borrower_user_id
-
-    progress = db.exec(
-        select(ListeningProgress)
-        .where(ListeningProgress.user_id == user.id, ListeningProgress.qr == qr)
-    ).first()
-    start_position = progress.position if progress else 0.0
+    One query per page; pass ``next_cursor`` back as ``cursor`` to continue.
+    """
+    query = (
+        _status_query(user.id, *_TITLE_COLUMNS)
+        .join(Title, Title.id == Card.title_id)
+        .where(or_(Card.owner_user_id == user.id, Card.borrower_user_id == user.id))
+    )
+    if cursor:
+        (last_qr,) = decode_cursor(cursor, 1)
+        query = query.where(Card.qr > last_qr)
+    rows = (await db.exec(query.order_by(Card.qr).limit(limit + 1))).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].qr)
+    chapters = await get_chapter_indexes(db, {row.title_id for row in rows})
+    return {"items": [_library_item(row, user.id, chapters) for row in rows], "next_cursor": next_cursor}
+
+class StatusBatchRequest(BaseModel):
+    qrs: list[str] = Field(min_length=1, max_length=STATUS_BATCH_MAX)
+
+@router.post("/abooks/status:batch")
+async def abooks_status_batch(
+    body: StatusBatchRequest,
+    db: AsyncSession = Depends(get_async_session),
+    user: Principal = Depends(get_current_principal),
+):
+    """Status, title and progress for up to ``STATUS_BATCH_MAX`` QRs in one query.
 
+    Items come back in request order; unknown QRs are listed in ``not_found``.
+    Owner and borrower emails are only returned for the caller's own or
+    borrowed cards, so the batch cannot be used to harvest addresses.
+    """
+    qrs = list(dict.fromkeys(body.qrs))
+    query = (
+        _status_query(user.id, *_TITLE_COLUMNS)
+        .join(Title, Title.id == Card.title_id)
+        .where(Card.qr.in_(qrs))
+    )
+    rows = {row.qr: row for row in (await db.exec(query)).all()}
+    chapters = await get_chapter_indexes(db, {row.title_id for row in rows.values()})
+    items = []
+    for qr in qrs:
+        if qr not in rows:
+            continue
+        item = _library_item(rows[qr], user.id, chapters)
+        if user.id not in (rows[qr].owner_user_id, rows[qr].borrower_user_id):
+            item["owner_email"] = item["borrower_email"] = None  # 🔒 targetes d'altri: sense correus
+        items.append(item)
     return {
-        "qr": card.qr,
-        "status": card.user_state,
-        "status_label": get_status_label(card.user_state),
-        "owner_email": owner.email if owner else None,
-        "borrower_email": borrower.email if borrower else None,
-        "claimed_at": card.claimed_at,
-        "lent_at": card.lent_at,
-        "can_claim": can_claim,
-        "can_lend": can_lend,
-        "can_stop_lend": can_stop_lend,
-        "can_play": can_play,
-        "start_position": start_position,
+        "items": items,
+        "not_found": [qr for qr in qrs if qr not in rows],
     }
 
 class ProgressData(BaseModel):
     position: float
 
 @router.post("/abook/{qr}/progress")
-def save_progress(
+async def save_progress(
     qr: str,
     progress: ProgressData,
-    user: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    user: Principal = Depends(get_current_principal),
 ) -> dict:
-    """Persist the current listening position for a user and audiobook.
+    """Record the current listening position for a user and audiobook.
 
-    Updates the `ListeningProgress` record if it exists or creates a new
-    entry otherwise.  The timestamp is recorded in UTC.
+    The position is merged into the in-memory write-behind buffer (see
+    ``app/progress_buffer.py``) and persisted by the next periodic batched
+    upsert, so a heartbeat costs no database write of its own.
 
     Args:
         qr: QR code of the audiobook.
         progress: progress data containing the new position.
         user: the authenticated user.
-        session: database session.
 
     Returns:
         Confirmation of the operation.
     """
-    lp = session.exec(
-        select(ListeningProgress).where(
-            (ListeningProgress.qr == qr) & (ListeningProgress.user_id == user.id)
-        )
-    ).first()
-
-    now_utc = datetime.now(timezone.utc)
-    if lp:
-        lp.position = progress.position
-        lp.updated_at = now_utc
-    else:
-        lp = ListeningProgress(
-            qr=qr,
-            user_id=user.id,
-            position=progress.position,
-            updated_at=now_utc
-        )
-        session.add(lp)
-
-    session.commit()
+    progress_buffer.record(user.id, qr, progress.position)
     return {"ok": True}
 
 
 __all__ = ["router"]
 
-import yaml
-
 @router.get("/translations/{lang}")
-def get_translations(lang: str):
-    try:
-        with open(f"../jekyll-freelancer-theme/_data/{lang}.yml", "r") as f:
-            translations = yaml.safe_load(f)
-            return translations.get("errors", {})
-    except FileNotFoundError:
+async def get_translations(
+    lang: str,
+    if_none_match_header: str | None = Header(None, alias="If-None-Match"),
+):
+    entry = translations.get(lang)
+    if entry is None:
         raise HTTPException(status_code=404, detail="Translations not found")
+    headers = {"ETag": entry.etag, "Cache-Control": f"public, max-age={TRANSLATIONS_MAX_AGE_SEC}"}
+    if if_none_match(if_none_match_header, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
@@ -1,18 +1,28 @@
 # app/auth.py
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from app import db
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 
-from app.db import get_user_by_email, get_session
+from app.cache import TTLCache
+from app.db import get_user_by_email, async_session_scope
 from app.models import User
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 import os
 
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
+# 👤 Cache d'usuaris autenticats (per procés) i mode "claims-only"
+USER_CACHE_TTL_SEC = float(os.getenv("AUTH_USER_CACHE_TTL_SEC", 60))
+USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", 10000))
+CLAIMS_ONLY = os.getenv("AUTH_CLAIMS_ONLY", "false").strip().lower() in ("1", "true", "yes", "on")
+
+_user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL_SEC)
+
 def get_secret_key() -> str:
     """Gets the secret key from environment variables with a fallback."""
     return os.getenv("SECRET_KEY", "canvia-aquesta-clau")
@@ -32,38 +42,79 @@ def create_access_token(data: dict):
 
 from uuid import UUID
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_session)) -> User:
-    credentials_exception = HTTPException(
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated caller, as needed by endpoints that only use the id.
+
+    In claims-only mode (``AUTH_CLAIMS_ONLY``) it is built from the token
+    alone, so ``email`` and ``is_admin`` may lag behind the database until the
+    token expires.
+    """
+
+    id: UUID
+    email: str | None
+    is_admin: bool
+
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def _decode_user_token(token: str) -> tuple[UUID, dict]:
     try:
         payload = jwt.decode(token, get_secret_key(), algorithms=[ALGORITHM])
         user_id_str: str = payload.get("sub")
         if user_id_str is None:
-            raise credentials_exception
-        user_id = UUID(user_id_str)
+            raise _credentials_exception()
+        return UUID(user_id_str), payload
     except (JWTError, ValueError):
-        raise credentials_exception
+        raise _credentials_exception()
+
+
+async def _load_user(user_id: UUID) -> User | None:
+    """Return a detached copy of the user row, served from the cache if possible."""
+    snapshot = _user_cache.get(user_id)
+    if snapshot is None:
+        async with async_session_scope() as session:
+            user = await session.get(User, user_id)
+            if user is None:
+                return None
+            snapshot = user.model_dump()
+        _user_cache.set(user_id, snapshot)
+    return User(**snapshot)
+
 
-    user = db.get(User, user_id)
+def invalidate_cached_user(user_id) -> None:
+    """Drop a user from the principal cache after it has been modified."""
+    _user_cache.invalidate(user_id if isinstance(user_id, UUID) else UUID(str(user_id)))
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
+    user_id, _ = _decode_user_token(token)
+    user = await _load_user(user_id)
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
     return user
 
 
+async def get_current_principal(token: str = Depends(oauth2_scheme)) -> Principal:
+    user_id, payload = _decode_user_token(token)
+    if CLAIMS_ONLY and "email" in payload and "is_admin" in payload:
+        return Principal(id=user_id, email=payload["email"], is_admin=bool(payload["is_admin"]))
+    user = await _load_user(user_id)
+    if user is None:
+        raise _credentials_exception()
+    return Principal(id=user.id, email=user.email, is_admin=user.is_admin)
 
 
-from passlib.context import CryptContext
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+from app.passwords import verify_password, hash_password as get_password_hash
 
 def get_current_admin_user(current_user: User = Depends(get_current_user)):
     if not current_user.is_admin:
@@ -0,0 +1,265 @@
+"""
+Card event log and its batched consumer.
+
+Routes that change a card append a ``CardEvent`` row in the same
+transaction as the change (``card_event_insert``), so the log can never
+disagree with ``Card``.  Nothing else happens on the request path.
+
+``CardEventConsumer`` runs from the ``lifespan`` hook every
+``CARD_EVENT_INTERVAL_SEC`` seconds.  It reads up to ``CARD_EVENT_BATCH``
+events past its stored offset and, in one transaction together with the new
+offset:
+
+* materialises the historical ``Claim`` row of each card (owner, loan and
+  return dates, status);
+* adds the per-title totals in ``TitleCounter``;
+* adds claims per store and day in ``StoreDailyClaims``.
+
+The offset row is locked for the whole transaction (``FOR UPDATE`` on
+Postgres; on SQLite the insert that creates it takes the write lock), so
+several workers or a CLI run can consume at once without applying the same
+events twice.
+
+Events younger than ``CARD_EVENT_LAG_SEC`` are left for the next run, so a
+transaction that took an id but has not committed yet is not skipped.  This
+only holds for transactions shorter than the lag: one that commits later
+than that, with an id below an event already consumed, is skipped for good.
+The routes append their event in short single-request transactions; keep
+the lag well above the longest of them.
+
+On Postgres the consumer also creates the monthly partitions of
+``cardevent`` for the current and next month, at startup and then every
+``CARD_EVENT_PARTITION_INTERVAL_SEC`` seconds (a day by default).  That DDL
+runs in its own transaction: if it fails the error is logged, events land in
+``cardevent_default`` and consumption goes on.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+
+from sqlalchemy import insert, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection, Engine
+
+from app import metrics
+from app.db import engine
+from app.models import Card, Claim, StoreDailyClaims, User
+from app.models.card_event import (
+    EVENT_CLAIM, EVENT_LEND, EVENT_PLAY_AUTH, EVENT_RETURN, CardEvent, EventOffset, TitleCounter,
+)
+
+logger = logging.getLogger(__name__)
+
+CONSUMER_INTERVAL_SEC = float(os.getenv("CARD_EVENT_INTERVAL_SEC", 5))
+CONSUMER_BATCH = int(os.getenv("CARD_EVENT_BATCH", 1000))
+CONSUMER_LAG_SEC = float(os.getenv("CARD_EVENT_LAG_SEC", 2))
+PARTITION_INTERVAL_SEC = float(os.getenv("CARD_EVENT_PARTITION_INTERVAL_SEC", 24 * 3600))
+CONSUMER_NAME = "claims"
+
+_UPSERT_DIALECTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+_COUNTER_COLUMNS = {
+    EVENT_CLAIM: "claims",
+    EVENT_LEND: "lends",
+    EVENT_RETURN: "returns",
+    EVENT_PLAY_AUTH: "play_auths",
+}
+
+CONSUMED = metrics.counter("avook_card_events_consumed_total", "Card events applied by the consumer")
+
+
+def card_event_insert(kind: int, qr: str, title_id: int, user_id: UUID | None = None,
+                      peer_user_id: UUID | None = None, detail: str | None = None):
+    """``INSERT`` for one event; execute it before the transaction commits."""
+    return insert(CardEvent).values(
+        kind=kind, qr=qr, title_id=title_id, user_id=user_id,
+        peer_user_id=peer_user_id, detail=detail,
+        occurred_at=datetime.now(timezone.utc),
+    )
+
+
+def _month_start(moment: datetime) -> datetime:
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+
+
+def ensure_partitions(conn: Connection, now: datetime | None = None, months: int = 2) -> None:
+    """Create the monthly ``cardevent`` partitions from this month on (Postgres)."""
+    if conn.dialect.name != "postgresql":
+        return
+    start = _month_start(now or datetime.now(timezone.utc))
+    for _ in range(months):
+        end = _month_start(start + timedelta(days=32))
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS cardevent_{start:%Y_%m} PARTITION OF cardevent "
+            f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+        ))
+        start = end
+
+
+class CardEventConsumer:
+    def __init__(self, bind: Engine, name: str = CONSUMER_NAME, batch_size: int = CONSUMER_BATCH,
+                 interval: float = CONSUMER_INTERVAL_SEC, lag: float = CONSUMER_LAG_SEC,
+                 partition_interval: float = PARTITION_INTERVAL_SEC):
+        self.bind = bind
+        self.name = name
+        self.batch_size = batch_size
+        self.interval = interval
+        self.lag = lag
+        self.partition_interval = partition_interval
+
+    def _insert(self, conn: Connection, model):
+        upsert = _UPSERT_DIALECTS.get(conn.dialect.name)
+        if upsert is None:
+            raise RuntimeError(f"Unsupported dialect for event consumer: {conn.dialect.name}")
+        return upsert(model.__table__)
+
+    def _upsert(self, conn: Connection, model, rows: list[dict], keys: list[str], set_) -> None:
+        stmt = self._insert(conn, model)
+        stmt = stmt.on_conflict_do_update(index_elements=keys, set_=set_(stmt))
+        conn.execute(stmt, rows)
+
+    def consume(self, now: datetime | None = None) -> int:
+        """Apply the next batch of events; return how many were applied."""
+        now = now or datetime.now(timezone.utc)
+        events_t = CardEvent.__table__
+        with self.bind.begin() as conn:
+            # Crea la fila si cal i bloqueja-la: un altre consumidor espera el commit
+            conn.execute(self._insert(conn, EventOffset).values(consumer=self.name, last_id=0)
+                         .on_conflict_do_nothing(index_elements=["consumer"]))
+            offset = conn.execute(
+                select(EventOffset.last_id).where(EventOffset.consumer == self.name).with_for_update()
+            ).scalar()
+            events = conn.execute(
+                select(events_t)
+                .where(events_t.c.id > (offset or 0),
+                       events_t.c.occurred_at <= now - timedelta(seconds=self.lag))
+                .order_by(events_t.c.id)
+                .limit(self.batch_size)
+            ).all()
+            if not events:
+                return 0
+
+            self._apply_claims(conn, events)
+            self._apply_counters(conn, events, now)
+            self._apply_store_claims(conn, events)
+            self._upsert(conn, EventOffset, [{"consumer": self.name, "last_id": events[-1].id}],
+                         ["consumer"], lambda stmt: {"last_id": stmt.excluded.last_id})
+        CONSUMED.inc(len(events))
+        return len(events)
+
+    def _apply_claims(self, conn: Connection, events) -> None:
+        relevant = [e for e in events if e.kind in (EVENT_CLAIM, EVENT_LEND, EVENT_RETURN)]
+        if not relevant:
+            return
+        user_ids = {e.user_id for e in relevant} | {e.peer_user_id for e in relevant}
+        user_ids.discard(None)
+        emails = dict(conn.execute(select(User.id, User.email).where(User.id.in_(user_ids))).all())
+        claims_t = Claim.__table__
+        qrs = {e.qr for e in relevant}
+        claims = {
+            row.qr: dict(row._mapping)
+            for row in conn.execute(select(claims_t).where(claims_t.c.qr.in_(qrs)))
+        }
+
+        for e in relevant:
+            if e.kind == EVENT_CLAIM:
+                claims[e.qr] = {**claims.get(e.qr, {}), "qr": e.qr, "claimed_at": e.occurred_at,
+                                "owner_email": emails.get(e.user_id, ""), "borrower_email": None,
+                                "lent_at": None, "returned_at": None, "status": 1}
+            elif e.qr in claims:
+                claim = claims[e.qr]
+                if e.kind == EVENT_LEND:
+                    claim.update(borrower_email=emails.get(e.peer_user_id), lent_at=e.occurred_at,
+                                 returned_at=None, status=2)
+                else:
+                    claim.update(returned_at=e.occurred_at, status=1)
+
+        rows = [
+            {"qr": c["qr"], "claimed_at": c["claimed_at"], "owner_email": c["owner_email"],
+             "borrower_email": c["borrower_email"], "lent_at": c["lent_at"],
+             "returned_at": c["returned_at"], "status": c["status"]}
+            for qr, c in claims.items() if qr in qrs
+        ]
+        columns = ("claimed_at", "owner_email", "borrower_email", "lent_at", "returned_at", "status")
+        self._upsert(conn, Claim, rows, ["qr"],
+                     lambda stmt: {c: stmt.excluded[c] for c in columns})
+
+    def _apply_counters(self, conn: Connection, events, now: datetime) -> None:
+        totals: dict[int, Counter] = {}
+        for e in events:
+            column = _COUNTER_COLUMNS.get(e.kind)
+            if column:
+                totals.setdefault(e.title_id, Counter())[column] += 1
+        if not totals:
+            return
+        table = TitleCounter.__table__
+        rows = [
+            {"title_id": title_id, "updated_at": now,
+             **{column: counts[column] for column in _COUNTER_COLUMNS.values()}}
+            for title_id, counts in totals.items()
+        ]
+        self._upsert(conn, TitleCounter, rows, ["title_id"], lambda stmt: {
+            "updated_at": stmt.excluded.updated_at,
+            **{column: table.c[column] + stmt.excluded[column] for column in _COUNTER_COLUMNS.values()},
+        })
+
+    def _apply_store_claims(self, conn: Connection, events) -> None:
+        claims = [e for e in events if e.kind == EVENT_CLAIM]
+        if not claims:
+            return
+        stores = dict(conn.execute(
+            select(Card.qr, Card.store_id)
+            .where(Card.qr.in_({e.qr for e in claims}), Card.store_id.is_not(None))
+        ).all())
+        per_day = Counter((stores[e.qr], e.occurred_at.date()) for e in claims if e.qr in stores)
+        if not per_day:
+            return
+        table = StoreDailyClaims.__table__
+        rows = [{"store_id": store_id, "day": day, "claims": n} for (store_id, day), n in per_day.items()]
+        self._upsert(conn, StoreDailyClaims, rows, ["store_id", "day"],
+                     lambda stmt: {"claims": table.c.claims + stmt.excluded.claims})
+
+    def maintain_partitions(self) -> bool:
+        """Create the coming ``cardevent`` partitions; log and return ``False`` on failure."""
+        try:
+            with self.bind.begin() as conn:
+                ensure_partitions(conn)
+        except Exception:
+            logger.exception("Cannot create cardevent partitions; new events go to cardevent_default")
+            return False
+        return True
+
+    def run_once(self) -> int:
+        total = 0
+        while True:
+            applied = self.consume()
+            total += applied
+            if applied < self.batch_size:
+                return total
+
+    async def run(self) -> None:
+        """Consume periodically until cancelled, maintaining the partitions in between."""
+        partitions_at = None
+        while True:
+            # Fora de la transacció de consum: un DDL fallit no atura el consumidor
+            if partitions_at is None or time.monotonic() - partitions_at >= self.partition_interval:
+                partitions_at = time.monotonic()
+                await asyncio.to_thread(self.maintain_partitions)
+            try:
+                applied = await asyncio.to_thread(self.run_once)
+                if applied:
+                    logger.debug("Applied %d card events", applied)
+            except Exception:
+                logger.exception("Card event consumer failed; will retry")
+            await asyncio.sleep(self.interval)
+
+
+card_event_consumer = CardEventConsumer(engine)
@@ -0,0 +1,145 @@
+"""
+Streaming card exports (CSV, NDJSON, Parquet).
+
+Rows come from a single Card ⟕ Title ⟕ Store query read through a
+server-side cursor (``yield_per``), and are encoded chunk by chunk, so memory
+stays flat and the first bytes leave before the last row is read.  CSV and
+NDJSON can be gzip-compressed on the fly.
+
+The generators open their own ``Session``: FastAPI closes ``yield``
+dependencies before a ``StreamingResponse`` body is iterated.
+"""
+
+import csv
+import io
+import json
+import os
+import zlib
+from typing import Iterable, Iterator
+
+from sqlmodel import Session, select
+
+from app.db import engine
+from app.models import Card, Store, Title
+
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", 2000))
+
+COLUMNS = ["qr", "title", "abs_share_code", "store", "retail_state", "notes"]
+
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+def _export_query(title_id: int, batch_id: int | None):
+    query = (
+        select(Card.qr, Title.title, Title.abs_share_code, Store.name,
+               Card.retail_state, Card.notes)
+        .join(Title, Title.id == Card.title_id)
+        .outerjoin(Store, Store.id == Card.store_id)
+        .where(Card.title_id == title_id)
+    )
+    if batch_id:
+        query = query.where(Card.batch_id == batch_id)
+    return query.execution_options(yield_per=EXPORT_CHUNK_ROWS)
+
+
+def iter_row_chunks(title_id: int, batch_id: int | None = None) -> Iterator[list[tuple]]:
+    """Yield lists of export rows, ``EXPORT_CHUNK_ROWS`` at a time."""
+    with Session(engine) as db:
+        result = db.exec(_export_query(title_id, batch_id))
+        for partition in result.partitions():
+            yield [
+                (qr, title or "", share_code or "", store or "", retail_state, notes)
+                for qr, title, share_code, store, retail_state, notes in partition
+            ]
+
+
+def encode_csv(chunks: Iterable[list[tuple]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def encode_ndjson(chunks: Iterable[list[tuple]]) -> Iterator[bytes]:
+    for rows in chunks:
+        yield "".join(
+            json.dumps(dict(zip(COLUMNS, row)), ensure_ascii=False) + "\n" for row in rows
+        ).encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands out what was written since the last drain."""
+
+    def __init__(self):
+        self._parts: list[bytes] = []
+        self._pos = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        data = bytes(b)
+        self._parts.append(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def encode_parquet(chunks: Iterable[list[tuple]]) -> Iterator[bytes]:
+    """One Parquet row group per chunk (requires ``pyarrow``)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(name, pa.string()) for name in COLUMNS])
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+        for rows in chunks:
+            columns = list(zip(*rows)) if rows else [()] * len(COLUMNS)
+            writer.write_table(pa.table(
+                {name: pa.array(values, type=pa.string()) for name, values in zip(COLUMNS, columns)},
+                schema=schema,
+            ))
+            data = sink.drain()
+            if data:
+                yield data
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def gzip_stream(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: format gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+ENCODERS = {
+    "csv": encode_csv,
+    "ndjson": encode_ndjson,
+    "parquet": encode_parquet,
+}
+
+
+def export_cards(title_id: int, batch_id: int | None, fmt: str, gzip: bool) -> Iterator[bytes]:
+    stream = ENCODERS[fmt](iter_row_chunks(title_id, batch_id))
+    return gzip_stream(stream) if gzip else stream
@@ -0,0 +1,93 @@
+"""
+Bulk card minting for print runs.
+
+A print run creates one ``Batch`` row and ``qty`` cards linked to it.  Cards
+are written as multi-row INSERTs in chunks of ``MINT_CHUNK_SIZE`` inside a
+single transaction (all-or-nothing), without building ORM objects.
+
+QR codes look like ``QR-<batch>-<random>``: the base-36 batch id makes codes
+unique across batches and the random part is unique within the batch by
+construction, so no existence check against the database is needed.  The
+random part (50 bits) keeps codes unguessable, since knowing a code is
+enough to claim the card.
+"""
+
+import os
+import secrets
+from datetime import datetime, timezone
+
+from sqlalchemy import insert
+from sqlmodel import Session
+
+from app.models import Batch, Card
+
+MINT_CHUNK_SIZE = int(os.getenv("MINT_CHUNK_SIZE", 5000))
+MAX_BATCH_QTY = int(os.getenv("MAX_BATCH_QTY", 500_000))
+
+# Crockford base32: sense I, L, O, U per evitar confusions en llegir la targeta
+_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_RANDOM_CHARS = 10
+
+
+def _base36(n: int) -> str:
+    digits = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    out = ""
+    while True:
+        n, r = divmod(n, 36)
+        out = digits[r] + out
+        if n == 0:
+            return out
+
+
+def _random_suffix() -> str:
+    value = secrets.randbits(5 * _RANDOM_CHARS)
+    chars = []
+    for _ in range(_RANDOM_CHARS):
+        value, r = divmod(value, 32)
+        chars.append(_ALPHABET[r])
+    return "".join(chars)
+
+
+def generate_qr_codes(batch_id: int, qty: int) -> list[str]:
+    """Return ``qty`` distinct QR codes for ``batch_id``."""
+    prefix = f"QR-{_base36(batch_id)}-"
+    suffixes: set[str] = set()
+    while len(suffixes) < qty:
+        suffixes.add(_random_suffix())
+    return [prefix + suffix for suffix in suffixes]
+
+
+def mint_cards(
+    db: Session,
+    title_id: int,
+    qty: int,
+    printer_vendor: str | None = None,
+    notes: str | None = None,
+) -> tuple[Batch, list[str]]:
+    """Create a ``Batch`` with ``qty`` new cards and commit.
+
+    Returns the batch and the generated QR codes.
+    """
+    batch = Batch(title_id=title_id, qty=qty, printer_vendor=printer_vendor, notes=notes)
+    db.add(batch)
+    db.flush()
+
+    codes = generate_qr_codes(batch.id, qty)
+    now = datetime.now(timezone.utc)
+    conn = db.connection()
+    stmt = insert(Card.__table__)
+    for start in range(0, qty, MINT_CHUNK_SIZE):
+        conn.execute(stmt, [
+            {
+                "qr": qr,
+                "title_id": title_id,
+                "batch_id": batch.id,
+                "user_state": 0,
+                "retail_state": "warehouse",
+                "updated_at": now,
+            }
+            for qr in codes[start:start + MINT_CHUNK_SIZE]
+        ])
+    db.commit()
+    db.refresh(batch)
+    return batch, codes
@@ -0,0 +1,97 @@
+"""
+Chapter lookup for resume positions.
+
+Each title's chapters are loaded once into a ``ChapterIndex``: two compact
+``array('d')`` of start and end times plus the names.  ``locate`` finds the
+chapter of a position with ``bisect`` and returns it with the offset inside
+the chapter and the percentage of the book completed, so status and
+play-auth responses can include them without extra queries.
+
+Indexes are cached per title for ``CHAPTER_CACHE_TTL_SEC`` seconds; the
+library indexer calls ``invalidate`` after rewriting chapters.
+"""
+
+import os
+from array import array
+from bisect import bisect_right
+from dataclasses import dataclass
+
+from sqlmodel import select
+
+from app.cache import TTLCache
+from app.models import Chapter, Title
+
+CACHE_TTL_SEC = float(os.getenv("CHAPTER_CACHE_TTL_SEC", 300))
+CACHE_SIZE = int(os.getenv("CHAPTER_CACHE_SIZE", 4096))
+
+_cache = TTLCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL_SEC)
+
+
+@dataclass(frozen=True)
+class ChapterIndex:
+    starts: array
+    ends: array
+    names: tuple[str, ...]
+    duration: float
+
+    def locate(self, position: float) -> dict:
+        """``chapter`` (or ``None``) and ``percent_complete`` at ``position``."""
+        percent = round(min(max(position / self.duration, 0.0), 1.0) * 100, 1) if self.duration else None
+        if not self.starts:
+            return {"chapter": None, "percent_complete": percent}
+        i = max(bisect_right(self.starts, position) - 1, 0)
+        start = self.starts[i]
+        return {
+            "chapter": {
+                "index": i,
+                "title": self.names[i],
+                "start": start,
+                "end": self.ends[i],
+                "offset": round(max(position - start, 0.0), 3),
+                "count": len(self.starts),
+            },
+            "percent_complete": percent,
+        }
+
+
+def build_index(duration_sec: float | None, chapters) -> ChapterIndex:
+    """Index from ``(start_sec, end_sec, name)`` rows ordered by start."""
+    starts, ends, names = array("d"), array("d"), []
+    for start, end, name in chapters:
+        starts.append(start)
+        ends.append(end)
+        names.append(name)
+    duration = float(duration_sec or 0) or (ends[-1] if ends else 0.0)
+    return ChapterIndex(starts, ends, tuple(names), duration)
+
+
+async def get_chapter_indexes(db, title_ids) -> dict[int, ChapterIndex]:
+    """Indexes for ``title_ids``; the ones not cached cost one query in total."""
+    indexes, missing = {}, []
+    for title_id in set(title_ids):
+        index = _cache.get(title_id)
+        if index is None:
+            missing.append(title_id)
+        else:
+            indexes[title_id] = index
+    if missing:
+        rows = (await db.exec(
+            select(Title.id, Title.duration_sec, Chapter.start_sec, Chapter.end_sec, Chapter.name)
+            .outerjoin(Chapter, Chapter.title_id == Title.id)
+            .where(Title.id.in_(missing))
+            .order_by(Title.id, Chapter.idx)
+        )).all()
+        grouped: dict[int, tuple[float, list]] = {}
+        for title_id, duration_sec, start, end, name in rows:
+            _, chapters = grouped.setdefault(title_id, (duration_sec, []))
+            if start is not None:
+                chapters.append((start, end, name))
+        for title_id, (duration_sec, chapters) in grouped.items():
+            index = build_index(duration_sec, chapters)
+            _cache.set(title_id, index)
+            indexes[title_id] = index
+    return indexes
+
+
+def invalidate() -> None:
+    _cache.clear()
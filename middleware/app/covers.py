@@ -0,0 +1,153 @@
+"""
+Cover thumbnails.
+
+The cover image of each indexed book folder (``LibraryFolder.cover_file``)
+is resized to ``COVER_SIZES`` (longest side, in pixels) and saved as WebP
+and JPEG under ``COVERS_DIR`` with content-addressed names:
+``<source hash>-<size>.<webp|jpg>``.  A cover is hashed in a worker process
+and only re-encoded when no derivative with that hash exists yet, so
+unchanged covers cost one read.
+
+``Title.cover_url`` is then pointed at ``/covers/<hash>-<COVER_DEFAULT_SIZE>.webp``
+(unless an admin set an external URL); clients pick another size or the
+JPEG by changing the suffix.  The files never change under a name, so
+``GET /covers/{name}`` sends them with ``immutable`` caching and answers
+``If-None-Match`` with ``304``.
+
+Runs after the library indexer for the folders it re-indexed, or by hand
+with ``python -m app.covers``.
+"""
+
+import argparse
+import hashlib
+import logging
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from PIL import Image, UnidentifiedImageError
+from sqlalchemy import and_, bindparam, or_, select, update
+from sqlalchemy.engine import Engine
+
+from app.db import engine, init_db
+from app.models import LibraryFolder, Title
+from app.streaming import LIBRARY_ROOT
+
+logger = logging.getLogger(__name__)
+
+COVERS_DIR = Path(os.getenv("COVERS_DIR", Path(__file__).resolve().parents[1] / "data" / "covers"))
+COVER_SIZES = tuple(int(s) for s in os.getenv("COVER_SIZES", "160,320,640").split(","))
+DEFAULT_SIZE = int(os.getenv("COVER_DEFAULT_SIZE", 320))
+COVER_WORKERS = int(os.getenv("COVER_WORKERS", os.cpu_count() or 1))
+COVERS_URL = "/covers"
+FORMATS = {"webp": ("WEBP", {"quality": 80, "method": 4}),
+           "jpg": ("JPEG", {"quality": 82, "progressive": True, "optimize": True})}
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+NAME = re.compile(r"^[0-9a-f]{20}-\d{2,4}\.(webp|jpg)$")
+
+
+def derivative_names(digest: str, sizes=COVER_SIZES) -> list[str]:
+    return [f"{digest}-{size}.{ext}" for size in sizes for ext in FORMATS]
+
+
+def make_thumbnails(source: str, out_dir: str, sizes=COVER_SIZES) -> tuple[str | None, str | None]:
+    """Hash ``source`` and write its missing derivatives; ``(hash, error)``.
+
+    Runs in the pool's worker processes.
+    """
+    try:
+        with open(source, "rb") as f:
+            data = f.read()
+        digest = hashlib.blake2b(data, digest_size=10).hexdigest()
+        out = Path(out_dir)
+        if all((out / name).exists() for name in derivative_names(digest, sizes)):
+            return digest, None
+
+        with Image.open(source) as original:
+            original.load()
+            image = original.convert("RGB")
+        out.mkdir(parents=True, exist_ok=True)
+        for size in sizes:
+            thumb = image.copy()
+            thumb.thumbnail((size, size), Image.LANCZOS)
+            for ext, (fmt, options) in FORMATS.items():
+                target = out / f"{digest}-{size}.{ext}"
+                tmp = target.with_suffix(f".{ext}.tmp")
+                thumb.save(tmp, fmt, **options)
+                os.replace(tmp, target)
+        return digest, None
+    except (OSError, UnidentifiedImageError, ValueError) as exc:
+        return None, f"{type(exc).__name__}: {exc}"
+
+
+def cover_url(digest: str, size: int = DEFAULT_SIZE, ext: str = "webp") -> str:
+    return f"{COVERS_URL}/{digest}-{size}.{ext}"
+
+
+def _replaceable(column):
+    """Cover URL empty or generated here: an external URL is left alone."""
+    return or_(column.is_(None), column == "", column.startswith(f"{COVERS_URL}/"))
+
+
+def build_covers(bind: Engine = engine, root: Path = LIBRARY_ROOT, out_dir: Path = COVERS_DIR,
+                 workers: int = COVER_WORKERS, paths=None) -> int:
+    """Thumbnail the covers of ``paths`` (all folders if ``None``); return titles updated."""
+    query = (
+        select(LibraryFolder.title_id, LibraryFolder.path, LibraryFolder.cover_file, Title.cover_url)
+        .join(Title, Title.id == LibraryFolder.title_id)
+        .where(LibraryFolder.cover_file.is_not(None), _replaceable(Title.cover_url))
+    )
+    if paths is not None:
+        if not paths:
+            return 0
+        query = query.where(LibraryFolder.path.in_(list(paths)))
+    with bind.connect() as conn:
+        rows = conn.execute(query).all()
+    if not rows:
+        return 0
+
+    sources = [str(Path(root) / row.path / row.cover_file) for row in rows]
+    if workers <= 0 or len(rows) == 1:
+        results = [make_thumbnails(source, str(out_dir)) for source in sources]
+    else:
+        # spawn: no hereta fils ni connexions del procés del servidor
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=multiprocessing.get_context("spawn")) as pool:
+            results = list(pool.map(make_thumbnails, sources, [str(out_dir)] * len(sources),
+                                    chunksize=max(1, len(sources) // (workers * 4))))
+
+    changes = []
+    for row, source, (digest, error) in zip(rows, sources, results):
+        if error:
+            logger.warning("Cannot make thumbnails of %s: %s", source, error)
+        elif row.cover_url != cover_url(digest):
+            changes.append({"tid": row.title_id, "url": cover_url(digest)})
+    if changes:
+        table = Title.__table__
+        with bind.begin() as conn:
+            # Es torna a comprovar per si algú ha posat una URL externa mentrestant
+            conn.execute(
+                update(table)
+                .where(and_(table.c.id == bindparam("tid"), _replaceable(table.c.cover_url)))
+                .values(cover_url=bindparam("url")),
+                changes,
+            )
+    return len(changes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate cover thumbnails for indexed titles.")
+    parser.add_argument("--workers", type=int, default=COVER_WORKERS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    updated = build_covers(workers=args.workers)
+    print(f"{updated} cover URLs updated; thumbnails in {COVERS_DIR}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Precomputed aggregates for the admin dashboard.
+
+``GET /admin/analytics`` reads only small summary tables, so it costs the
+same whatever the size of ``card`` or ``listeningprogress``:
+
+* ``CardStateCount``: cards per title × batch × retail_state × user_state
+  (sell-through, active loans, claim rate);
+* ``TitleListening``: listeners and listened seconds per title;
+* ``StoreDailyClaims`` and ``TitleCounter``: maintained from the card event
+  log by ``app.card_events``.
+
+``DashboardAggregator`` refreshes the first two incrementally every
+``DASHBOARD_REFRESH_INTERVAL_SEC`` seconds: it finds the titles whose cards
+or progress changed since its stored watermark (``card.updated_at`` and
+``listeningprogress.written_at`` indexes) and recomputes only those titles'
+rows.  Progress is tracked by ``written_at``, the time the progress buffer
+wrote the row, not by the heartbeat time in ``updated_at``: a flush lands up
+to ``PROGRESS_FLUSH_INTERVAL_SEC`` late (more after a failed flush), and its
+rows must not fall behind the watermark.  The watermark is rewound by
+``DASHBOARD_OVERLAP_SEC`` on each pass to pick up transactions that commit
+after a later one.
+"""
+
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import delete, func, insert
+from sqlalchemy.engine import Connection, Engine
+from sqlmodel import Session, select
+
+from app.db import engine
+from app.models import (
+    AggregateWatermark, Card, CardStateCount, ListeningProgress, Store, StoreDailyClaims,
+    Title, TitleCounter, TitleListening,
+)
+
+logger = logging.getLogger(__name__)
+
+REFRESH_INTERVAL_SEC = float(os.getenv("DASHBOARD_REFRESH_INTERVAL_SEC", 60))
+OVERLAP_SEC = float(os.getenv("DASHBOARD_OVERLAP_SEC", 5))
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class DashboardAggregator:
+    def __init__(self, bind: Engine, interval: float = REFRESH_INTERVAL_SEC,
+                 overlap: float = OVERLAP_SEC):
+        self.bind = bind
+        self.interval = interval
+        self.overlap = timedelta(seconds=overlap)
+
+    def _watermark(self, conn: Connection, name: str) -> datetime:
+        value = conn.execute(
+            select(AggregateWatermark.updated_at).where(AggregateWatermark.name == name)
+        ).scalar()
+        return value - self.overlap if value else _EPOCH
+
+    def _set_watermark(self, conn: Connection, name: str, value: datetime | None) -> None:
+        if value is None:
+            return
+        updated = conn.execute(
+            AggregateWatermark.__table__.update()
+            .where(AggregateWatermark.name == name)
+            .values(updated_at=value)
+        ).rowcount
+        if not updated:
+            conn.execute(insert(AggregateWatermark).values(name=name, updated_at=value))
+
+    def refresh_card_states(self) -> int:
+        """Recompute ``CardStateCount`` for titles with changed cards."""
+        with self.bind.begin() as conn:
+            since = self._watermark(conn, "card_states")
+            touched = conn.execute(
+                select(Card.title_id, func.max(Card.updated_at))
+                .where(Card.updated_at > since)
+                .group_by(Card.title_id)
+            ).all()
+            if not touched:
+                return 0
+            title_ids = [title_id for title_id, _ in touched]
+            rows = conn.execute(
+                select(Card.title_id, Card.batch_id, Card.retail_state, Card.user_state,
+                       func.count().label("cards"))
+                .where(Card.title_id.in_(title_ids))
+                .group_by(Card.title_id, Card.batch_id, Card.retail_state, Card.user_state)
+            ).all()
+            conn.execute(delete(CardStateCount).where(CardStateCount.title_id.in_(title_ids)))
+            if rows:
+                conn.execute(insert(CardStateCount), [dict(row._mapping) for row in rows])
+            self._set_watermark(conn, "card_states", max(updated for _, updated in touched))
+            return len(title_ids)
+
+    def refresh_listening(self) -> int:
+        """Recompute ``TitleListening`` for titles with new progress."""
+        with self.bind.begin() as conn:
+            since = self._watermark(conn, "listening")
+            touched = conn.execute(
+                select(Card.title_id, func.max(ListeningProgress.written_at))
+                .join(Card, Card.qr == ListeningProgress.qr)
+                .where(ListeningProgress.written_at > since)
+                .group_by(Card.title_id)
+            ).all()
+            if not touched:
+                return 0
+            title_ids = [title_id for title_id, _ in touched]
+            rows = conn.execute(
+                select(Card.title_id,
+                       func.count(func.distinct(ListeningProgress.user_id)).label("listeners"),
+                       func.coalesce(func.sum(ListeningProgress.position), 0).label("seconds"))
+                .join(Card, Card.qr == ListeningProgress.qr)
+                .where(Card.title_id.in_(title_ids))
+                .group_by(Card.title_id)
+            ).all()
+            conn.execute(delete(TitleListening).where(TitleListening.title_id.in_(title_ids)))
+            if rows:
+                conn.execute(insert(TitleListening), [dict(row._mapping) for row in rows])
+            self._set_watermark(conn, "listening", max(updated for _, updated in touched))
+            return len(title_ids)
+
+    def refresh(self) -> int:
+        return self.refresh_card_states() + self.refresh_listening()
+
+    async def run(self) -> None:
+        """Refresh periodically until cancelled."""
+        while True:
+            try:
+                refreshed = await asyncio.to_thread(self.refresh)
+                if refreshed:
+                    logger.debug("Refreshed dashboard aggregates for %d titles", refreshed)
+            except Exception:
+                logger.exception("Dashboard refresh failed; will retry")
+            await asyncio.sleep(self.interval)
+
+
+def read_analytics(db: Session, days: int = 30) -> dict:
+    """Assemble the dashboard from the summary tables only."""
+    titles: dict[int, dict] = {}
+
+    def title_entry(title_id: int) -> dict:
+        return titles.setdefault(title_id, {
+            "title_id": title_id, "title": None, "cards": 0,
+            "by_retail_state": defaultdict(int), "by_user_state": defaultdict(int),
+            "by_batch": defaultdict(int), "active_loans": 0,
+            "claims": 0, "lends": 0, "returns": 0, "play_auths": 0,
+            "listeners": 0, "listening_minutes": 0.0,
+        })
+
+    for title_id, name in db.exec(select(Title.id, Title.title)).all():
+        title_entry(title_id)["title"] = name
+
+    for row in db.exec(select(CardStateCount)).all():
+        entry = title_entry(row.title_id)
+        entry["cards"] += row.cards
+        entry["by_retail_state"][row.retail_state] += row.cards
+        entry["by_user_state"][str(row.user_state)] += row.cards
+        if row.batch_id is not None:
+            entry["by_batch"][str(row.batch_id)] += row.cards
+        if row.user_state == 2:
+            entry["active_loans"] += row.cards
+
+    for row in db.exec(select(TitleCounter)).all():
+        title_entry(row.title_id).update(
+            claims=row.claims, lends=row.lends, returns=row.returns, play_auths=row.play_auths)
+
+    for row in db.exec(select(TitleListening)).all():
+        title_entry(row.title_id).update(
+            listeners=row.listeners, listening_minutes=round(row.seconds / 60, 1))
+
+    since = date.today() - timedelta(days=days - 1)
+    store_names = dict(db.exec(select(Store.id, Store.name)).all())
+    stores: dict[int, dict] = {}
+    for row in db.exec(
+        select(StoreDailyClaims).where(StoreDailyClaims.day >= since)
+        .order_by(StoreDailyClaims.store_id, StoreDailyClaims.day)
+    ).all():
+        store = stores.setdefault(row.store_id, {
+            "store_id": row.store_id, "name": store_names.get(row.store_id),
+            "claims": 0, "claims_by_day": []})
+        store["claims"] += row.claims
+        store["claims_by_day"].append({"day": row.day, "claims": row.claims})
+
+    title_list = sorted(titles.values(), key=lambda t: t["title_id"])
+    for entry in title_list:
+        sold = entry["by_retail_state"].get("sold", 0)
+        claimed = entry["cards"] - entry["by_user_state"].get("0", 0)
+        entry["claim_rate"] = round(claimed / sold, 3) if sold else None
+    return {
+        "generated_at": datetime.now(timezone.utc),
+        "totals": {
+            "cards": sum(t["cards"] for t in title_list),
+            "active_loans": sum(t["active_loans"] for t in title_list),
+            "claims": sum(t["claims"] for t in title_list),
+            "listening_minutes": round(sum(t["listening_minutes"] for t in title_list), 1),
+        },
+        "titles": title_list,
+        "stores": list(stores.values()),
+    }
+
+
+dashboard_aggregator = DashboardAggregator(engine)
@@ -1,15 +1,162 @@
 # app/db.py
 
+import asyncio
 import os
+import time
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
 from sqlmodel import SQLModel, create_engine, Session, select
-from passlib.context import CryptContext
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from app import metrics
 from app.models import User, Title, Card, Store, Batch, Claim, PlaySession, ListeningProgress
 
 # 🔧 Load .env i crea engine SQLModel
 load_dotenv("/code/.env")
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://postgres:postgres@db:5432/postgres")
-engine = create_engine(DATABASE_URL, echo=True)
+
+# ⚡ Mode asíncron: es tria pel driver de DATABASE_URL (p.ex. postgresql+asyncpg://).
+# L'engine síncron es manté sempre (init_db, admin, bootstrap, flush de progrés)
+# amb el driver síncron equivalent.
+ASYNC_DRIVERS = {"asyncpg": "psycopg2", "aiosqlite": "pysqlite"}
+
+_url = make_url(DATABASE_URL)
+_backend, _, _driver = _url.drivername.partition("+")
+ASYNC_MODE = _driver in ASYNC_DRIVERS
+SYNC_DATABASE_URL = (
+    _url.set(drivername=f"{_backend}+{ASYNC_DRIVERS[_driver]}") if ASYNC_MODE else _url
+)
+
+# ⚙️ Configuració del pool i de l'engine (variables d'entorn)
+def _env_flag(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+DB_ECHO = _env_flag("DB_ECHO", False)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = _env_flag("DB_POOL_PRE_PING", True)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 0))
+# PgBouncer en mode "transaction": sense pool propi ni sentències preparades
+DB_PGBOUNCER = _env_flag("DB_PGBOUNCER", False)
+
+POOL_CHECKOUT_WAIT = metrics.histogram(
+    "avook_db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection")
+POOL_CHECKOUT_TIMEOUTS = metrics.counter(
+    "avook_db_pool_checkout_timeouts_total", "Pool checkouts that hit DB_POOL_TIMEOUT")
+POOL_CHECKED_OUT = metrics.gauge(
+    "avook_db_pool_checked_out", "Connections currently checked out of the pool")
+POOL_CAPACITY = metrics.gauge(
+    "avook_db_pool_capacity", "pool_size + max_overflow")
+POOL_SATURATION = metrics.gauge(
+    "avook_db_pool_saturation", "Checked-out connections divided by pool capacity")
+
+
+class _TimedPoolMixin:
+    """Records how long each checkout waits for a connection."""
+
+    metrics_label = "sync"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            POOL_CHECKOUT_TIMEOUTS.inc(pool=self.metrics_label)
+            raise
+        finally:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started, pool=self.metrics_label)
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    metrics_label = "sync"
+
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    metrics_label = "async"
+
+
+def _pool_capacity(pool) -> int | None:
+    if isinstance(pool, QueuePool):
+        return pool.size() + pool._max_overflow
+    return None
+
+
+def _export_pool_metrics(engine, label: str) -> None:
+    pool = engine.pool
+    capacity = _pool_capacity(pool)
+    if capacity is None:
+        return
+    POOL_CAPACITY.set(capacity, pool=label)
+    POOL_CHECKED_OUT.set_function(lambda: engine.pool.checkedout(), pool=label)
+    POOL_SATURATION.set_function(lambda: engine.pool.checkedout() / capacity, pool=label)
+
+
+def _apply_statement_timeout_per_transaction(engine) -> None:
+    # PgBouncer no reenvia paràmetres d'inici: SET LOCAL a cada transacció
+    @event.listens_for(engine, "begin")
+    def _set_statement_timeout(conn):
+        conn.exec_driver_sql(f"SET LOCAL statement_timeout = {DB_STATEMENT_TIMEOUT_MS}")
+
+
+def _engine_kwargs(url, is_async: bool) -> dict:
+    """Build ``create_engine`` keyword arguments from the DB_* settings."""
+    backend = url.get_backend_name()
+    kwargs: dict = {"echo": DB_ECHO}
+    if backend == "sqlite":
+        return kwargs
+
+    connect_args: dict = {}
+    if DB_PGBOUNCER:
+        kwargs["poolclass"] = NullPool
+        if is_async:
+            # asyncpg prepara sentències per defecte; PgBouncer no ho suporta
+            connect_args["statement_cache_size"] = 0
+            connect_args["prepared_statement_cache_size"] = 0
+    else:
+        kwargs.update(
+            poolclass=TimedAsyncQueuePool if is_async else TimedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=DB_POOL_PRE_PING,
+        )
+        if DB_STATEMENT_TIMEOUT_MS and backend == "postgresql":
+            if is_async:
+                connect_args["server_settings"] = {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
+            else:
+                connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+    if connect_args:
+        kwargs["connect_args"] = connect_args
+    return kwargs
+
+
+def create_db_engine(url):
+    url = make_url(url)
+    engine = create_engine(url, **_engine_kwargs(url, is_async=False))
+    if DB_PGBOUNCER and DB_STATEMENT_TIMEOUT_MS and url.get_backend_name() == "postgresql":
+        _apply_statement_timeout_per_transaction(engine)
+    _export_pool_metrics(engine, "sync")
+    return engine
+
+
+def create_async_db_engine(url):
+    url = make_url(url)
+    engine = create_async_engine(url, **_engine_kwargs(url, is_async=True))
+    if DB_PGBOUNCER and DB_STATEMENT_TIMEOUT_MS and url.get_backend_name() == "postgresql":
+        _apply_statement_timeout_per_transaction(engine.sync_engine)
+    _export_pool_metrics(engine.sync_engine, "async")
+    return engine
+
+
+engine = create_db_engine(SYNC_DATABASE_URL)
+async_engine = create_async_db_engine(_url) if ASYNC_MODE else None
 
 # 🔄 Inici BD
 def init_db():
@@ -20,15 +167,118 @@ def get_session():
     with Session(engine) as session:
         yield session
 
-# 🔐 Contrasenyes
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+class ThreadedSession:
+    """Awaitable facade over a sync ``Session`` with the ``AsyncSession`` API.
+
+    Used by the ``async def`` routes when DATABASE_URL has a sync driver
+    (SQLite/psycopg2): each database call runs in Starlette's thread pool
+    instead of holding a worker thread for the whole request.
+
+    Like ``AsyncSession``, it only takes a connection slot (see
+    ``_threaded_session_slots``) on its first database call and gives it back
+    when the transaction ends, so a request waiting on something else (e.g.
+    resolving the caller in a dependency) does not hold one.
+    """
+
+    def __init__(self, session: Session, slots: asyncio.Semaphore | None = None):
+        self.sync_session = session
+        self._slots = slots
+        self._has_slot = False
+
+    async def _run(self, fn, *args, **kwargs):
+        if self._slots is not None and not self._has_slot:
+            await self._slots.acquire()
+            self._has_slot = True
+        return await run_in_threadpool(fn, *args, **kwargs)
+
+    def _release_slot(self) -> None:
+        if self._has_slot:
+            self._has_slot = False
+            self._slots.release()
+
+    def add(self, instance) -> None:
+        self.sync_session.add(instance)
+
+    async def get(self, entity, ident, **kwargs):
+        return await self._run(self.sync_session.get, entity, ident, **kwargs)
+
+    async def exec(self, statement, **kwargs):
+        # Buffer the rows in the worker thread, as AsyncSession does, so the
+        # result can be consumed from the event loop without touching the DB.
+        kwargs.setdefault("execution_options", {"prebuffer_rows": True})
+        return await self._run(self.sync_session.exec, statement, **kwargs)
+
+    async def execute(self, statement, *args, **kwargs):
+        kwargs.setdefault("execution_options", {"prebuffer_rows": True})
+        return await self._run(self.sync_session.execute, statement, *args, **kwargs)
+
+    async def delete(self, instance) -> None:
+        await self._run(self.sync_session.delete, instance)
+
+    async def commit(self) -> None:
+        try:
+            await self._run(self.sync_session.commit)
+        finally:
+            # La sessió ja ha retornat la connexió al pool
+            self._release_slot()
+
+    async def rollback(self) -> None:
+        try:
+            await self._run(self.sync_session.rollback)
+        finally:
+            self._release_slot()
+
+    async def refresh(self, instance, *args, **kwargs) -> None:
+        await self._run(self.sync_session.refresh, instance, *args, **kwargs)
+
+    async def close(self) -> None:
+        try:
+            if self._has_slot:
+                await run_in_threadpool(self.sync_session.close)
+            else:
+                self.sync_session.close()  # sense connexió: no fa E/S
+        finally:
+            self._release_slot()
+
+
+# A ThreadedSession keeps its connection between awaits.  Without a bound,
+# requests holding connections can wait for a worker thread while every
+# worker thread waits for a connection, so admission is capped at the pool size.
+_capacity = _pool_capacity(engine.pool)
+_threaded_session_slots = asyncio.Semaphore(_capacity) if _capacity else None
+
+
+@asynccontextmanager
+async def async_session_scope():
+    """Open an ``AsyncSession`` in async mode, or a ``ThreadedSession``
+    wrapping a sync ``Session`` otherwise.  Both expose the same awaitable API.
+    """
+    if async_engine is not None:
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            yield session
+        return
+
+    # expire_on_commit=False com AsyncSession: llegir un atribut després del commit
+    # no ha de fer una consulta síncrona al bucle d'esdeveniments (ni fora dels slots)
+    session = ThreadedSession(Session(engine, expire_on_commit=False), _threaded_session_slots)
+    try:
+        yield session
+    finally:
+        await session.close()
+
+
+async def get_async_session():
+    """Dependency for ``async def`` routes (see ``async_session_scope``)."""
+    async with async_session_scope() as session:
+        yield session
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+# 🔐 Contrasenyes (veure app/passwords.py; versions síncrones per a scripts)
+from app.passwords import hash_password, verify_password
 
 # 👤 Consultes usuari
 def get_user_by_email(email: str, db: Session) -> User | None:
     return db.exec(select(User).where(User.email == email)).first()
+
+async def get_user_by_email_async(email: str, db: AsyncSession | ThreadedSession) -> User | None:
+    return (await db.exec(select(User).where(User.email == email))).first()
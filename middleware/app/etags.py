@@ -0,0 +1,21 @@
+"""
+ETag helpers for conditional GETs (``If-None-Match`` -> ``304``).
+"""
+
+import hashlib
+
+
+def make_etag(*parts, weak: bool = False) -> str:
+    """Hash ``parts`` into a quoted entity tag."""
+    digest = hashlib.blake2b("\x1f".join(map(str, parts)).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"' if weak else f'"{digest}"'
+
+
+def if_none_match(header: str | None, etag: str) -> bool:
+    """True if the ``If-None-Match`` header matches ``etag`` (weak comparison)."""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    bare = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == bare for tag in header.split(","))
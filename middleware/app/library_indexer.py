@@ -0,0 +1,304 @@
+"""
+Incremental indexer of the Audiobookshelf library.
+
+Every folder under ``LIBRARY_ROOT`` that contains a ``metadata.json`` is a
+book.  A scan only lists directories and stats their entries; a folder's
+*signature* is a hash of the names, sizes and mtimes of its files, and
+folders whose signature matches the ``LibraryFolder`` manifest are skipped.
+Changed folders are parsed in a process pool (``LIBRARY_INDEX_WORKERS``;
+small batches are parsed inline) and written in one transaction:
+
+* ``Title`` rows are upserted on ``library_path``.  A title entered by hand
+  (``library_path`` NULL) whose normalized title + author matches a new
+  folder, uniquely on both sides, is adopted by that folder instead of
+  duplicated.  New titles start inactive, with price 0, until an admin
+  prices and activates them; existing ones only get their title, author
+  and language refreshed.  ``duration_sec`` (the end of the last chapter)
+  only fills an empty duration: the exact one comes from ``app.seek_index``.
+* ``Chapter`` rows of each changed title are replaced.
+* Titles whose folder disappeared are deactivated, and the manifest row is
+  kept with ``missing_since``; if the folder comes back, the titles the
+  indexer deactivated (``auto_deactivated``) are activated again.
+
+Covers of the indexed folders are then thumbnailed (``app/covers.py``).
+
+Run it by hand with ``python -m app.library_indexer [--full]`` or set
+``LIBRARY_INDEX_INTERVAL_SEC`` to re-index from the ``lifespan`` hook.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+from sqlalchemy import bindparam, case, delete, insert, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection, Engine
+
+from app import chapters, title_search
+from app.covers import build_covers
+from app.db import engine, init_db
+from app.models import Chapter, LibraryFolder, Title
+from app.models.title import normalize_search_text
+from app.streaming import LIBRARY_ROOT
+
+logger = logging.getLogger(__name__)
+
+INDEX_INTERVAL_SEC = float(os.getenv("LIBRARY_INDEX_INTERVAL_SEC", 0))  # 0 = només per CLI
+INDEX_WORKERS = int(os.getenv("LIBRARY_INDEX_WORKERS", os.cpu_count() or 1))
+DEFAULT_LANGUAGE = os.getenv("LIBRARY_DEFAULT_LANGUAGE", "ca")
+DEFAULT_CURRENCY = os.getenv("LIBRARY_DEFAULT_CURRENCY", "EUR")
+METADATA_FILE = "metadata.json"
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".webp")
+POOL_MIN_FOLDERS = 32  # per sota, el cost d'arrencar el pool no compensa
+SQL_CHUNK = 500
+
+_UPSERT_DIALECTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+@dataclass
+class IndexResult:
+    scanned: int = 0
+    indexed: int = 0
+    removed: int = 0
+    failed: int = 0
+    adopted: int = 0
+
+
+def scan_library(root: Path) -> dict[str, str]:
+    """``{folder relative to root: signature}`` for every book folder."""
+    folders = {}
+    stack = [Path(root)]
+    while stack:
+        current = stack.pop()
+        try:
+            entries = list(os.scandir(current))
+        except OSError:
+            continue
+        if any(e.name == METADATA_FILE and e.is_file() for e in entries):
+            digest = hashlib.blake2b(digest_size=16)
+            for e in sorted(entries, key=lambda e: e.name):
+                if e.is_file():
+                    stat = e.stat()
+                    digest.update(f"{e.name}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+            folders[current.relative_to(root).as_posix()] = digest.hexdigest()
+            continue
+        stack.extend(Path(e.path) for e in entries if e.is_dir() and not e.name.startswith("."))
+    return folders
+
+
+def parse_folder(root: str, path: str) -> dict:
+    """Read one book folder (runs in the pool's worker processes)."""
+    folder = Path(root) / path
+    try:
+        with open(folder / METADATA_FILE, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        names = sorted(p.name for p in folder.iterdir() if p.is_file())
+        chapters = [
+            {"idx": i, "start_sec": float(c["start"]), "end_sec": float(c["end"]),
+             "name": str(c.get("title") or f"{i + 1}")}
+            for i, c in enumerate(sorted(meta.get("chapters") or [], key=lambda c: float(c["start"])))
+        ]
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as exc:
+        return {"path": path, "error": f"{type(exc).__name__}: {exc}"}
+
+    images = [n for n in names if n.lower().endswith(IMAGE_SUFFIXES)]
+    covers = [n for n in images if n.lower().startswith("cover")] or images
+    authors = meta.get("authors") or []
+    return {
+        "path": path,
+        "title": meta.get("title") or folder.name,
+        "author": ", ".join(authors) if isinstance(authors, list) else str(authors),
+        "language": meta.get("language") or DEFAULT_LANGUAGE,
+        "duration_sec": math.ceil(chapters[-1]["end_sec"]) if chapters else 0,
+        "chapters": chapters,
+        "cover_file": covers[0] if covers else None,
+    }
+
+
+def _chunks(items: list, size: int = SQL_CHUNK):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class LibraryIndexer:
+    def __init__(self, bind: Engine, root: Path = LIBRARY_ROOT, workers: int = INDEX_WORKERS,
+                 interval: float = INDEX_INTERVAL_SEC):
+        self.bind = bind
+        self.root = Path(root)
+        self.workers = workers
+        self.interval = interval
+
+    def _parse(self, paths: list[str]) -> list[dict]:
+        if self.workers <= 0 or len(paths) < POOL_MIN_FOLDERS:
+            return [parse_folder(str(self.root), p) for p in paths]
+        # spawn: no hereta fils ni connexions del procés del servidor
+        with ProcessPoolExecutor(max_workers=self.workers,
+                                 mp_context=multiprocessing.get_context("spawn")) as pool:
+            chunksize = max(1, len(paths) // (self.workers * 4))
+            return list(pool.map(parse_folder, [str(self.root)] * len(paths), paths, chunksize=chunksize))
+
+    def _upsert(self, conn: Connection, model, rows: list[dict], keys: list[str], columns,
+                fill_empty=()) -> None:
+        """Upsert ``rows``; ``fill_empty`` columns are only set where 0 or NULL."""
+        upsert = _UPSERT_DIALECTS.get(conn.dialect.name)
+        if upsert is None:
+            raise RuntimeError(f"Unsupported dialect for library indexer: {conn.dialect.name}")
+        table = model.__table__
+        for chunk in _chunks(rows):
+            stmt = upsert(table)
+            set_ = {c: stmt.excluded[c] for c in columns}
+            set_.update({c: case((or_(table.c[c].is_(None), table.c[c] == 0), stmt.excluded[c]),
+                                 else_=table.c[c]) for c in fill_empty})
+            stmt = stmt.on_conflict_do_update(index_elements=keys, set_=set_)
+            conn.execute(stmt, chunk)
+
+    def _adopt(self, conn: Connection, books: list[dict]) -> int:
+        """Point hand-entered titles at the new folder with the same title + author."""
+        known = set()
+        for chunk in _chunks([b["path"] for b in books]):
+            known.update(conn.execute(select(Title.library_path).where(Title.library_path.in_(chunk))).scalars())
+        new_books = [b for b in books if b["path"] not in known]
+        if not new_books:
+            return 0
+        orphans: dict[str, list[int]] = {}
+        for title_id, title, author in conn.execute(
+                select(Title.id, Title.title, Title.author).where(Title.library_path.is_(None))):
+            orphans.setdefault(normalize_search_text(f"{title} {author}"), []).append(title_id)
+        if not orphans:
+            return 0
+        texts: dict[str, list[str]] = {}
+        for b in new_books:
+            texts.setdefault(normalize_search_text(f"{b['title']} {b['author']}"), []).append(b["path"])
+        # Només coincidències úniques: amb dubtes, millor un duplicat inactiu que un títol equivocat
+        adopted = [{"tid": orphans[text][0], "path": paths[0]}
+                   for text, paths in texts.items() if len(paths) == 1 and len(orphans.get(text, ())) == 1]
+        if adopted:
+            table = Title.__table__
+            conn.execute(update(table).where(table.c.id == bindparam("tid")).values(library_path=bindparam("path")),
+                         adopted)
+        return len(adopted)
+
+    def _write(self, conn: Connection, books: list[dict], signatures: dict[str, str],
+               removed: list[str]) -> int:
+        now = datetime.now(timezone.utc)
+        adopted = 0
+        if books:
+            adopted = self._adopt(conn, books)
+            self._upsert(conn, Title, [
+                {"library_path": b["path"], "title": b["title"], "author": b["author"],
+                 "language": b["language"], "duration_sec": b["duration_sec"],
+                 "search_text": normalize_search_text(f"{b['title']} {b['author']}"),
+                 "price_retail": 0, "currency": DEFAULT_CURRENCY, "active": False}
+                for b in books
+            ], ["library_path"], ("title", "author", "language", "search_text"), fill_empty=("duration_sec",))
+
+            title_ids = {}
+            for chunk in _chunks([b["path"] for b in books]):
+                title_ids.update((path, title_id) for title_id, path in conn.execute(
+                    select(Title.id, Title.library_path).where(Title.library_path.in_(chunk))))
+            for chunk in _chunks(list(title_ids.values())):
+                conn.execute(delete(Chapter).where(Chapter.title_id.in_(chunk)))
+            chapter_rows = [{"title_id": title_ids[b["path"]], **c} for b in books for c in b["chapters"]]
+            for chunk in _chunks(chapter_rows, SQL_CHUNK * 10):
+                conn.execute(insert(Chapter), chunk)
+
+            # Carpetes que tornen: reactiva els títols que va desactivar l'indexador
+            for chunk in _chunks([b["path"] for b in books]):
+                conn.execute(update(Title).where(Title.id.in_(
+                    select(LibraryFolder.title_id)
+                    .where(LibraryFolder.path.in_(chunk), LibraryFolder.auto_deactivated)
+                )).values(active=True))
+            self._upsert(conn, LibraryFolder, [
+                {"path": b["path"], "signature": signatures[b["path"]], "title_id": title_ids[b["path"]],
+                 "cover_file": b["cover_file"], "indexed_at": now, "missing_since": None,
+                 "auto_deactivated": False}
+                for b in books
+            ], ["path"], ("signature", "title_id", "cover_file", "indexed_at", "missing_since",
+                          "auto_deactivated"))
+
+        for chunk in _chunks(removed):
+            was_active = (select(Title.id)
+                          .where(Title.library_path == LibraryFolder.path, Title.active)
+                          .exists())
+            conn.execute(update(LibraryFolder).where(LibraryFolder.path.in_(chunk))
+                         .values(missing_since=now, auto_deactivated=was_active))
+            conn.execute(update(Title).where(Title.library_path.in_(chunk)).values(active=False))
+        return adopted
+
+    def index(self, full: bool = False) -> IndexResult:
+        """Index new and changed folders; ``full`` ignores the manifest."""
+        if not self.root.is_dir():
+            raise FileNotFoundError(f"Library root not found: {self.root}")
+        folders = scan_library(self.root)
+        with self.bind.connect() as conn:
+            manifest = {path: (signature, missing_since) for path, signature, missing_since in conn.execute(
+                select(LibraryFolder.path, LibraryFolder.signature, LibraryFolder.missing_since))}
+        changed = sorted(p for p, sig in folders.items() if full or manifest.get(p) != (sig, None))
+        # Una biblioteca buida sol ser un volum sense muntar: no desactivis res
+        removed = sorted(p for p, (_, missing_since) in manifest.items()
+                         if missing_since is None and p not in folders) if folders else []
+        result = IndexResult(scanned=len(folders), removed=len(removed))
+        if not changed and not removed:
+            return result
+
+        books = []
+        for parsed in self._parse(changed):
+            if "error" in parsed:
+                result.failed += 1
+                logger.warning("Cannot index %s: %s", parsed["path"], parsed["error"])
+            else:
+                books.append(parsed)
+        with self.bind.begin() as conn:
+            result.adopted = self._write(conn, books, folders, removed)
+        result.indexed = len(books)
+        build_covers(self.bind, root=self.root, workers=self.workers,
+                     paths=[b["path"] for b in books if b["cover_file"]])
+        title_search.invalidate()
+        chapters.invalidate()
+        return result
+
+    async def run(self) -> None:
+        """Re-index periodically until cancelled (disabled if interval is 0)."""
+        if self.interval <= 0:
+            return
+        while True:
+            try:
+                result = await asyncio.to_thread(self.index)
+                if result.indexed or result.removed:
+                    logger.info("Library indexed: %s", result)
+            except Exception:
+                logger.exception("Library indexing failed; will retry")
+            await asyncio.sleep(self.interval)
+
+
+library_indexer = LibraryIndexer(engine)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index the audiobook library into Title and Chapter.")
+    parser.add_argument("--root", type=Path, default=LIBRARY_ROOT)
+    parser.add_argument("--full", action="store_true", help="re-parse every folder, ignoring the manifest")
+    parser.add_argument("--workers", type=int, default=INDEX_WORKERS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    result = LibraryIndexer(engine, root=args.root, workers=args.workers).index(full=args.full)
+    print(f"{result.scanned} folders, {result.indexed} indexed ({result.adopted} adopted), "
+          f"{result.removed} removed, {result.failed} failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,54 @@
 # app/main.py
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.db import init_db
+from sqlmodel import Session
+from app.db import engine, init_db
+from app.title_search import backfill_search_text
+from app.passwords import password_hasher
+from app.progress_buffer import progress_buffer
+from app.session_sweeper import play_session_sweeper
+from app.session_store import session_store
+from app.card_events import card_event_consumer
+from app.dashboard import dashboard_aggregator
+from app.library_indexer import library_indexer
+from app.abs_sync import abs_sync
+from app.translations import translations
+from app.superuser import superuser_config
 from app.api.v1 import router as v1_router
 from app.api.admin import router as admin_router
 from app.api.su import router as su_router
+from app.api.metrics import router as metrics_router
+from app.api.stream import router as stream_router
+from app.api.covers import router as covers_router
+from app.streaming import file_handles
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     init_db()          # s’executa al startup
-    yield              # aquí vindria el shutdown, si cal
+    with Session(engine) as session:
+        backfill_search_text(session)
+    translations.load()  # 🌐 traduccions a memòria; es recarreguen si canvia el fitxer
+    superuser_config.get()  # 🔐 valida superuser.json d'entrada (registra l'error si cal)
+    flusher = asyncio.create_task(progress_buffer.run())
+    sweeper = asyncio.create_task(play_session_sweeper.run())
+    consumer = asyncio.create_task(card_event_consumer.run())
+    aggregator = asyncio.create_task(dashboard_aggregator.run())
+    indexer = asyncio.create_task(library_indexer.run())
+    syncer = asyncio.create_task(abs_sync.run())
+    yield
+    # 🛑 Shutdown: atura les tasques de fons i buida el buffer de progrés
+    for task in (flusher, sweeper, consumer, aggregator, indexer, syncer):
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    await progress_buffer.drain()
+    await session_store.close()
+    password_hasher.shutdown()
+    file_handles.close()
 
 app = FastAPI(title="Audiovook Middleware",
               version="0.1.0",
@@ -33,3 +71,6 @@ app.add_middleware(
 app.include_router(v1_router, prefix="/api/v1")
 app.include_router(admin_router, prefix="/api/v1/admin")
 app.include_router(su_router, prefix="/api/v1/su")
+app.include_router(metrics_router)
+app.include_router(stream_router)
+app.include_router(covers_router)
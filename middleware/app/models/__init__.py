@@ -6,6 +6,9 @@ from .title import Title
 from .card import Card
 from .store import Store
 from .batch import Batch
+from .card_event import CardEvent, EventOffset, TitleCounter
+from .dashboard import AggregateWatermark, CardStateCount, StoreDailyClaims, TitleListening
+from .library import Chapter, LibraryFolder
 
 __all__ = [
     "User",
@@ -16,4 +19,13 @@ __all__ = [
     "Card",
     "Store",
     "Batch",
+    "CardEvent",
+    "EventOffset",
+    "TitleCounter",
+    "AggregateWatermark",
+    "CardStateCount",
+    "StoreDailyClaims",
+    "TitleListening",
+    "Chapter",
+    "LibraryFolder",
 ]
@@ -1,9 +1,24 @@
 from sqlmodel import SQLModel, Field
+from sqlalchemy import DDL, Index, event
 from typing import Optional
 from datetime import datetime
 from uuid import UUID
 
 class Card(SQLModel, table=True):
+    __table_args__ = (
+        # Filtres de /admin/cards + ordre de paginació (qr o updated_at)
+        Index("ix_card_title_states_qr", "title_id", "user_state", "retail_state", "qr"),
+        Index("ix_card_store_states_qr", "store_id", "user_state", "retail_state", "qr"),
+        Index("ix_card_states_qr", "user_state", "retail_state", "qr"),
+        Index("ix_card_updated_qr", "updated_at", "qr"),
+        # Biblioteca de l'usuari (/me/library), paginada per qr
+        Index("ix_card_owner_qr", "owner_user_id", "qr"),
+        Index("ix_card_borrower_qr", "borrower_user_id", "qr"),
+        # Cerca per subcadena de QR (LIKE '%q%') a Postgres
+        Index("ix_card_qr_trgm", "qr", postgresql_using="gin",
+              postgresql_ops={"qr": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+    )
+
     qr: str = Field(primary_key=True)
     title_id: int = Field(foreign_key="title.id")
     user_state: int = Field(default=0)
@@ -14,5 +29,14 @@ class Card(SQLModel, table=True):
     batch_id: Optional[int] = Field(default=None, foreign_key="batch.id")
     claimed_at: Optional[datetime] = None
     lent_at: Optional[datetime] = None
-    updated_at: Optional[datetime] = Field(default_factory=datetime.utcnow, nullable=False)
+    # onupdate: qualsevol canvi d'estat renova l'ETag de /abook/{qr}/status
+    updated_at: Optional[datetime] = Field(default_factory=datetime.utcnow, nullable=False,
+                                           sa_column_kwargs={"onupdate": datetime.utcnow})
     notes: Optional[str] = None
+
+
+event.listen(
+    SQLModel.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
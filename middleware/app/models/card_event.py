@@ -0,0 +1,79 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import BigInteger, Column, DDL, Integer, Sequence, SmallInteger, event
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from typing import Optional
+from datetime import datetime, timezone
+from uuid import UUID
+
+# Tipus d'esdeveniment (SmallInteger per mantenir la taula compacta)
+EVENT_CLAIM = 1
+EVENT_LEND = 2
+EVENT_RETURN = 3
+EVENT_PLAY_AUTH = 4
+EVENT_RETAIL_STATE = 5
+
+card_event_id_seq = Sequence("cardevent_id_seq", metadata=SQLModel.metadata)
+
+
+class next_card_event_id(FunctionElement):
+    """Next event id: a sequence on Postgres, ``max(id) + 1`` on SQLite
+    (where the id cannot autoincrement as part of a composite key, and
+    writers are serialised anyway)."""
+
+    type = BigInteger()
+    inherit_cache = True
+
+
+@compiles(next_card_event_id)
+def _next_id_default(element, compiler, **kw):
+    return "(SELECT coalesce(max(id), 0) + 1 FROM cardevent)"
+
+
+@compiles(next_card_event_id, "postgresql")
+def _next_id_postgresql(element, compiler, **kw):
+    return "nextval('cardevent_id_seq')"
+
+
+class CardEvent(SQLModel, table=True):
+    """Append-only log of card state changes, written in the same
+    transaction as the change.  Partitioned by month on Postgres, hence
+    ``occurred_at`` in the primary key.  Consumed by ``app.card_events``.
+    """
+
+    __table_args__ = {"postgresql_partition_by": "RANGE (occurred_at)"}
+
+    id: Optional[int] = Field(default=None, sa_column=Column(
+        BigInteger().with_variant(Integer, "sqlite"), primary_key=True,
+        autoincrement=False, default=next_card_event_id()))
+    occurred_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), primary_key=True)
+    kind: int = Field(sa_column=Column(SmallInteger, nullable=False))
+    qr: str = Field(index=True)
+    title_id: int
+    user_id: Optional[UUID] = None
+    peer_user_id: Optional[UUID] = None  # prestatari en préstecs i devolucions
+    detail: Optional[str] = None  # p.ex. el nou retail_state
+
+
+class EventOffset(SQLModel, table=True):
+    """Last ``CardEvent.id`` applied by each consumer."""
+
+    consumer: str = Field(primary_key=True)
+    last_id: int = Field(default=0, sa_column_kwargs={"nullable": False})
+
+
+class TitleCounter(SQLModel, table=True):
+    """Per-title totals materialised from ``CardEvent``."""
+
+    title_id: int = Field(primary_key=True, foreign_key="title.id")
+    claims: int = 0
+    lends: int = 0
+    returns: int = 0
+    play_auths: int = 0
+    updated_at: Optional[datetime] = None
+
+
+# 🗓️ Postgres: partició per defecte; les mensuals les crea app.card_events
+event.listen(CardEvent.__table__, "after_create", DDL(
+    "CREATE TABLE IF NOT EXISTS cardevent_default PARTITION OF cardevent DEFAULT"
+).execute_if(dialect="postgresql"))
@@ -0,0 +1,38 @@
+from sqlmodel import SQLModel, Field
+from typing import Optional
+from datetime import date, datetime
+
+# Taules de resum per al tauler d'administració (veure app/dashboard.py)
+
+class CardStateCount(SQLModel, table=True):
+    """Cards per title × batch × retail_state × user_state."""
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    title_id: int = Field(index=True)
+    batch_id: Optional[int] = None
+    retail_state: str
+    user_state: int
+    cards: int
+
+
+class TitleListening(SQLModel, table=True):
+    """Listeners and summed furthest positions per title."""
+
+    title_id: int = Field(primary_key=True)
+    listeners: int = 0
+    seconds: float = 0
+
+
+class StoreDailyClaims(SQLModel, table=True):
+    """Claims of cards assigned to a store, per UTC day."""
+
+    store_id: int = Field(primary_key=True)
+    day: date = Field(primary_key=True)
+    claims: int = 0
+
+
+class AggregateWatermark(SQLModel, table=True):
+    """Newest source ``updated_at`` folded into each summary table."""
+
+    name: str = Field(primary_key=True)
+    updated_at: datetime
@@ -0,0 +1,31 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
+from typing import Optional
+from datetime import datetime
+
+# Taules mantingudes per l'indexador de la biblioteca (veure app/library_indexer.py)
+
+class Chapter(SQLModel, table=True):
+    """Chapters of a title, from the ``metadata.json`` of its folder."""
+
+    __table_args__ = (Index("ix_chapter_title_idx", "title_id", "idx", unique=True),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    title_id: int = Field(foreign_key="title.id")
+    idx: int  # ordre dins del títol, des de 0
+    start_sec: float
+    end_sec: float
+    name: str
+
+
+class LibraryFolder(SQLModel, table=True):
+    """Manifest of indexed book folders: a folder whose entries keep the same
+    names, sizes and mtimes (``signature``) is not parsed again."""
+
+    path: str = Field(primary_key=True)  # relativa a LIBRARY_ROOT
+    signature: str
+    title_id: Optional[int] = Field(default=None, foreign_key="title.id")
+    cover_file: Optional[str] = None
+    indexed_at: datetime
+    missing_since: Optional[datetime] = None  # la carpeta ha desaparegut de la biblioteca
+    auto_deactivated: bool = False  # l'indexador va desactivar el títol; es reactiva si torna
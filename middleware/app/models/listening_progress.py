@@ -1,10 +1,17 @@
 from sqlmodel import SQLModel, Field
+from sqlalchemy import UniqueConstraint
 from uuid import UUID, uuid4
 from datetime import datetime, timezone
+from typing import Optional
 
 class ListeningProgress(SQLModel, table=True):
+    __table_args__ = (UniqueConstraint("user_id", "qr", name="uq_listeningprogress_user_qr"),)
+
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     user_id: UUID = Field(foreign_key="user.id")
     qr: str = Field(index=True)
     position: float = Field(nullable=False)
-    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), index=True)  # hora del heartbeat
+    # Hora d'escriptura a la BD (el buffer escriu tard); indexat: el tauler
+    # recalcula només els títols amb progrés escrit des de la darrera passada
+    written_at: Optional[datetime] = Field(default_factory=lambda: datetime.now(timezone.utc), index=True)
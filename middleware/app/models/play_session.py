@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
 from typing import Optional
 from datetime import datetime, timezone
 
@@ -7,11 +8,16 @@ class PlaySession(SQLModel, table=True):
 
     A session records when a signed playback URL was issued and when it
     expires.  The default for ``issued_at`` uses UTC to avoid timezone
-    confusion.
+    confusion.  Expired rows are deleted by ``app.session_sweeper``.
     """
 
+    __table_args__ = (
+        # Sessions actives d'un QR: WHERE qr = ? AND expires_at > now()
+        Index("ix_playsession_qr_expires_at", "qr", "expires_at"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
-    qr: str = Field(index=True)
+    qr: str  # indexat per ix_playsession_qr_expires_at
     device_id: str | None = None
     issued_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
-    expires_at: datetime
+    expires_at: datetime = Field(index=True)
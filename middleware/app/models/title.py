@@ -1,7 +1,20 @@
 from sqlmodel import SQLModel, Field
+from sqlalchemy import DDL, Index, event, text
 from typing import Optional
+import unicodedata
+
+# Expressió indexada a Postgres; les consultes han de fer servir la mateixa
+SEARCH_VECTOR_SQL = "to_tsvector('simple', coalesce(search_text, ''))"
 
 class Title(SQLModel, table=True):
+    __table_args__ = (
+        # 🔎 Postgres: full-text (tsvector) + trigrames sobre search_text
+        Index("ix_title_search_tsv", text(SEARCH_VECTOR_SQL),
+              postgresql_using="gin").ddl_if(dialect="postgresql"),
+        Index("ix_title_search_trgm", "search_text", postgresql_using="gin",
+              postgresql_ops={"search_text": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     title: str
     author: str
@@ -9,6 +22,38 @@ class Title(SQLModel, table=True):
     duration_sec: int
     cover_url: Optional[str] = None
     abs_share_code: Optional[str] = Field(default=None, unique=True)
+    # Carpeta del llibre dins LIBRARY_ROOT (p.ex. "0-ABS-CAT-local-/Aussias_Mach")
+    library_path: Optional[str] = Field(default=None, unique=True)
     price_retail: float
     currency: str
     active: bool = Field(default=True)
+    # Títol + autor en minúscules i sense accents; mantingut automàticament
+    search_text: Optional[str] = Field(default=None, exclude=True)
+
+
+def normalize_search_text(value: str) -> str:
+    """Casefold and strip accents, e.g. "Ausiàs Marc" -> "ausias marc"."""
+    decomposed = unicodedata.normalize("NFKD", value)
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(stripped.casefold().split())
+
+
+@event.listens_for(Title, "before_insert")
+@event.listens_for(Title, "before_update")
+def _set_search_text(mapper, connection, target: Title) -> None:
+    target.search_text = normalize_search_text(f"{target.title or ''} {target.author or ''}")
+
+
+# 🔎 SQLite (tests): taula FTS5 amb contingut extern, sincronitzada per triggers
+for _statement in (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS title_fts USING fts5("
+    "search_text, content='title', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS title_fts_ai AFTER INSERT ON title BEGIN "
+    "INSERT INTO title_fts(rowid, search_text) VALUES (new.id, new.search_text); END",
+    "CREATE TRIGGER IF NOT EXISTS title_fts_ad AFTER DELETE ON title BEGIN "
+    "INSERT INTO title_fts(title_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text); END",
+    "CREATE TRIGGER IF NOT EXISTS title_fts_au AFTER UPDATE ON title BEGIN "
+    "INSERT INTO title_fts(title_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text); "
+    "INSERT INTO title_fts(rowid, search_text) VALUES (new.id, new.search_text); END",
+):
+    event.listen(Title.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
@@ -0,0 +1,31 @@
+"""
+Opaque cursors for keyset pagination.
+
+A cursor is the sort key of the last row of a page, JSON-encoded and
+base64url-wrapped.  Clients pass it back unchanged to get the next page;
+the query then continues with ``WHERE (key) > (cursor)`` instead of an
+``OFFSET``, so every page costs the same regardless of depth.
+"""
+
+import base64
+import json
+from datetime import datetime
+
+from fastapi import HTTPException
+
+
+def encode_cursor(*values) -> str:
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="INVALID_CURSOR")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="INVALID_CURSOR")
+    return values
@@ -0,0 +1,132 @@
+"""
+Password hashing service.
+
+bcrypt costs ~100-300 ms of CPU per call, so hashing and verification run
+in a dedicated ``ProcessPoolExecutor`` instead of the request worker.  The
+number of calls queued or running is bounded by ``PASSWORD_HASH_QUEUE``;
+beyond that callers get ``503`` with ``Retry-After`` rather than piling up
+behind a login storm.  If a pool process dies (OOM killer, ``kill``), the
+broken pool is replaced and the call retried once before answering ``503``.
+
+``verify_and_update`` also returns a fresh hash when the stored one uses
+outdated parameters (e.g. fewer ``BCRYPT_ROUNDS``), so login can rehash
+transparently.
+"""
+
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from starlette.concurrency import run_in_threadpool
+
+from app import metrics
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+# 0 = sense procés dedicat (fil del threadpool), útil en tests i desenvolupament
+HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", max(HASH_WORKERS, 1) * 4))
+RETRY_AFTER_SEC = int(os.getenv("PASSWORD_HASH_RETRY_AFTER_SEC", 1))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+IN_FLIGHT = metrics.gauge(
+    "avook_password_hash_in_flight", "Password hash/verify calls queued or running")
+REJECTED = metrics.counter(
+    "avook_password_hash_rejected_total", "Password hash/verify calls shed with 503")
+
+
+# Funcions síncrones: s'executen dins dels processos del pool
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+def verify_and_update(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+class PasswordHasher:
+    """Runs the functions above in a bounded process pool."""
+
+    def __init__(self, workers: int = HASH_WORKERS, max_queue: int = HASH_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor: Executor | None = None
+        self._in_flight = 0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            # spawn: no hereta fils ni connexions del procés del servidor
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def _discard(self, executor: Executor) -> None:
+        # Només el primer que ho detecta el treu; els altres ja agafaran el nou
+        if self._executor is executor:
+            self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _run_in_pool(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        for attempt in range(2):
+            executor = self._get_executor()
+            try:
+                return await loop.run_in_executor(executor, fn, *args)
+            except BrokenProcessPool:
+                # Un procés del pool ha mort: el pool ja no accepta feina, cal refer-lo
+                self._discard(executor)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="PASSWORD_HASHER_UNAVAILABLE",
+            headers={"Retry-After": str(RETRY_AFTER_SEC)},
+        )
+
+    async def _submit(self, fn, *args):
+        if self._in_flight >= self.max_queue:
+            REJECTED.inc()
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="PASSWORD_HASHER_BUSY",
+                headers={"Retry-After": str(RETRY_AFTER_SEC)},
+            )
+        self._in_flight += 1
+        IN_FLIGHT.inc()
+        try:
+            if self.workers <= 0:
+                return await run_in_threadpool(fn, *args)
+            return await self._run_in_pool(fn, *args)
+        finally:
+            self._in_flight -= 1
+            IN_FLIGHT.dec()
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str | None) -> bool:
+        if not hashed_password:
+            return False
+        try:
+            return await self._submit(verify_password, plain_password, hashed_password)
+        except ValueError:
+            # Hash mal format (p.ex. superuser.json sense configurar)
+            return False
+
+    async def verify_and_update(self, plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+        try:
+            return await self._submit(verify_and_update, plain_password, hashed_password)
+        except ValueError:
+            return False, None
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,155 @@
+"""
+Write-behind buffer for listening-progress heartbeats.
+
+Players report their position every few seconds.  Instead of one
+SELECT + UPDATE/INSERT + COMMIT per heartbeat, positions are merged in
+memory per ``(user_id, qr)`` keeping only the latest value, and written
+periodically as a single batched ``INSERT ... ON CONFLICT DO UPDATE`` on the
+unique ``(user_id, qr)`` key of ``ListeningProgress``.
+
+A position is never held for longer than ``PROGRESS_FLUSH_INTERVAL_SEC``
+seconds (or until ``PROGRESS_BUFFER_MAX_PENDING`` keys are pending, which
+triggers an early flush).  The buffer is drained on shutdown from the
+``lifespan`` hook in ``app/main.py``.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+from uuid import UUID, uuid4
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine
+
+from app.db import engine
+from app.models import ListeningProgress
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL_SEC = float(os.getenv("PROGRESS_FLUSH_INTERVAL_SEC", 5))
+MAX_PENDING = int(os.getenv("PROGRESS_BUFFER_MAX_PENDING", 5000))
+
+_UPSERT_DIALECTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+class ProgressBuffer:
+    """In-memory, last-write-wins buffer of listening positions.
+
+    ``record`` and ``get`` are safe to call from FastAPI's worker threads and
+    from the event loop; ``flush`` may block on the database and is run in a
+    thread by the background task started with ``run``.
+    """
+
+    def __init__(self, bind: Engine, flush_interval: float = FLUSH_INTERVAL_SEC,
+                 max_pending: int = MAX_PENDING):
+        self.bind = bind
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: dict[tuple[UUID, str], tuple[float, datetime]] = {}
+        # Rows taken out of ``_pending`` by a flush that has not committed yet.
+        # Reads consult them so a position never "disappears" mid-flush.
+        self._inflight: dict[tuple[UUID, str], tuple[float, datetime]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wakeup: asyncio.Event | None = None
+
+    def record(self, user_id: UUID, qr: str, position: float) -> None:
+        """Buffer the latest ``position`` of ``user_id`` for ``qr``."""
+        with self._lock:
+            self._pending[(user_id, qr)] = (position, datetime.now(timezone.utc))
+            full = len(self._pending) >= self.max_pending
+        if full and self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def get(self, user_id: UUID, qr: str) -> float | None:
+        """Return a buffered position not yet persisted, or ``None``."""
+        entry = self.peek(user_id, qr)
+        return entry[0] if entry else None
+
+    def peek(self, user_id: UUID, qr: str) -> tuple[float, datetime] | None:
+        """Like ``get``, but also return when the heartbeat was recorded."""
+        key = (user_id, qr)
+        with self._lock:
+            return self._pending.get(key) or self._inflight.get(key)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self) -> int:
+        """Write every pending position in one upsert and return the row count.
+
+        On failure the batch is merged back into the buffer (without
+        overwriting newer heartbeats) and the exception is re-raised.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._inflight = batch
+            if not batch:
+                return 0
+
+            rows = [
+                {"id": uuid4(), "user_id": user_id, "qr": qr,
+                 "position": position, "updated_at": updated_at}
+                for (user_id, qr), (position, updated_at) in batch.items()
+            ]
+            try:
+                self._upsert(rows)
+            except Exception:
+                with self._lock:
+                    for key, value in batch.items():
+                        self._pending.setdefault(key, value)
+                    self._inflight = {}
+                raise
+            with self._lock:
+                self._inflight = {}
+            return len(rows)
+
+    def _upsert(self, rows: list[dict]) -> None:
+        table = ListeningProgress.__table__
+        insert = _UPSERT_DIALECTS.get(self.bind.dialect.name)
+        if insert is None:
+            raise RuntimeError(f"Unsupported dialect for progress upsert: {self.bind.dialect.name}")
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.qr],
+            set_={"position": stmt.excluded.position, "updated_at": stmt.excluded.updated_at,
+                  "written_at": stmt.excluded.written_at},
+        )
+        # updated_at és l'hora del heartbeat; written_at, la d'aquest intent (un reintent la renova)
+        written_at = datetime.now(timezone.utc)
+        with self.bind.begin() as conn:
+            conn.execute(stmt, [{**row, "written_at": written_at} for row in rows])
+
+    async def run(self) -> None:
+        """Flush periodically until cancelled."""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                flushed = await asyncio.to_thread(self.flush)
+                if flushed:
+                    logger.debug("Flushed %d listening-progress rows", flushed)
+            except Exception:
+                logger.exception("Listening-progress flush failed; will retry")
+
+    async def drain(self) -> None:
+        """Persist everything still buffered (used on shutdown)."""
+        self._loop = None
+        self._wakeup = None
+        await asyncio.to_thread(self.flush)
+
+
+progress_buffer = ProgressBuffer(engine)
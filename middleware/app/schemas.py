@@ -11,6 +11,7 @@ payload still explains the reason and starting position.
 from pydantic import BaseModel
 from typing import Optional
 from uuid import UUID
+from app.models import Card
 
 
 class UserBase(BaseModel):
@@ -38,6 +39,39 @@ class Token(BaseModel):
     access_token: str
     token_type: str
 
+class ChapterPosition(BaseModel):
+    """Chapter containing a position (see ``app/chapters.py``).
+
+    Attributes:
+        index: chapter number, from 0.
+        title: chapter title.
+        start, end: chapter bounds in seconds from the start of the book.
+        offset: seconds into the chapter.
+        count: number of chapters of the title.
+    """
+
+    index: int
+    title: str
+    start: float
+    end: float
+    offset: float
+    count: int
+
+
+class SeekPosition(BaseModel):
+    """Where to start reading the audio for a position (see ``app/seek_index.py``).
+
+    Attributes:
+        track: audio file of the title, in name order (``/stream/{qr}?track=``).
+        byte_offset: start of the MPEG frame playing at that position.
+        track_position: time of that frame within the track, in seconds.
+    """
+
+    track: int
+    byte_offset: int
+    track_position: float
+
+
 class PlayAuthResponse(BaseModel):
     """Response for the play‑auth endpoint.
 
@@ -46,6 +80,11 @@ class PlayAuthResponse(BaseModel):
         reason: textual explanation of why playback is allowed or denied.
         start_position: the progress (in seconds or fraction) where
             playback should begin.
+        chapter: the chapter at ``start_position``, if the title has chapters.
+        percent_complete: ``start_position`` as a percentage of the title's
+            duration, if known.
+        seek: track and byte offset of ``start_position``, if the title has
+            a seek index.
         signed_url: a signed Audiobookshelf playback URL, only included
             when ``can_play`` is ``True``.
     """
@@ -53,4 +92,34 @@ class PlayAuthResponse(BaseModel):
     can_play: bool
     reason: str
     start_position: float
+    chapter: Optional[ChapterPosition] = None
+    percent_complete: Optional[float] = None
+    seek: Optional[SeekPosition] = None
     signed_url: Optional[str] = None
+
+
+class CardBatchSummary(BaseModel):
+    """Result of minting a batch of cards.
+
+    The codes themselves are not listed; they can be streamed with
+    ``?stream=true`` or exported later from ``export_url``.
+    """
+
+    batch_id: int
+    title_id: int
+    qty: int
+    first_qr: Optional[str] = None
+    last_qr: Optional[str] = None
+    export_url: str
+
+
+class CardPage(BaseModel):
+    """One page of ``GET /admin/cards``.
+
+    ``next_cursor`` is ``None`` on the last page.  ``total`` is only
+    computed when requested with ``with_total=true``.
+    """
+
+    items: list[Card]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
@@ -0,0 +1,290 @@
+"""
+MP3 seek index: playback position -> (track, byte offset).
+
+Built offline per title by parsing the MPEG audio frame headers of every
+track (``python -m app.seek_index``).  All sync-word candidates of a file are
+decoded at once with NumPy lookup tables (bitrate, sample rate, frame
+length, samples per frame); the frame chain is then followed from one frame
+to the next, which skips false syncs inside audio data, ID3 tags and the
+Xing/Info frame.  Summing the frame durations gives the exact duration.
+
+For every ``SEEK_GRANULARITY_SEC`` of the book the index stores the track,
+the byte offset of the frame playing at that time and the frame's start time
+within the track.  It is saved as ``<title_id>.npy`` (10 bytes per entry,
+opened with ``mmap_mode="r"``) next to a ``<title_id>.json`` describing the
+tracks; a title is rebuilt only when the size or mtime of a track changes.
+``Title.duration_sec`` is updated with the exact duration; the library
+indexer and the Audiobookshelf sync only fill an empty duration, so this
+one wins whenever an index exists.
+"""
+
+import argparse
+import json
+import logging
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import bindparam, select, update
+
+from app import chapters
+from app.cache import TTLCache
+from app.db import engine, init_db
+from app.models import Title
+from app.streaming import LIBRARY_ROOT, audio_tracks
+
+logger = logging.getLogger(__name__)
+
+SEEK_INDEX_DIR = Path(os.getenv("SEEK_INDEX_DIR", Path(__file__).resolve().parents[1] / "data" / "seek"))
+GRANULARITY_SEC = float(os.getenv("SEEK_GRANULARITY_SEC", 1))
+INDEX_WORKERS = int(os.getenv("SEEK_INDEX_WORKERS", os.cpu_count() or 1))
+
+ENTRY_DTYPE = np.dtype([("track", "<u2"), ("offset", "<u4"), ("time", "<f4")])
+
+# Taules de capçalera MPEG: [versió][capa][índex]; versió 0=2.5, 2=MPEG2, 3=MPEG1; capa 1=III, 2=II, 3=I
+_BITRATES = np.zeros((4, 4, 16), dtype=np.int64)
+_BITRATES[3, 3] = [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448, 0]
+_BITRATES[3, 2] = [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384, 0]
+_BITRATES[3, 1] = [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 0]
+for _v in (0, 2):
+    _BITRATES[_v, 3] = [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256, 0]
+    _BITRATES[_v, 2] = _BITRATES[_v, 1] = [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160, 0]
+_SAMPLE_RATES = np.zeros((4, 4), dtype=np.int64)
+_SAMPLE_RATES[3, :3] = [44100, 48000, 32000]
+_SAMPLE_RATES[2, :3] = [22050, 24000, 16000]
+_SAMPLE_RATES[0, :3] = [11025, 12000, 8000]
+_SAMPLES = np.zeros((4, 4), dtype=np.int64)
+_SAMPLES[:, 3] = 384
+_SAMPLES[:, 2] = 1152
+_SAMPLES[3, 1] = 1152
+_SAMPLES[(0, 2), 1] = 576
+
+
+@dataclass
+class TrackFrames:
+    offsets: np.ndarray  # byte offset of each audio frame
+    times: np.ndarray  # start time of each frame, seconds
+    duration: float
+
+
+def _id3v2_size(data) -> int:
+    if len(data) < 10 or bytes(data[:3]) != b"ID3":
+        return 0
+    size = 0
+    for b in bytes(data[6:10]):
+        size = (size << 7) | (b & 0x7F)
+    return 10 + size + (10 if data[5] & 0x10 else 0)
+
+
+def parse_frames(data: bytes) -> TrackFrames:
+    """Locate every audio frame of an MP3 file's bytes."""
+    buf = np.frombuffer(data, dtype=np.uint8)
+    start = _id3v2_size(data)
+    end = len(buf) - (128 if len(buf) >= 128 and bytes(data[-128:-125]) == b"TAG" else 0)
+    body = buf[start:end]
+    if len(body) < 4:
+        return TrackFrames(np.zeros(0, np.int64), np.zeros(0), 0.0)
+
+    # Capçaleres candidates: 11 bits de sincronia a 1
+    pos = np.flatnonzero((body[:-3] == 0xFF) & ((body[1:-2] & 0xE0) == 0xE0))
+    b1, b2 = body[pos + 1].astype(np.int64), body[pos + 2].astype(np.int64)
+    version, layer = (b1 >> 3) & 3, (b1 >> 1) & 3
+    bitrate = _BITRATES[version, layer, (b2 >> 4) & 0xF] * 1000
+    sample_rate = _SAMPLE_RATES[version, (b2 >> 2) & 3]
+    samples = _SAMPLES[version, layer]
+    padding = (b2 >> 1) & 1
+    valid = (bitrate > 0) & (sample_rate > 0) & (samples > 0)
+    pos, bitrate, sample_rate, samples, padding, layer = (
+        a[valid] for a in (pos, bitrate, sample_rate, samples, padding, layer))
+    length = np.where(layer == 3, (12 * bitrate // sample_rate + padding) * 4,
+                      samples // 8 * bitrate // sample_rate + padding)
+
+    # Cadena de trames: cada trama apunta a la següent candidata (o -1)
+    next_pos = pos + length
+    next_idx = np.searchsorted(pos, next_pos)
+    linked = next_idx < len(pos)
+    linked[linked] = pos[next_idx[linked]] == next_pos[linked]
+    nexts = np.where(linked, next_idx, -1).tolist()
+    ends = next_pos.tolist()
+    chain, i, n = [], 0, len(pos)
+    while i < n:
+        if nexts[i] < 0:  # sincronia falsa o soroll: prova la següent candidata
+            i += 1
+            continue
+        while True:
+            chain.append(i)
+            if nexts[i] < 0:
+                break
+            i = nexts[i]
+        if ends[i] >= len(body):
+            break
+        # Brossa entre trames: continua a partir d'on acabava l'última
+        i = int(np.searchsorted(pos, ends[i]))
+
+    chain = np.asarray(chain, dtype=np.int64)
+    if len(chain) and _is_info_frame(body, int(pos[chain[0]]), int(length[chain[0]])):
+        chain = chain[1:]
+    frame_durations = samples[chain] / sample_rate[chain]
+    times = np.concatenate(([0.0], np.cumsum(frame_durations)[:-1])) if len(chain) else np.zeros(0)
+    return TrackFrames(pos[chain] + start, times, float(frame_durations.sum()))
+
+
+def _is_info_frame(body: np.ndarray, offset: int, length: int) -> bool:
+    head = body[offset:offset + min(length, 64)].tobytes()
+    return b"Xing" in head or b"Info" in head
+
+
+def build_index(tracks: list[TrackFrames], granularity: float = GRANULARITY_SEC) -> np.ndarray:
+    """Seek entries every ``granularity`` seconds over the concatenated tracks."""
+    if not any(len(t.offsets) for t in tracks):
+        return np.zeros(0, dtype=ENTRY_DTYPE)
+    starts = np.concatenate(([0.0], np.cumsum([t.duration for t in tracks])))
+    track_ids = np.concatenate([np.full(len(t.offsets), i, dtype=np.int64) for i, t in enumerate(tracks)])
+    offsets = np.concatenate([t.offsets for t in tracks])
+    times = np.concatenate([t.times for t in tracks])
+    global_times = times + starts[track_ids]
+    grid = np.arange(math.ceil(starts[-1] / granularity)) * granularity
+    idx = np.maximum(np.searchsorted(global_times, grid, side="right") - 1, 0)
+    entries = np.empty(len(grid), dtype=ENTRY_DTYPE)
+    entries["track"] = track_ids[idx]
+    entries["offset"] = offsets[idx]
+    entries["time"] = times[idx]
+    return entries
+
+
+def _track_signature(path: Path) -> dict:
+    stat = path.stat()
+    return {"name": path.name, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def build_title(title_id: int, library_path: str, root: str, out_dir: str,
+                granularity: float = GRANULARITY_SEC) -> tuple[int, float | None, str | None]:
+    """Parse, index and save one title (runs in the pool's worker processes)."""
+    try:
+        paths = audio_tracks(library_path, Path(root))
+        if not paths:
+            return title_id, None, "no audio tracks"
+        frames = []
+        for path in paths:
+            with open(path, "rb") as f:
+                frames.append(parse_frames(f.read()))
+        entries = build_index(frames, granularity)
+        out = Path(out_dir)
+        out.mkdir(parents=True, exist_ok=True)
+        with open(out / f"{title_id}.npy.tmp", "wb") as f:
+            np.save(f, entries, allow_pickle=False)
+        os.replace(out / f"{title_id}.npy.tmp", out / f"{title_id}.npy")
+        meta = {
+            "granularity": granularity,
+            "duration": sum(f.duration for f in frames),
+            "tracks": [{**_track_signature(p), "duration": f.duration} for p, f in zip(paths, frames)],
+        }
+        (out / f"{title_id}.json").write_text(json.dumps(meta))
+        return title_id, meta["duration"], None
+    except (OSError, ValueError) as exc:
+        return title_id, None, f"{type(exc).__name__}: {exc}"
+
+
+def is_current(title_id: int, library_path: str, root: Path, out_dir: Path,
+               granularity: float = GRANULARITY_SEC) -> bool:
+    try:
+        meta = json.loads((out_dir / f"{title_id}.json").read_text())
+    except (OSError, ValueError):
+        return False
+    tracks = [_track_signature(p) for p in audio_tracks(library_path, root)]
+    return (meta.get("granularity") == granularity and
+            [{k: t[k] for k in ("name", "size", "mtime_ns")} for t in meta["tracks"]] == tracks)
+
+
+@dataclass(frozen=True)
+class SeekIndex:
+    granularity: float
+    duration: float
+    entries: np.ndarray
+
+    def locate(self, position: float) -> dict | None:
+        if not len(self.entries):
+            return None
+        k = min(max(int(position // self.granularity), 0), len(self.entries) - 1)
+        entry = self.entries[k]
+        return {"track": int(entry["track"]), "byte_offset": int(entry["offset"]),
+                "track_position": round(float(entry["time"]), 3)}
+
+
+_loaded = TTLCache(maxsize=1024, ttl=300)
+_MISSING = object()
+
+
+def load_index(title_id: int, out_dir: Path = SEEK_INDEX_DIR) -> SeekIndex | None:
+    """Memory-mapped index of ``title_id``, or ``None`` if not built."""
+    index = _loaded.get((out_dir, title_id), _MISSING)
+    if index is _MISSING:
+        try:
+            meta = json.loads((out_dir / f"{title_id}.json").read_text())
+            entries = np.load(out_dir / f"{title_id}.npy", mmap_mode="r", allow_pickle=False)
+            index = SeekIndex(meta["granularity"], meta["duration"], entries)
+        except (OSError, ValueError, KeyError):
+            index = None
+        _loaded.set((out_dir, title_id), index)
+    return index
+
+
+def build_all(bind=engine, root: Path = LIBRARY_ROOT, out_dir: Path = SEEK_INDEX_DIR,
+              workers: int = INDEX_WORKERS, full: bool = False, title_ids=None) -> dict[int, float]:
+    """Build the missing or outdated indexes; return ``{title_id: duration}``."""
+    query = select(Title.id, Title.library_path).where(Title.library_path.is_not(None))
+    if title_ids:
+        query = query.where(Title.id.in_(title_ids))
+    with bind.connect() as conn:
+        titles = [(tid, path) for tid, path in conn.execute(query)
+                  if full or not is_current(tid, path, root, out_dir)]
+    if not titles:
+        return {}
+
+    args = [(tid, path, str(root), str(out_dir)) for tid, path in titles]
+    if workers <= 0 or len(titles) == 1:
+        results = [build_title(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=multiprocessing.get_context("spawn")) as pool:
+            results = list(pool.map(build_title, *zip(*args)))
+
+    durations = {}
+    for title_id, duration, error in results:
+        if error:
+            logger.warning("Cannot build seek index of title %s: %s", title_id, error)
+        else:
+            durations[title_id] = duration
+    if durations:
+        with bind.begin() as conn:
+            conn.execute(
+                update(Title.__table__).where(Title.__table__.c.id == bindparam("tid"))
+                .values(duration_sec=bindparam("duration")),
+                [{"tid": tid, "duration": math.ceil(d)} for tid, d in durations.items()],
+            )
+        chapters.invalidate()
+        _loaded.clear()
+    return durations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build MP3 seek indexes and exact durations.")
+    parser.add_argument("--title-id", type=int, action="append", help="only these titles")
+    parser.add_argument("--full", action="store_true", help="rebuild even if the tracks did not change")
+    parser.add_argument("--workers", type=int, default=INDEX_WORKERS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    durations = build_all(workers=args.workers, full=args.full, title_ids=args.title_id)
+    for title_id, duration in sorted(durations.items()):
+        print(f"title {title_id}: {duration:.3f} s")
+    print(f"{len(durations)} seek indexes built in {SEEK_INDEX_DIR}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Single-device playback enforcement.
+
+Only one holder (today: the user id) may play a QR at a time.  An
+``ActiveSessionStore`` answers "acquire or refresh" atomically in O(1) and
+off the primary database: the first caller gets the QR for ``ttl`` seconds,
+the same holder may call again to extend it, and anyone else is refused
+until it expires or is released.
+
+Backends, selected by ``SESSION_STORE_URL``:
+
+* ``memory://`` (default): a dict in the worker process.  Correct only with
+  a single worker process.
+* ``redis://…`` / ``rediss://…`` / ``unix://…``: any Redis-protocol server
+  (Redis, Valkey, KeyDB…); acquire and release are Lua scripts, so several
+  workers and hosts share the same view.  Requires the ``redis`` package.
+
+``PlaySession`` rows are still written by ``get_play_auth`` as a record of
+issued URLs, but are no longer read to decide who may play.
+"""
+
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+
+SESSION_STORE_URL = os.getenv("SESSION_STORE_URL", "memory://")
+SESSION_TTL_SEC = int(os.getenv("URL_TTL_HOURS", 4)) * 3600
+KEY_PREFIX = os.getenv("SESSION_STORE_PREFIX", "avook:session:")
+
+
+class ActiveSessionStore(ABC):
+    """Interface shared by the backends below."""
+
+    @abstractmethod
+    async def acquire(self, qr: str, holder: str, ttl: int = SESSION_TTL_SEC) -> bool:
+        """Take ``qr`` for ``holder`` (or extend it) for ``ttl`` seconds.
+
+        Returns ``False`` if another holder has a live session.
+        """
+
+    @abstractmethod
+    async def release(self, qr: str, holder: str | None = None) -> bool:
+        """End the session on ``qr`` if it belongs to ``holder`` (any holder if ``None``)."""
+
+    @abstractmethod
+    async def holder(self, qr: str) -> str | None:
+        """Current holder of ``qr``, or ``None`` if nobody has a live session."""
+
+    async def close(self) -> None:
+        pass
+
+
+class MemorySessionStore(ActiveSessionStore):
+    def __init__(self):
+        self._entries: dict[str, tuple[str, float]] = {}
+        self._lock = threading.Lock()
+        self._purge_at = 1024
+
+    def _live(self, qr: str, now: float) -> str | None:
+        entry = self._entries.get(qr)
+        if entry is None:
+            return None
+        holder, expires_at = entry
+        if expires_at <= now:
+            del self._entries[qr]
+            return None
+        return holder
+
+    def _purge(self, now: float) -> None:
+        # Amortitzat: només quan el dict ha doblat la mida des de l'última purga
+        self._entries = {qr: e for qr, e in self._entries.items() if e[1] > now}
+        self._purge_at = max(1024, 2 * len(self._entries))
+
+    async def acquire(self, qr: str, holder: str, ttl: int = SESSION_TTL_SEC) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            current = self._live(qr, now)
+            if current is not None and current != holder:
+                return False
+            self._entries[qr] = (holder, now + ttl)
+            if len(self._entries) >= self._purge_at:
+                self._purge(now)
+            return True
+
+    async def release(self, qr: str, holder: str | None = None) -> bool:
+        with self._lock:
+            current = self._live(qr, time.monotonic())
+            if current is None or (holder is not None and current != holder):
+                return False
+            del self._entries[qr]
+            return True
+
+    async def holder(self, qr: str) -> str | None:
+        with self._lock:
+            return self._live(qr, time.monotonic())
+
+
+_ACQUIRE_LUA = """
+local current = redis.call('GET', KEYS[1])
+if current and current ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+return 1
+"""
+
+_RELEASE_LUA = """
+local current = redis.call('GET', KEYS[1])
+if not current or (ARGV[1] ~= '' and current ~= ARGV[1]) then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+return 1
+"""
+
+
+class RedisSessionStore(ActiveSessionStore):
+    """Backend for any ``redis.asyncio``-compatible client (incl. fakeredis)."""
+
+    def __init__(self, client, prefix: str = KEY_PREFIX):
+        self.client = client
+        self.prefix = prefix
+        self._acquire = client.register_script(_ACQUIRE_LUA)
+        self._release = client.register_script(_RELEASE_LUA)
+
+    async def acquire(self, qr: str, holder: str, ttl: int = SESSION_TTL_SEC) -> bool:
+        return bool(await self._acquire(keys=[self.prefix + qr], args=[holder, int(ttl * 1000)]))
+
+    async def release(self, qr: str, holder: str | None = None) -> bool:
+        return bool(await self._release(keys=[self.prefix + qr], args=[holder or ""]))
+
+    async def holder(self, qr: str) -> str | None:
+        value = await self.client.get(self.prefix + qr)
+        return value.decode() if isinstance(value, bytes) else value
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+def create_session_store(url: str = SESSION_STORE_URL) -> ActiveSessionStore:
+    if not url or url.startswith("memory:"):
+        return MemorySessionStore()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        import redis.asyncio as redis
+
+        return RedisSessionStore(redis.from_url(url))
+    raise ValueError(f"Unsupported SESSION_STORE_URL: {url}")
+
+
+session_store = create_session_store()
@@ -0,0 +1,104 @@
+"""
+Background maintenance of ``PlaySession``.
+
+Every play-auth leaves a row behind that is useless once ``expires_at`` has
+passed.  ``PlaySessionSweeper.sweep`` deletes expired rows in batches of
+``PLAY_SESSION_SWEEP_BATCH`` (one short transaction per batch, so the table
+is never locked for long) and refreshes the
+``avook_play_sessions_active`` gauge with the live sessions per title.
+
+The sweeper runs every ``PLAY_SESSION_SWEEP_INTERVAL_SEC`` seconds from the
+``lifespan`` hook in ``app/main.py``.
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.engine import Engine
+
+from app import metrics
+from app.db import engine
+from app.models import Card, PlaySession
+
+logger = logging.getLogger(__name__)
+
+SWEEP_INTERVAL_SEC = float(os.getenv("PLAY_SESSION_SWEEP_INTERVAL_SEC", 300))
+SWEEP_BATCH = int(os.getenv("PLAY_SESSION_SWEEP_BATCH", 1000))
+
+ACTIVE_SESSIONS = metrics.gauge(
+    "avook_play_sessions_active", "Unexpired play sessions per title")
+SWEPT = metrics.counter(
+    "avook_play_sessions_swept_total", "Expired play sessions deleted by the sweeper")
+
+
+class PlaySessionSweeper:
+    def __init__(self, bind: Engine, interval: float = SWEEP_INTERVAL_SEC,
+                 batch_size: int = SWEEP_BATCH):
+        self.bind = bind
+        self.interval = interval
+        self.batch_size = batch_size
+        self._titles: set[str] = set()
+
+    def delete_expired(self, now: datetime | None = None) -> int:
+        """Delete expired sessions, ``batch_size`` rows per transaction."""
+        now = now or datetime.now(timezone.utc)
+        table = PlaySession.__table__
+        expired = (
+            select(table.c.id)
+            .where(table.c.expires_at <= now)
+            .limit(self.batch_size)
+            .scalar_subquery()
+        )
+        total = 0
+        while True:
+            with self.bind.begin() as conn:
+                deleted = conn.execute(delete(table).where(table.c.id.in_(expired))).rowcount
+            total += deleted
+            if deleted < self.batch_size:
+                break
+        if total:
+            SWEPT.inc(total)
+        return total
+
+    def active_by_title(self, now: datetime | None = None) -> dict[int, int]:
+        now = now or datetime.now(timezone.utc)
+        sessions, cards = PlaySession.__table__, Card.__table__
+        query = (
+            select(cards.c.title_id, func.count())
+            .select_from(sessions.join(cards, cards.c.qr == sessions.c.qr))
+            .where(sessions.c.expires_at > now)
+            .group_by(cards.c.title_id)
+        )
+        with self.bind.connect() as conn:
+            return {title_id: count for title_id, count in conn.execute(query)}
+
+    def update_metrics(self, now: datetime | None = None) -> None:
+        counts = {str(title_id): count for title_id, count in self.active_by_title(now).items()}
+        # Els títols que ja no tenen sessions passen a 0 en lloc de desaparèixer
+        for title_id in self._titles - counts.keys():
+            ACTIVE_SESSIONS.set(0, title_id=title_id)
+        for title_id, count in counts.items():
+            ACTIVE_SESSIONS.set(count, title_id=title_id)
+        self._titles |= counts.keys()
+
+    def sweep(self) -> int:
+        deleted = self.delete_expired()
+        self.update_metrics()
+        return deleted
+
+    async def run(self) -> None:
+        """Sweep periodically until cancelled."""
+        while True:
+            try:
+                deleted = await asyncio.to_thread(self.sweep)
+                if deleted:
+                    logger.info("Deleted %d expired play sessions", deleted)
+            except Exception:
+                logger.exception("Play-session sweep failed; will retry")
+            await asyncio.sleep(self.interval)
+
+
+play_session_sweeper = PlaySessionSweeper(engine)
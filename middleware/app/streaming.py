@@ -0,0 +1,205 @@
+"""
+Byte-range file serving for the ``/stream/{qr}`` gateway.
+
+``FileHandleCache`` keeps up to ``STREAM_OPEN_FILES`` audio files open
+together with their ``stat`` result, least recently used first out.  A file
+is re-stat'ed at most every ``STREAM_STAT_INTERVAL_SEC`` seconds and reopened
+if it was replaced; handles still being streamed are closed only once their
+last response finishes.
+
+``RangeFileResponse`` sends one byte range of an open file.  When the ASGI
+server offers the ``http.response.zerocopy`` extension the kernel copies the
+file to the socket (``sendfile``); otherwise the range is sent in
+``STREAM_CHUNK_SIZE`` chunks read with ``os.pread`` in a worker thread, which
+needs no seek and so can share one descriptor between concurrent requests.
+"""
+
+import mimetypes
+import os
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate
+from pathlib import Path
+
+import anyio
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from app import metrics
+from app.cache import TTLCache
+from app.etags import make_etag
+
+LIBRARY_ROOT = Path(os.getenv(
+    "LIBRARY_ROOT",
+    Path(__file__).resolve().parents[2] / "audiobookshelf" / "library",
+))
+OPEN_FILES = int(os.getenv("STREAM_OPEN_FILES", 256))
+STAT_INTERVAL_SEC = float(os.getenv("STREAM_STAT_INTERVAL_SEC", 5))
+CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", 256 * 1024))
+AUDIO_SUFFIXES = (".mp3", ".m4a", ".m4b", ".aac", ".ogg", ".opus", ".flac")
+
+BYTES_SENT = metrics.counter("avook_stream_bytes_total", "Audio bytes sent by the stream gateway")
+OPEN = metrics.gauge("avook_stream_open_files", "Audio files held open by the stream gateway")
+
+_track_cache = TTLCache(maxsize=4096, ttl=STAT_INTERVAL_SEC)
+
+
+def audio_tracks(library_path: str, root: Path = LIBRARY_ROOT) -> tuple[Path, ...]:
+    """Audio files of a title's folder, sorted by name; empty if outside ``root``."""
+    key = (root, library_path)
+    tracks = _track_cache.get(key)
+    if tracks is None:
+        root = root.resolve()
+        folder = (root / library_path).resolve()
+        if not folder.is_relative_to(root) or not folder.is_dir():
+            tracks = ()
+        else:
+            tracks = tuple(sorted(p for p in folder.iterdir()
+                                  if p.suffix.lower() in AUDIO_SUFFIXES and p.is_file()))
+        _track_cache.set(key, tracks)
+    return tracks
+
+
+class OpenFile:
+    __slots__ = ("path", "file", "stat", "etag", "last_modified", "media_type",
+                 "checked_at", "refs", "evicted")
+
+    def __init__(self, path: Path, now: float):
+        self.path = path
+        self.file = open(path, "rb", buffering=0)
+        self.stat = os.fstat(self.file.fileno())
+        self.etag = make_etag(self.stat.st_ino, self.stat.st_size, self.stat.st_mtime_ns)
+        self.last_modified = formatdate(self.stat.st_mtime, usegmt=True)
+        self.media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        self.checked_at = now
+        self.refs = 0
+        self.evicted = False
+
+    @property
+    def size(self) -> int:
+        return self.stat.st_size
+
+    def same_file(self, stat: os.stat_result) -> bool:
+        return (self.stat.st_ino, self.stat.st_size, self.stat.st_mtime_ns) == \
+            (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+class FileHandleCache:
+    def __init__(self, maxsize: int = OPEN_FILES, check_interval: float = STAT_INTERVAL_SEC):
+        self.maxsize = maxsize
+        self.check_interval = check_interval
+        self._files: OrderedDict[Path, OpenFile] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, path: Path) -> OpenFile:
+        """Open (or reuse) ``path``; pair every call with ``release``."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._files.get(path)
+            if entry is not None and now - entry.checked_at >= self.check_interval:
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    self._evict(path)
+                    raise
+                if entry.same_file(stat):
+                    entry.checked_at = now
+                else:
+                    self._evict(path)
+                    entry = None
+            if entry is None:
+                entry = OpenFile(path, now)
+                self._files[path] = entry
+                while len(self._files) > self.maxsize:
+                    self._evict(next(iter(self._files)))
+            self._files.move_to_end(path)
+            entry.refs += 1
+            OPEN.set(len(self._files))
+            return entry
+
+    def release(self, entry: OpenFile) -> None:
+        with self._lock:
+            entry.refs -= 1
+            if entry.evicted and entry.refs == 0:
+                entry.file.close()
+
+    def _evict(self, path: Path) -> None:
+        entry = self._files.pop(path)
+        entry.evicted = True
+        if entry.refs == 0:
+            entry.file.close()
+
+    def close(self) -> None:
+        with self._lock:
+            for path in list(self._files):
+                self._evict(path)
+            OPEN.set(0)
+
+
+def parse_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """``bytes=a-b`` -> inclusive ``(start, end)``; ``None`` means the whole file.
+
+    Raises ``ValueError`` if the range cannot be satisfied.  Multi-range
+    requests are answered with the whole file, which RFC 9110 allows.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, sep, last = header[6:].strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            start, end = size - int(last), size - 1
+    except ValueError:
+        return None
+    start, end = max(start, 0), min(end, size - 1)
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+class RangeFileResponse(Response):
+    def __init__(self, entry: OpenFile, cache: FileHandleCache, start: int, end: int,
+                 status_code: int = 200, headers: dict | None = None):
+        self.entry = entry
+        self.cache = cache
+        self.start = start
+        self.count = end - start + 1
+        self.status_code = status_code
+        self.media_type = entry.media_type
+        self.background = None
+        self.body = b""
+        self.init_headers({**(headers or {}), "Content-Length": str(self.count)})
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await send({"type": "http.response.start", "status": self.status_code,
+                        "headers": self.raw_headers})
+            if scope["method"] == "HEAD" or self.count == 0:
+                await send({"type": "http.response.body", "body": b""})
+                return
+            if "http.response.zerocopy" in scope.get("extensions", {}):
+                await send({"type": "http.response.zerocopy", "file": self.entry.file,
+                            "offset": self.start, "count": self.count})
+            else:
+                fd = self.entry.file.fileno()
+                offset, remaining = self.start, self.count
+                while remaining:
+                    chunk = await anyio.to_thread.run_sync(os.pread, fd, min(CHUNK_SIZE, remaining), offset)
+                    if not chunk:  # fitxer truncat mentre s'enviava
+                        break
+                    offset += len(chunk)
+                    remaining -= len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": bool(remaining)})
+                if remaining:
+                    await send({"type": "http.response.body", "body": b""})
+            BYTES_SENT.inc(self.count)
+        finally:
+            self.cache.release(self.entry)
+
+
+file_handles = FileHandleCache()
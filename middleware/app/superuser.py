@@ -0,0 +1,131 @@
+"""
+Superuser credentials and login throttling.
+
+``superuser.json`` is read and validated once; ``SuperuserConfig.get`` then
+only re-stats the file, at most every ``SUPERUSER_CHECK_INTERVAL_SEC``
+seconds, and reloads it when its mtime or size changes.  A reload that
+fails (missing file, bad JSON, unknown hash format) keeps the last good
+credentials and logs the error.
+
+``LoginThrottle`` is a per-client token bucket: each attempt spends a token
+before the password is verified, and a correct login refunds them all, so in
+effect only *failed* logins count, concurrent ones included.
+``SU_LOGIN_BURST`` attempts are allowed at once, then one more every
+``SU_LOGIN_REFILL_SEC`` seconds.
+"""
+
+import hmac
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+from app import metrics
+from app.passwords import pwd_context
+
+logger = logging.getLogger(__name__)
+
+SUPERUSER_CONFIG_PATH = Path(os.getenv("SUPERUSER_CONFIG_PATH", "superuser.json"))
+CHECK_INTERVAL_SEC = float(os.getenv("SUPERUSER_CHECK_INTERVAL_SEC", 2))
+LOGIN_BURST = int(os.getenv("SU_LOGIN_BURST", 5))
+LOGIN_REFILL_SEC = float(os.getenv("SU_LOGIN_REFILL_SEC", 60))
+THROTTLE_MAX_CLIENTS = int(os.getenv("SU_LOGIN_MAX_CLIENTS", 10000))
+
+THROTTLED = metrics.counter(
+    "avook_su_login_throttled_total", "Superuser logins rejected with 429")
+
+
+@dataclass(frozen=True)
+class SuperuserCredentials:
+    email: str
+    password_hash: str
+    mtime_ns: int
+    size: int
+
+    def matches_email(self, email: str) -> bool:
+        return hmac.compare_digest(email.encode(), self.email.encode())
+
+
+class SuperuserConfig:
+    def __init__(self, path: Path = SUPERUSER_CONFIG_PATH, check_interval: float = CHECK_INTERVAL_SEC):
+        self.path = Path(path)
+        self.check_interval = check_interval
+        self._credentials: SuperuserCredentials | None = None
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def _read(self, stat: os.stat_result) -> SuperuserCredentials:
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        email = data.get("email") if isinstance(data, dict) else None
+        password_hash = data.get("password_hash") if isinstance(data, dict) else None
+        if not isinstance(email, str) or not email:
+            raise ValueError("missing email")
+        if not isinstance(password_hash, str) or pwd_context.identify(password_hash, required=False) is None:
+            raise ValueError("password_hash is not a supported hash")
+        return SuperuserCredentials(email, password_hash, stat.st_mtime_ns, stat.st_size)
+
+    def get(self) -> SuperuserCredentials | None:
+        """Current credentials, or ``None`` if never configured correctly."""
+        now = time.monotonic()
+        credentials = self._credentials
+        if now - self._checked_at < self.check_interval:
+            return credentials
+
+        with self._lock:
+            self._checked_at = now
+            credentials = self._credentials
+            try:
+                stat = self.path.stat()
+                if credentials is None or (credentials.mtime_ns, credentials.size) != (stat.st_mtime_ns, stat.st_size):
+                    self._credentials = credentials = self._read(stat)
+            except (OSError, ValueError) as exc:  # json.JSONDecodeError és un ValueError
+                logger.error("Cannot load superuser config %s: %s", self.path, exc)
+            return credentials
+
+
+class LoginThrottle:
+    def __init__(self, burst: int = LOGIN_BURST, refill_sec: float = LOGIN_REFILL_SEC,
+                 max_clients: int = THROTTLE_MAX_CLIENTS):
+        self.burst = burst
+        self.refill_sec = refill_sec
+        self.max_clients = max_clients
+        # client -> (tokens, updated_at); només hi ha clients amb intents fallits o en curs
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _tokens(self, client: str, now: float) -> float:
+        tokens, updated_at = self._buckets[client]
+        return min(self.burst, tokens + (now - updated_at) / self.refill_sec)
+
+    def acquire(self, client: str) -> int:
+        """Spend one attempt of ``client``; seconds to wait if none is left, else 0.
+
+        The attempt is spent before the password is checked, so concurrent
+        guesses cannot all pass while the hash is being verified.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens = self._tokens(client, now) if client in self._buckets else self.burst
+            if tokens >= 1:
+                self._buckets[client] = (tokens - 1, now)
+                self._buckets.move_to_end(client)
+                while len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+                return 0
+        THROTTLED.inc()
+        return max(1, int((1 - tokens) * self.refill_sec + 0.999))
+
+    def success(self, client: str) -> None:
+        """Forget ``client``'s failures (a good login refunds every attempt)."""
+        if client in self._buckets:
+            with self._lock:
+                self._buckets.pop(client, None)
+
+
+superuser_config = SuperuserConfig()
+login_throttle = LoginThrottle()
@@ -0,0 +1,100 @@
+"""
+Catalogue search over title and author.
+
+Matching is accent- and case-insensitive: queries and the maintained
+``Title.search_text`` column are both normalised with
+``normalize_search_text``, so "ausias", "Ausiàs" and "AUSIÀS" find the same
+book.  Every word of the query must match, as a prefix.
+
+* Postgres: ``to_tsvector('simple', search_text) @@ prefix tsquery`` (GIN
+  index), ranked by ``ts_rank`` plus trigram ``similarity``.
+* SQLite (tests): the ``title_fts`` FTS5 table, ranked by ``bm25``.
+* Anything else: ``LIKE`` per word, ordered by title.
+
+Result pages are cached for ``TITLE_SEARCH_CACHE_TTL_SEC`` seconds and the
+cache is cleared by ``invalidate`` when titles are created or updated.
+"""
+
+import os
+import re
+
+from sqlalchemy import column, func, literal_column, table, text
+from sqlmodel import Session, select
+
+from app.cache import TTLCache
+from app.models import Title
+from app.models.title import SEARCH_VECTOR_SQL, normalize_search_text
+
+CACHE_TTL_SEC = float(os.getenv("TITLE_SEARCH_CACHE_TTL_SEC", 30))
+CACHE_SIZE = int(os.getenv("TITLE_SEARCH_CACHE_SIZE", 1024))
+DEFAULT_LIMIT = 50
+
+_cache = TTLCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL_SEC)
+_title_fts = table("title_fts", column("rowid"))
+_WORD = re.compile(r"\w+")
+
+
+def query_terms(search: str) -> list[str]:
+    return _WORD.findall(normalize_search_text(search))
+
+
+def build_search_query(dialect: str, search: str, active: bool):
+    """Return a ranked ``select(Title)`` for ``search`` on ``dialect``."""
+    terms = query_terms(search)
+    query = select(Title).where(Title.active == active)
+    if not terms:
+        return query.order_by(Title.title, Title.id)
+
+    if dialect == "postgresql":
+        tsquery = func.to_tsquery(literal_column("'simple'"), " & ".join(f"{t}:*" for t in terms))
+        vector = literal_column(SEARCH_VECTOR_SQL.replace("search_text", "title.search_text"))
+        normalized = " ".join(terms)
+        rank = func.ts_rank(vector, tsquery) + func.similarity(Title.search_text, normalized)
+        return query.where(vector.op("@@")(tsquery)).order_by(rank.desc(), Title.id)
+
+    if dialect == "sqlite":
+        match = " ".join(f'"{t}"*' for t in terms)
+        return (
+            query.join(_title_fts, _title_fts.c.rowid == Title.id)
+            .where(text("title_fts MATCH :match").bindparams(match=match))
+            .order_by(text("bm25(title_fts)"), Title.id)
+        )
+
+    for term in terms:
+        query = query.where(Title.search_text.contains(term))
+    return query.order_by(Title.title, Title.id)
+
+
+def search_titles(db: Session, search: str = "", active: bool = True,
+                  limit: int | None = None, offset: int = 0) -> list[dict]:
+    """Return matching titles as dicts, served from the cache when possible."""
+    terms = query_terms(search)
+    if terms and limit is None:
+        limit = DEFAULT_LIMIT
+    key = (" ".join(terms), active, limit, offset)
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    query = build_search_query(db.get_bind().dialect.name, search, active)
+    if offset:
+        query = query.offset(offset)
+    if limit is not None:
+        query = query.limit(limit)
+    results = [title.model_dump() for title in db.exec(query).all()]
+    _cache.set(key, results)
+    return results
+
+
+def invalidate() -> None:
+    _cache.clear()
+
+
+def backfill_search_text(db: Session) -> int:
+    """Fill ``search_text`` for titles created before the column existed."""
+    titles = db.exec(select(Title).where(Title.search_text.is_(None))).all()
+    for title in titles:
+        title.search_text = normalize_search_text(f"{title.title} {title.author}")
+        db.add(title)
+    db.commit()
+    return len(titles)
@@ -0,0 +1,102 @@
+"""
+In-memory catalogue of the frontend error translations.
+
+Every ``<lang>.yml`` in ``TRANSLATIONS_DIR`` (by default the Jekyll
+``_data`` folder next to ``middleware``) is parsed once, at startup, and its
+``errors`` section is kept as ready-to-send JSON bytes with a strong ETag.
+``GET /translations/{lang}`` then costs a dict lookup.
+
+Files are re-read when their mtime or size changes; the check runs at most
+once every ``TRANSLATIONS_CHECK_INTERVAL_SEC`` seconds per language.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+
+import yaml
+
+from app.etags import make_etag
+
+TRANSLATIONS_DIR = Path(os.getenv(
+    "TRANSLATIONS_DIR",
+    Path(__file__).resolve().parents[2] / "jekyll-freelancer-theme" / "_data",
+))
+CHECK_INTERVAL_SEC = float(os.getenv("TRANSLATIONS_CHECK_INTERVAL_SEC", 2))
+MAX_AGE_SEC = int(os.getenv("TRANSLATIONS_MAX_AGE_SEC", 86400))
+
+_LANG = re.compile(r"^[A-Za-z]{2,3}([_-][A-Za-z0-9]{2,8})?$")
+
+
+@dataclass(frozen=True)
+class TranslationEntry:
+    errors: MappingProxyType
+    body: bytes
+    etag: str
+    mtime_ns: int
+    size: int
+
+
+class TranslationCatalog:
+    def __init__(self, directory: Path = TRANSLATIONS_DIR, check_interval: float = CHECK_INTERVAL_SEC):
+        self.directory = Path(directory)
+        self.check_interval = check_interval
+        self._entries: dict[str, TranslationEntry] = {}
+        self._checked_at: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _read(self, path: Path, stat: os.stat_result) -> TranslationEntry:
+        with open(path, "r", encoding="utf-8") as f:
+            data = yaml.safe_load(f) or {}
+        errors = data.get("errors", {}) if isinstance(data, dict) else {}
+        body = json.dumps(errors, ensure_ascii=False, separators=(",", ":")).encode()
+        return TranslationEntry(
+            errors=MappingProxyType(dict(errors)),
+            body=body,
+            etag=make_etag(body.decode()),
+            mtime_ns=stat.st_mtime_ns,
+            size=stat.st_size,
+        )
+
+    def load(self) -> int:
+        """(Re)load every language file; return how many were loaded."""
+        entries = {}
+        for path in sorted(self.directory.glob("*.yml")):
+            entries[path.stem] = self._read(path, path.stat())
+        with self._lock:
+            self._entries = entries
+            self._checked_at = dict.fromkeys(entries, time.monotonic())
+        return len(entries)
+
+    def get(self, lang: str) -> TranslationEntry | None:
+        """Return the entry for ``lang``, reloading it if its file changed."""
+        if not _LANG.match(lang):
+            return None
+        now = time.monotonic()
+        entry = self._entries.get(lang)
+        if entry is not None and now - self._checked_at.get(lang, 0) < self.check_interval:
+            return entry
+
+        with self._lock:
+            self._checked_at[lang] = now
+            path = self.directory / f"{lang}.yml"
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                # Només es recorden idiomes que existeixen: els desconeguts no acumulen claus
+                self._entries.pop(lang, None)
+                self._checked_at.pop(lang, None)
+                return None
+            entry = self._entries.get(lang)
+            if entry is None or (entry.mtime_ns, entry.size) != (stat.st_mtime_ns, stat.st_size):
+                entry = self._read(path, stat)
+                self._entries[lang] = entry
+            return entry
+
+
+translations = TranslationCatalog()
@@ -0,0 +1,91 @@
+"""
+Signed playback URLs.
+
+A URL is signed with HMAC-SHA256 over ``kid:qr:uid:exp`` and carries the key
+id, so keys can be rotated without downtime: ``URL_SIGNING_KEYS`` lists
+``kid:secret`` pairs, the first one signs and all of them verify.  Put the
+new key first, and drop the old one once ``URL_TTL_HOURS`` have passed.
+Without ``URL_SIGNING_KEYS`` the single key ``SECRET_KEY`` is used.
+
+The keyed HMAC state of each key is built once; every signature starts from
+``.copy()`` of it, which skips the key padding and the two initial hash
+blocks.  ``UrlSigner.verify_query`` is what a proxy in front of
+Audiobookshelf calls on ``/stream/{qr}?uid=…&exp=…&kid=…&sig=…``.
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+import time
+from dataclasses import dataclass
+from typing import Mapping
+
+ABS_HOST = os.getenv("ABS_HOST", "localhost:13378")
+TTL_HOURS = int(os.getenv("URL_TTL_HOURS", 4))
+# On escolta /stream/{qr}: el gateway del middleware o un proxy davant d'Audiobookshelf
+STREAM_BASE_URL = os.getenv("STREAM_BASE_URL", ABS_HOST)
+DEFAULT_KEY_ID = "0"
+
+
+def parse_keys(spec: str | None, fallback_secret: str) -> dict[str, str]:
+    """``"kid1:secret1,kid2:secret2"`` -> ordered ``{kid: secret}``."""
+    keys = {}
+    for item in (spec or "").split(","):
+        kid, sep, secret = item.strip().partition(":")
+        if not sep or not kid or not secret:
+            continue
+        keys[kid] = secret
+    return keys or {DEFAULT_KEY_ID: fallback_secret}
+
+
+@dataclass(frozen=True)
+class SignedUrl:
+    url: str
+    signature: str
+    key_id: str
+    expires_at: int
+
+
+class UrlSigner:
+    def __init__(self, keys: Mapping[str, str], host: str = STREAM_BASE_URL):
+        if not keys:
+            raise ValueError("at least one signing key is required")
+        self._macs = {kid: hmac.new(secret.encode(), digestmod=hashlib.sha256) for kid, secret in keys.items()}
+        self.active_key_id = next(iter(keys))
+        if not host.startswith(("http://", "https://")):
+            host = f"http://{host}"
+        self.base_url = host
+
+    def _signature(self, kid: str, qr: str, user_id: str, expires_at: int) -> str:
+        mac = self._macs[kid].copy()
+        mac.update(f"{kid}:{qr}:{user_id}:{expires_at}".encode())
+        return base64.urlsafe_b64encode(mac.digest()).decode().rstrip("=")
+
+    def sign(self, qr: str, user_id: str, ttl_sec: float, now: float | None = None) -> SignedUrl:
+        """Sign a ``/stream/{qr}`` URL valid for ``ttl_sec`` seconds."""
+        expires_at = int((time.time() if now is None else now) + ttl_sec)
+        kid = self.active_key_id
+        signature = self._signature(kid, qr, user_id, expires_at)
+        url = f"{self.base_url}/stream/{qr}?uid={user_id}&exp={expires_at}&kid={kid}&sig={signature}"
+        return SignedUrl(url=url, signature=signature, key_id=kid, expires_at=expires_at)
+
+    def verify(self, qr: str, user_id: str, expires_at: int, key_id: str, signature: str,
+               now: float | None = None) -> bool:
+        """True if the signature is valid, its key still active and not expired."""
+        if not isinstance(signature, str) or key_id not in self._macs or expires_at < (time.time() if now is None else now):
+            return False
+        # compare_digest només accepta str ASCII: compara bytes perquè una sig rara sigui un 403
+        expected = self._signature(key_id, qr, user_id, expires_at).encode()
+        return hmac.compare_digest(expected, signature.encode("utf-8", "surrogateescape"))
+
+    def verify_query(self, qr: str, params: Mapping[str, str], now: float | None = None) -> bool:
+        """``verify`` from the query parameters of a signed URL."""
+        try:
+            expires_at = int(params["exp"])
+            return self.verify(qr, params["uid"], expires_at, params["kid"], params["sig"], now)
+        except (KeyError, ValueError, TypeError):
+            return False
+
+
+url_signer = UrlSigner(parse_keys(os.getenv("URL_SIGNING_KEYS"), os.getenv("SECRET_KEY", "change-me")))
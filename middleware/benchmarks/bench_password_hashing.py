@@ -0,0 +1,65 @@
+"""
+Login throughput benchmark for the password hashing service.
+
+Measures bcrypt verifications per second (the CPU part of ``/login``) when
+run inline on the event loop thread and through ``PasswordHasher`` with an
+increasing number of worker processes, and reports throughput per core.
+
+Usage (from the ``middleware`` directory):
+
+    python benchmarks/bench_password_hashing.py --logins 200 --rounds 12
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+async def run_pool(workers: int, logins: int, stored_hash: str) -> float:
+    from app.passwords import PasswordHasher
+
+    hasher = PasswordHasher(workers=workers, max_queue=logins)
+    try:
+        await hasher.verify("secret", stored_hash)  # arrenca els processos
+        started = time.perf_counter()
+        results = await asyncio.gather(*(hasher.verify("secret", stored_hash) for _ in range(logins)))
+        elapsed = time.perf_counter() - started
+    finally:
+        hasher.shutdown()
+    assert all(results)
+    return logins / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    from passlib.context import CryptContext
+    context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=args.rounds)
+    stored_hash = context.hash("secret")
+
+    inline_n = max(1, args.logins // 10)
+    started = time.perf_counter()
+    for _ in range(inline_n):
+        context.verify("secret", stored_hash)
+    inline_rate = inline_n / (time.perf_counter() - started)
+
+    print(f"bcrypt rounds={args.rounds}, logins={args.logins}")
+    print(f"{'mode':<12} {'logins/s':>10} {'per core':>10}")
+    print(f"{'inline':<12} {inline_rate:>10.1f} {inline_rate:>10.1f}")
+    workers = 1
+    while workers <= args.max_workers:
+        rate = asyncio.run(run_pool(workers, args.logins, stored_hash))
+        print(f"{f'pool x{workers}':<12} {rate:>10.1f} {rate / workers:>10.1f}")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
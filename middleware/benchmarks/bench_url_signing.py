@@ -0,0 +1,70 @@
+"""
+Microbenchmark for signed playback URLs.
+
+Compares signing with a fresh ``hmac.new`` per URL (the previous
+implementation) against ``UrlSigner``, which copies a precomputed keyed
+HMAC, and measures ``UrlSigner.verify_query`` as a streaming proxy would
+call it.
+
+Usage (from the ``middleware`` directory):
+
+    python benchmarks/bench_url_signing.py --n 200000
+"""
+
+import argparse
+import base64
+import hashlib
+import hmac
+import os
+import sys
+import time
+from urllib.parse import parse_qsl, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SECRET = "bench-secret-key-with-a-realistic-length"
+USER_ID = "1b4e28ba-2fa1-11d2-883f-0016d3cca427"
+
+
+def sign_fresh(qr: str, user_id: str, expires_at: int) -> str:
+    message = f"{qr}:{user_id}:{expires_at}".encode()
+    digest = hmac.new(SECRET.encode(), message, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+
+def rate(n: int, fn) -> float:
+    started = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    return n / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=200_000)
+    parser.add_argument("--keys", type=int, default=2, help="active keys (rotation)")
+    args = parser.parse_args()
+
+    from app.url_signer import UrlSigner
+
+    signer = UrlSigner({f"k{i}": f"{SECRET}-{i}" for i in range(args.keys)})
+    now = time.time()
+    params = [dict(parse_qsl(urlsplit(signer.sign(f"QR{i}", USER_ID, 3600, now).url).query))
+              for i in range(1000)]
+
+    results = [
+        ("fresh hmac.new", rate(args.n, lambda i: sign_fresh(f"QR{i}", USER_ID, 1_800_000_000))),
+        ("copied hmac", rate(args.n, lambda i: signer._signature("k0", f"QR{i}", USER_ID, 1_800_000_000))),
+        ("sign (full URL)", rate(args.n, lambda i: signer.sign(f"QR{i}", USER_ID, 3600, now))),
+        ("verify", rate(args.n, lambda i: signer.verify_query(f"QR{i % 1000}", params[i % 1000], now))),
+    ]
+    assert all(signer.verify_query(f"QR{i}", p, now) for i, p in enumerate(params))
+
+    print(f"{args.n} operations, {args.keys} keys")
+    print(f"{'operation':<16} {'ops/s':>12} {'µs/op':>8}")
+    for name, ops in results:
+        print(f"{name:<16} {ops:>12,.0f} {1e6 / ops:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+
+@pytest.fixture(scope="session")
+def client():
+    """The app on the ``DATABASE_URL`` database, with its ``lifespan`` running."""
+    from app.main import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def login(client):
+    """Register a fresh user and return ``(email, headers)`` with its bearer token."""
+    def login():
+        email = f"u-{uuid.uuid4().hex[:12]}@example.com"
+        client.post("/api/v1/register", json={"email": email, "password": "1234", "name": "u", "location": "x"})
+        token = client.post("/api/v1/login", data={"username": email, "password": "1234"}).json()["access_token"]
+        return email, {"Authorization": f"Bearer {token}"}
+    return login
+
+
+@pytest.fixture
+def new_cards(client):
+    """Create a title with ``n`` factory cards and return their QRs, sorted."""
+    from app.db import engine
+    from app.models import Card, Title
+
+    def new_cards(n=1, prefix="T"):
+        qrs = sorted(f"{prefix}-{uuid.uuid4().hex[:12]}" for _ in range(n))
+        with Session(engine) as db:
+            title = Title(title="Tirant lo Blanc", author="Joanot Martorell", language="ca",
+                          duration_sec=3600, price_retail=10, currency="EUR")
+            db.add(title)
+            db.commit()
+            db.add_all(Card(qr=qr, title_id=title.id) for qr in qrs)
+            db.commit()
+        return qrs
+    return new_cards
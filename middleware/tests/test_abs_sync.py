@@ -0,0 +1,122 @@
+import sqlite3
+from datetime import datetime, timezone
+
+from sqlmodel import SQLModel, Session, create_engine, select
+
+from app.abs_sync import AbsSync
+from app.models import Title
+from app.models.title import normalize_search_text
+
+SCHEMA = """
+CREATE TABLE books (id UUID PRIMARY KEY, title VARCHAR(255), duration FLOAT,
+                    createdAt DATETIME NOT NULL, updatedAt DATETIME NOT NULL);
+CREATE TABLE libraryItems (id UUID PRIMARY KEY, path VARCHAR(255), relPath VARCHAR(255), mediaId UUID,
+                           mediaType VARCHAR(255), isMissing TINYINT(1), isInvalid TINYINT(1),
+                           title VARCHAR(255), authorNamesFirstLast VARCHAR(255),
+                           createdAt DATETIME NOT NULL, updatedAt DATETIME NOT NULL);
+CREATE TABLE mediaItemShares (id UUID PRIMARY KEY, mediaItemId UUID, mediaItemType VARCHAR(255),
+                              slug VARCHAR(255), expiresAt DATETIME,
+                              createdAt DATETIME NOT NULL, updatedAt DATETIME NOT NULL);
+"""
+T1, T2 = "2025-01-01 10:00:00.000 +00:00", "2025-02-01 10:00:00.000 +00:00"
+
+def abs_db(path):
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    return conn
+
+def add_item(conn, item_id, rel_path, title, author, duration=100.4, updated=T1):
+    conn.execute("INSERT INTO books VALUES (?, ?, ?, ?, ?)", (f"b-{item_id}", title, duration, T1, updated))
+    conn.execute("INSERT INTO libraryItems VALUES (?, ?, ?, ?, 'book', 0, 0, ?, ?, ?, ?)",
+                 (item_id, f"/audiobooks/{rel_path}", rel_path, f"b-{item_id}", title, author, T1, updated))
+
+def add_title(db, title_id, title, author, library_path=None, code=None):
+    db.add(Title(id=title_id, title=title, author=author, language="ca", duration_sec=0, price_retail=0,
+                 currency="EUR", library_path=library_path, abs_share_code=code,
+                 search_text=normalize_search_text(f"{title} {author}")))
+
+def setup(tmp_path):
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    conn = abs_db(tmp_path / "absdatabase.sqlite")
+    return engine, conn, AbsSync(engine, db_path=tmp_path / "absdatabase.sqlite")
+
+def codes(engine):
+    with Session(engine) as db:
+        return {t.id: (t.abs_share_code, t.duration_sec) for t in db.exec(select(Title)).all()}
+
+def test_matches_by_path_then_unique_title(tmp_path):
+    engine, conn, sync = setup(tmp_path)
+    add_item(conn, "i1", "cat/poemes", "Poemes", "Ausiàs March")
+    add_item(conn, "i2", "altres/contes", "Contes", "Víctor Català", duration=0)
+    add_item(conn, "i3", "x/a", "Repetit", "Anònim")
+    add_item(conn, "i4", "x/b", "Repetit", "Anònim")
+    conn.execute("INSERT INTO mediaItemShares VALUES ('s1', 'b-i1', 'book', 'poemes-share', NULL, ?, ?)", (T1, T1))
+    conn.commit()
+    with Session(engine) as db:
+        add_title(db, 1, "Poemes", "Altre autor", library_path="cat/poemes")
+        add_title(db, 2, "Contes", "Victor Catala")
+        add_title(db, 3, "Repetit", "Anònim")
+        db.commit()
+
+    result = sync.sync()
+    assert (result.read, result.matched, result.updated) == (4, 2, 2)
+    # Una durada 0 a ABS no esborra la del títol; un títol ambigu no s'assigna
+    assert codes(engine) == {1: ("poemes-share", 101), 2: ("i2", 0), 3: (None, 0)}
+
+def test_sync_is_incremental(tmp_path):
+    engine, conn, sync = setup(tmp_path)
+    add_item(conn, "i1", "cat/poemes", "Poemes", "Ausiàs March")
+    add_item(conn, "i2", "cat/contes", "Contes", "Víctor Català")
+    conn.commit()
+    with Session(engine) as db:
+        add_title(db, 1, "Poemes", "Ausiàs March", library_path="cat/poemes")
+        db.commit()
+    assert sync.sync().read == 2
+    assert sync.sync().read == 0
+
+    # Un títol nou sense codi es prova encara que el seu item no hagi canviat
+    with Session(engine) as db:
+        add_title(db, 2, "Contes", "Víctor Català", library_path="cat/contes")
+        db.commit()
+    assert sync.sync().updated == 1
+    assert codes(engine)[2] == ("i2", 101)
+
+    # Una durada ja coneguda (p.ex. la del seek index) no es sobreescriu
+    conn.execute("UPDATE books SET duration = 200, updatedAt = ? WHERE id = 'b-i1'", (T2,))
+    conn.execute("INSERT INTO mediaItemShares VALUES ('s1', 'b-i1', 'book', 'poemes-share', NULL, ?, ?)", (T2, T2))
+    conn.commit()
+    result = sync.sync()
+    assert (result.read, result.updated) == (1, 1)
+    assert codes(engine)[1] == ("poemes-share", 101)
+    assert sync.sync(full=True).read == 2
+
+def test_moved_share_code_is_released(tmp_path):
+    engine, conn, sync = setup(tmp_path)
+    add_item(conn, "i1", "cat/poemes", "Poemes", "Ausiàs March")
+    conn.commit()
+    with Session(engine) as db:
+        add_title(db, 1, "Poemes", "Ausiàs March", library_path="cat/poemes")
+        add_title(db, 2, "Vell", "Ningú", code="i1")
+        db.commit()
+    assert sync.sync().updated == 1
+    assert codes(engine) == {1: ("i1", 101), 2: (None, 0)}
+
+def test_expired_share_is_replaced(tmp_path):
+    engine, conn, sync = setup(tmp_path)
+    add_item(conn, "i1", "cat/poemes", "Poemes", "Ausiàs March")
+    conn.execute("INSERT INTO mediaItemShares VALUES ('s1', 'b-i1', 'book', 'poemes-share', ?, ?, ?)",
+                 ("2030-01-01 00:00:00.000 +00:00", T1, T1))
+    conn.commit()
+    with Session(engine) as db:
+        add_title(db, 1, "Poemes", "Ausiàs March", library_path="cat/poemes")
+        db.commit()
+
+    before, after = datetime(2029, 12, 31, tzinfo=timezone.utc), datetime(2030, 1, 2, tzinfo=timezone.utc)
+    sync.sync(now=before)
+    assert codes(engine)[1] == ("poemes-share", 101)
+    assert sync.sync(now=before).read == 0
+    # Caducar no toca cap updatedAt: la caducitat mateixa fa rellegir l'item, un sol cop
+    assert sync.sync(now=after).updated == 1
+    assert codes(engine)[1] == ("i1", 101)
+    assert sync.sync(now=after).read == 0
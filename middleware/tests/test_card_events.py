@@ -0,0 +1,99 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from sqlmodel import SQLModel, Session, create_engine, select
+from app import card_events
+from app.card_events import CardEventConsumer, card_event_insert
+from app.models import Claim, Title, TitleCounter, User
+from app.models.card_event import EVENT_CLAIM, EVENT_LEND, EVENT_PLAY_AUTH, EVENT_RETURN
+
+def make_consumer(url="sqlite://"):
+    engine = create_engine(url)
+    SQLModel.metadata.create_all(engine)
+    owner = User(email="owner@x", password_hash="x")
+    borrower = User(email="borrower@x", password_hash="x")
+    with Session(engine) as db:
+        db.add(Title(id=1, title="T", author="A", language="ca", duration_sec=1, price_retail=1, currency="EUR"))
+        db.add(owner)
+        db.add(borrower)
+        db.commit()
+        db.refresh(owner)
+        db.refresh(borrower)
+    return CardEventConsumer(engine, batch_size=2, lag=0), engine, owner.id, borrower.id
+
+def test_consumer_materialises_claims_and_counters():
+    consumer, engine, owner_id, borrower_id = make_consumer()
+    with engine.begin() as conn:
+        conn.execute(card_event_insert(EVENT_CLAIM, "EV-1", 1, owner_id))
+        conn.execute(card_event_insert(EVENT_PLAY_AUTH, "EV-1", 1, owner_id))
+        conn.execute(card_event_insert(EVENT_LEND, "EV-1", 1, owner_id, borrower_id))
+    assert consumer.run_once() == 3
+
+    with Session(engine) as db:
+        claim = db.exec(select(Claim)).one()
+        assert (claim.owner_email, claim.borrower_email, claim.status) == ("owner@x", "borrower@x", 2)
+
+    with engine.begin() as conn:
+        conn.execute(card_event_insert(EVENT_RETURN, "EV-1", 1, owner_id))
+    assert consumer.run_once() == 1
+    assert consumer.run_once() == 0
+
+    with Session(engine) as db:
+        claim = db.exec(select(Claim)).one()
+        assert claim.status == 1 and claim.returned_at is not None
+        counter = db.get(TitleCounter, 1)
+        assert (counter.claims, counter.lends, counter.returns, counter.play_auths) == (1, 1, 1, 1)
+
+def test_consumer_waits_for_lag():
+    consumer, engine, owner_id, _ = make_consumer()
+    with engine.begin() as conn:
+        conn.execute(card_event_insert(EVENT_CLAIM, "EV-2", 1, owner_id))
+    consumer.lag = 60
+    assert consumer.consume() == 0
+    assert consumer.consume(now=datetime.now(timezone.utc) + timedelta(minutes=2)) == 1
+
+def test_concurrent_consumers_apply_each_event_once(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'events.db'}",
+                           connect_args={"check_same_thread": False, "timeout": 30})
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.add(Title(id=1, title="T", author="A", language="ca", duration_sec=1, price_retail=1, currency="EUR"))
+        db.commit()
+    with engine.begin() as conn:
+        for i in range(200):
+            conn.execute(card_event_insert(EVENT_PLAY_AUTH, f"EV-{i}", 1))
+
+    consumers = [CardEventConsumer(engine, batch_size=5, lag=0) for _ in range(2)]
+    barrier = threading.Barrier(2)
+    def work(consumer):
+        barrier.wait()
+        return consumer.run_once()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        applied = list(pool.map(work, consumers))
+
+    assert sum(applied) == 200
+    with Session(engine) as db:
+        assert db.get(TitleCounter, 1).play_auths == 200
+
+def test_partition_failure_does_not_stop_consumption(tmp_path, monkeypatch, caplog):
+    consumer, engine, owner_id, _ = make_consumer(f"sqlite:///{tmp_path / 'events.db'}")
+    calls = []
+    def broken(conn):
+        calls.append(conn)
+        raise RuntimeError("lock timeout")
+    monkeypatch.setattr(card_events, "ensure_partitions", broken)
+    with engine.begin() as conn:
+        conn.execute(card_event_insert(EVENT_CLAIM, "EV-3", 1, owner_id))
+    consumer.interval = 0.01
+
+    async def run_briefly():
+        task = asyncio.create_task(consumer.run())
+        await asyncio.sleep(0.2)
+        task.cancel()
+    asyncio.run(run_briefly())
+
+    assert len(calls) == 1
+    assert "Cannot create cardevent partitions" in caplog.text
+    with Session(engine) as db:
+        assert db.exec(select(Claim)).one().qr == "EV-3"
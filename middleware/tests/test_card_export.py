@@ -0,0 +1,24 @@
+import gzip
+import json
+from app.card_export import encode_csv, encode_ndjson, gzip_stream
+
+CHUNKS = [
+    [("QR-1", "Ausiàs Marc", "abc", "", "warehouse", None)],
+    [("QR-2", "Ausiàs Marc", "abc", "Llibreria", "on_sale", "nota")],
+]
+
+def test_csv_is_streamed_per_chunk():
+    parts = list(encode_csv(CHUNKS))
+    assert len(parts) == 2
+    text = b"".join(parts).decode()
+    assert text.splitlines() == [
+        "qr,title,abs_share_code,store,retail_state,notes",
+        "QR-1,Ausiàs Marc,abc,,warehouse,",
+        "QR-2,Ausiàs Marc,abc,Llibreria,on_sale,nota",
+    ]
+
+def test_gzip_ndjson_roundtrip():
+    data = gzip.decompress(b"".join(gzip_stream(encode_ndjson(CHUNKS))))
+    rows = [json.loads(line) for line in data.decode().splitlines()]
+    assert rows[1]["store"] == "Llibreria"
+    assert rows[0]["notes"] is None
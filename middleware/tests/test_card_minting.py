@@ -0,0 +1,23 @@
+from sqlmodel import SQLModel, Session, create_engine, select, func
+from app.card_minting import generate_qr_codes, mint_cards
+from app.models import Batch, Card, Title
+
+def test_generated_codes_are_unique_and_prefixed():
+    codes = generate_qr_codes(35, 2000)
+    assert len(set(codes)) == 2000
+    assert all(code.startswith("QR-Z-") for code in codes)
+
+def test_mint_cards_creates_linked_batch():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as db:
+        title = Title(title="T", author="A", language="ca", duration_sec=1, price_retail=1, currency="EUR")
+        db.add(title)
+        db.commit()
+        db.refresh(title)
+
+        batch, codes = mint_cards(db, title.id, 12, notes="run 1")
+        assert db.get(Batch, batch.id).qty == 12
+        count = db.exec(select(func.count()).select_from(Card).where(Card.batch_id == batch.id)).one()
+        assert count == 12
+        assert db.get(Card, codes[0]).title_id == title.id
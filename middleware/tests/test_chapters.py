@@ -0,0 +1,45 @@
+import asyncio
+
+from sqlmodel import SQLModel, Session, create_engine
+
+from app import chapters
+from app.chapters import build_index, get_chapter_indexes
+from app.db import ThreadedSession
+from app.models import Chapter, Title
+
+def test_locate():
+    index = build_index(100, [(0, 30, "U"), (30, 70, "Dos"), (70, 100, "Tres")])
+    assert index.locate(0)["chapter"]["index"] == 0
+    at = index.locate(45.5)
+    assert (at["chapter"]["title"], at["chapter"]["offset"], at["percent_complete"]) == ("Dos", 15.5, 45.5)
+    assert index.locate(70)["chapter"]["index"] == 2
+    assert index.locate(500)["percent_complete"] == 100.0
+
+def test_locate_without_chapters_or_duration():
+    assert build_index(0, [(0, 80, "U")]).locate(40)["percent_complete"] == 50.0
+    assert build_index(200, []).locate(50) == {"chapter": None, "percent_complete": 25.0}
+    assert build_index(0, []).locate(50) == {"chapter": None, "percent_complete": None}
+
+def test_indexes_are_loaded_in_one_query_and_cached(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/chapters.db", connect_args={"check_same_thread": False})
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as db:
+        for title_id in (1, 2):
+            db.add(Title(id=title_id, title=f"T{title_id}", author="A", language="ca",
+                         duration_sec=60, price_retail=1, currency="EUR"))
+        db.add(Chapter(title_id=1, idx=1, start_sec=20, end_sec=60, name="Dos"))
+        db.add(Chapter(title_id=1, idx=0, start_sec=0, end_sec=20, name="U"))
+        db.commit()
+
+    chapters.invalidate()
+    with Session(engine) as session:
+        indexes = asyncio.run(get_chapter_indexes(ThreadedSession(session), [1, 2, 3]))
+    assert list(indexes[1].names) == ["U", "Dos"]
+    assert indexes[2].starts.tolist() == [] and 3 not in indexes
+
+    with Session(engine) as db:
+        db.get(Chapter, 1).name = "Canviat"
+        db.commit()
+    with Session(engine) as session:
+        assert asyncio.run(get_chapter_indexes(ThreadedSession(session), [1]))[1].names[1] == "Dos"
+    chapters.invalidate()
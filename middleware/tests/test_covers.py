@@ -0,0 +1,56 @@
+from datetime import datetime, timezone
+
+from PIL import Image
+from sqlmodel import SQLModel, Session, create_engine, select
+
+from app.covers import build_covers, cover_url, derivative_names, make_thumbnails
+from app.models import LibraryFolder, Title
+
+def make_cover(path, size=(800, 1200)):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    Image.new("RGB", size, (200, 40, 40)).save(path, "PNG")
+    return path
+
+def test_make_thumbnails_writes_each_size_once(tmp_path):
+    source = make_cover(tmp_path / "cover.png")
+    out = tmp_path / "covers"
+    digest, error = make_thumbnails(str(source), str(out), sizes=(160, 320))
+    assert error is None and len(digest) == 20
+    assert sorted(p.name for p in out.iterdir()) == sorted(derivative_names(digest, (160, 320)))
+    with Image.open(out / f"{digest}-320.webp") as thumb:
+        assert thumb.size == (213, 320)  # el costat llarg, mantenint la proporció
+    with Image.open(out / f"{digest}-160.jpg") as thumb:
+        assert thumb.format == "JPEG" and thumb.size[1] == 160
+
+    mtime = (out / f"{digest}-320.webp").stat().st_mtime_ns
+    assert make_thumbnails(str(source), str(out), sizes=(160, 320)) == (digest, None)
+    assert (out / f"{digest}-320.webp").stat().st_mtime_ns == mtime
+
+def test_make_thumbnails_reports_bad_images(tmp_path):
+    (tmp_path / "cover.jpg").write_bytes(b"img")
+    digest, error = make_thumbnails(str(tmp_path / "cover.jpg"), str(tmp_path / "covers"))
+    assert digest is None and "UnidentifiedImageError" in error
+    assert not (tmp_path / "covers").exists()
+
+def test_build_covers_keeps_external_urls(tmp_path):
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    library = tmp_path / "library"
+    make_cover(library / "one/cover.png")
+    make_cover(library / "two/cover.png", size=(300, 300))
+    now = datetime.now(timezone.utc)
+    with Session(engine) as db:
+        db.add(Title(id=1, title="One", author="A", language="ca", duration_sec=0, currency="EUR", price_retail=0, library_path="one"))
+        db.add(Title(id=2, title="Two", author="B", language="ca", duration_sec=0, currency="EUR", price_retail=0, library_path="two",
+                     cover_url="https://example.com/two.jpg"))
+        db.add(LibraryFolder(path="one", signature="x", title_id=1, cover_file="cover.png", indexed_at=now))
+        db.add(LibraryFolder(path="two", signature="y", title_id=2, cover_file="cover.png", indexed_at=now))
+        db.commit()
+
+    assert build_covers(engine, root=library, out_dir=tmp_path / "covers", workers=0) == 1
+    with Session(engine) as db:
+        one, two = db.exec(select(Title).order_by(Title.id)).all()
+    digest, _ = make_thumbnails(str(library / "one/cover.png"), str(tmp_path / "covers"))
+    assert one.cover_url == cover_url(digest)
+    assert two.cover_url == "https://example.com/two.jpg"
+    assert build_covers(engine, root=library, out_dir=tmp_path / "covers", workers=0, paths=["one"]) == 0
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlmodel import SQLModel, Session, create_engine, select
+from app.dashboard import DashboardAggregator, read_analytics
+from app.models import Card, CardStateCount, ListeningProgress, Title, User
+from app.progress_buffer import ProgressBuffer
+
+def make_db():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as db:
+        for title_id in (1, 2):
+            db.add(Title(id=title_id, title=f"T{title_id}", author="A", language="ca",
+                         duration_sec=1, price_retail=1, currency="EUR"))
+        db.add(Card(qr="D1", title_id=1, retail_state="sold", user_state=1))
+        db.add(Card(qr="D2", title_id=1, retail_state="sold", user_state=2))
+        db.add(Card(qr="D3", title_id=1))
+        db.add(Card(qr="D4", title_id=2))
+        db.commit()
+    return engine
+
+def test_refresh_and_read():
+    engine = make_db()
+    aggregator = DashboardAggregator(engine, overlap=0)
+    with Session(engine) as db:
+        user = User(email="u@x", password_hash="x")
+        db.add(user)
+        db.commit()
+        db.add(ListeningProgress(user_id=user.id, qr="D1", position=120.0))
+        db.commit()
+    assert aggregator.refresh() == 3
+    assert aggregator.refresh() == 0
+
+    with Session(engine) as db:
+        data = read_analytics(db)
+    t1, t2 = data["titles"]
+    assert (t1["cards"], t1["active_loans"], t1["claim_rate"]) == (3, 1, 1.0)
+    assert t1["by_retail_state"] == {"sold": 2, "warehouse": 1}
+    assert (t1["listeners"], t1["listening_minutes"]) == (1, 2.0)
+    assert t2["cards"] == 1 and t2["claim_rate"] is None
+    assert data["totals"]["cards"] == 4
+
+def test_refresh_only_touches_changed_titles():
+    engine = make_db()
+    aggregator = DashboardAggregator(engine, overlap=0)
+    aggregator.refresh()
+    with Session(engine) as db:
+        card = db.get(Card, "D4")
+        card.retail_state = "sold"
+        db.add(card)
+        db.commit()
+    assert aggregator.refresh_card_states() == 1
+    with Session(engine) as db:
+        rows = db.exec(select(CardStateCount).where(CardStateCount.title_id == 2)).all()
+    assert [(r.retail_state, r.cards) for r in rows] == [("sold", 1)]
+
+def test_late_flush_is_not_missed():
+    engine = make_db()
+    aggregator = DashboardAggregator(engine)  # solapament per defecte
+    buffer = ProgressBuffer(engine)
+    with Session(engine) as db:
+        users = [User(email=f"u{i}@x", password_hash="x") for i in range(2)]
+        db.add_all(users)
+        db.commit()
+        first, second = (u.id for u in users)
+
+    buffer.record(first, "D1", 60.0)
+    buffer.flush()
+    aggregator.refresh_listening()
+
+    # Heartbeat de fa 10 minuts que arriba ara (flush fallit i reintentat)
+    buffer._pending[(second, "D4")] = (60.0, datetime.now(timezone.utc) - timedelta(minutes=10))
+    buffer.flush()
+    aggregator.refresh_listening()
+    with Session(engine) as db:
+        assert read_analytics(db)["titles"][1]["listeners"] == 1
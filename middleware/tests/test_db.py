@@ -0,0 +1,28 @@
+import asyncio
+
+from sqlalchemy import event
+from sqlmodel import SQLModel, create_engine
+
+from app import db as db_module
+from app.models import Title
+
+def test_threaded_session_does_not_lazy_load_after_commit(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path}/db.db", connect_args={"check_same_thread": False})
+    SQLModel.metadata.create_all(engine)
+    monkeypatch.setattr(db_module, "engine", engine)
+    monkeypatch.setattr(db_module, "async_engine", None)  # el camí ThreadedSession, també en mode asíncron
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    async def commit_then_read():
+        async with db_module.async_session_scope() as db:
+            title = Title(id=1, title="T", author="A", language="ca", duration_sec=1,
+                          price_retail=1, currency="EUR", abs_share_code="abc")
+            db.add(title)
+            await db.commit()
+            statements.clear()
+            # Com get_play_auth: llegeix atributs després del commit
+            return title.abs_share_code, title.title
+
+    assert asyncio.run(commit_then_read()) == ("abc", "T")
+    assert statements == []
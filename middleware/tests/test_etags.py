@@ -0,0 +1,42 @@
+from app.etags import if_none_match, make_etag
+
+def test_etag_is_stable_and_quoted():
+    etag = make_etag("Q1", 1, None)
+    assert etag == make_etag("Q1", 1, None)
+    assert etag.startswith('"') and etag.endswith('"')
+    assert etag != make_etag("Q1", 2, None)
+
+def test_if_none_match():
+    etag = make_etag("Q1")
+    assert if_none_match(etag, etag)
+    assert if_none_match(f'"other", W/{etag}', etag)
+    assert if_none_match("*", etag)
+    assert not if_none_match(None, etag)
+    assert not if_none_match('"other"', etag)
+
+def test_status_etag_revalidates_and_changes(client, login, new_cards):
+    _, owner = login()
+    friend_email, _ = login()
+    (qr,) = new_cards(prefix="ET")
+    client.post(f"/api/v1/claim/{qr}", headers=owner)
+    url = f"/api/v1/abook/{qr}/status"
+
+    def status(etag=None):
+        return client.get(url, headers={**owner, **({"If-None-Match": etag} if etag else {})})
+
+    first = status()
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and first.headers["Cache-Control"] == "private, no-cache"
+    cached = status(etag)
+    assert (cached.status_code, cached.content, cached.headers["ETag"]) == (304, b"", etag)
+
+    client.post(f"/api/v1/abook/{qr}/progress", json={"position": 90.0}, headers=owner)
+    after_progress = status(etag)
+    assert after_progress.status_code == 200 and after_progress.json()["start_position"] == 90.0
+    assert after_progress.headers["ETag"] != etag
+
+    etag = after_progress.headers["ETag"]
+    client.post(f"/api/v1/lend/{qr}", json={"borrower_email": friend_email}, headers=owner)
+    after_lend = status(etag)
+    assert after_lend.status_code == 200 and after_lend.json()["status"] == 2
+    assert after_lend.headers["ETag"] != etag
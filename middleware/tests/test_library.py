@@ -0,0 +1,48 @@
+def test_my_library_pages_owned_and_borrowed_cards(client, login, new_cards):
+    owner_email, owner = login()
+    friend_email, friend = login()
+    qrs = new_cards(3, prefix="LIB")
+    for qr in qrs:
+        assert client.post(f"/api/v1/claim/{qr}", headers=owner).status_code == 200
+    client.post(f"/api/v1/lend/{qrs[1]}", json={"borrower_email": friend_email}, headers=owner)
+
+    first = client.get("/api/v1/me/library", params={"limit": 2}, headers=owner).json()
+    assert [item["qr"] for item in first["items"]] == qrs[:2]
+    rest = client.get("/api/v1/me/library", params={"cursor": first["next_cursor"]}, headers=owner).json()
+    assert [item["qr"] for item in rest["items"]] == qrs[2:]
+    assert rest["next_cursor"] is None
+    assert first["items"][0]["title"]["title"] == "Tirant lo Blanc"
+
+    borrowed = client.get("/api/v1/me/library", headers=friend).json()["items"]
+    assert [(item["qr"], item["owner_email"], item["can_play"]) for item in borrowed] == [
+        (qrs[1], owner_email, True)]
+
+def test_my_library_rejects_a_bad_cursor(client, login):
+    _, headers = login()
+    response = client.get("/api/v1/me/library", params={"cursor": "not-a-cursor"}, headers=headers)
+    assert response.status_code == 400
+
+def test_status_batch_keeps_request_order_and_lists_unknown_qrs(client, login, new_cards):
+    _, headers = login()
+    a, b = new_cards(2, prefix="BAT")
+    body = {"qrs": [b, "BAT-missing", a, b]}
+    data = client.post("/api/v1/abooks/status:batch", json=body, headers=headers).json()
+    assert [item["qr"] for item in data["items"]] == [b, a]
+    assert data["not_found"] == ["BAT-missing"]
+
+def test_status_batch_hides_emails_of_other_users_cards(client, login, new_cards):
+    owner_email, owner = login()
+    friend_email, friend = login()
+    _, stranger = login()
+    mine, lent = new_cards(2, prefix="VIS")
+    client.post(f"/api/v1/claim/{mine}", headers=owner)
+    client.post(f"/api/v1/claim/{lent}", headers=owner)
+    client.post(f"/api/v1/lend/{lent}", json={"borrower_email": friend_email}, headers=owner)
+
+    def emails(headers):
+        items = client.post("/api/v1/abooks/status:batch", json={"qrs": [mine, lent]}, headers=headers).json()["items"]
+        return [(item["owner_email"], item["borrower_email"]) for item in items]
+
+    assert emails(owner) == [(owner_email, None), (owner_email, friend_email)]
+    assert emails(friend) == [(None, None), (owner_email, friend_email)]
+    assert emails(stranger) == [(None, None), (None, None)]
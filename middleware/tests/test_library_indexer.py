@@ -0,0 +1,140 @@
+import json
+import os
+
+from sqlalchemy import update
+from sqlmodel import SQLModel, Session, create_engine, select
+from app.library_indexer import LibraryIndexer, parse_folder
+from app.models import Chapter, LibraryFolder, Title
+from app.title_search import build_search_query
+
+def make_book(root, path, title, chapters=((0, 60), (60, 150.5)), cover="cover.jpg"):
+    folder = root / path
+    folder.mkdir(parents=True)
+    (folder / "metadata.json").write_text(json.dumps({
+        "title": title, "authors": ["Ausiàs March"], "language": None,
+        "chapters": [{"id": i, "start": s, "end": e, "title": f"Cap {i}"} for i, (s, e) in enumerate(chapters)],
+    }))
+    (folder / "01.mp3").write_bytes(b"\xff" * 10)
+    if cover:
+        (folder / cover).write_bytes(b"img")
+    return folder
+
+def make_indexer(tmp_path):
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    return LibraryIndexer(engine, root=tmp_path / "library", workers=0)
+
+def test_parse_folder(tmp_path):
+    make_book(tmp_path, "a/book", "Poemes")
+    book = parse_folder(str(tmp_path), "a/book")
+    assert (book["title"], book["author"], book["language"]) == ("Poemes", "Ausiàs March", "ca")
+    assert book["duration_sec"] == 151
+    assert [c["name"] for c in book["chapters"]] == ["Cap 0", "Cap 1"]
+    assert book["cover_file"] == "cover.jpg"
+    (tmp_path / "a/book/metadata.json").write_text("{")
+    assert "error" in parse_folder(str(tmp_path), "a/book")
+
+def test_index_is_incremental(tmp_path):
+    indexer = make_indexer(tmp_path)
+    library = tmp_path / "library"
+    make_book(library, "cat/one", "Poemes")
+    make_book(library, "cat/two", "Contes", chapters=((0, 10),))
+    (library / "cat/empty").mkdir()
+
+    result = indexer.index()
+    assert (result.scanned, result.indexed) == (2, 2)
+    assert indexer.index().indexed == 0
+
+    meta = library / "cat/two/metadata.json"
+    data = json.loads(meta.read_text())
+    data["chapters"].append({"id": 1, "start": 10, "end": 25, "title": "Nou"})
+    meta.write_text(json.dumps(data))
+    os.utime(meta, ns=(10**18, 10**18))
+    assert indexer.index().indexed == 1
+
+    with Session(indexer.bind) as db:
+        two = db.exec(select(Title).where(Title.library_path == "cat/two")).one()
+        # La durada de metadata.json només omple un buit (la del seek index guanya)
+        assert (two.duration_sec, two.active, two.search_text) == (10, False, "contes ausias march")
+        chapters = db.exec(select(Chapter).where(Chapter.title_id == two.id).order_by(Chapter.idx)).all()
+        assert [c.name for c in chapters] == ["Cap 0", "Nou"]
+        assert db.exec(build_search_query("sqlite", "conte", False)).all() == [two]
+
+def test_removed_folder_deactivates_title(tmp_path):
+    indexer = make_indexer(tmp_path)
+    library = tmp_path / "library"
+    make_book(library, "one", "Poemes")
+    make_book(library, "two", "Contes")
+    indexer.index()
+    with Session(indexer.bind) as db:
+        title = db.exec(select(Title).where(Title.library_path == "two")).one()
+        title.active = True
+        title.price_retail = 9.9
+        db.add(title)
+        db.commit()
+    indexer.index(full=True)
+    with Session(indexer.bind) as db:
+        title = db.exec(select(Title).where(Title.library_path == "two")).one()
+        assert (title.active, title.price_retail) == (True, 9.9)
+
+    for f in (library / "two").iterdir():
+        f.unlink()
+    (library / "two").rmdir()
+    assert indexer.index().removed == 1
+    assert indexer.index().removed == 0
+    with Session(indexer.bind) as db:
+        assert db.exec(select(Title.active).where(Title.library_path == "two")).one() is False
+        assert db.exec(select(LibraryFolder.path).where(LibraryFolder.missing_since.is_(None))).all() == ["one"]
+
+    # Quan la carpeta torna, el títol que va desactivar l'indexador es reactiva
+    make_book(library, "two", "Contes")
+    assert indexer.index().indexed == 1
+    with Session(indexer.bind) as db:
+        assert db.exec(select(Title.active).where(Title.library_path == "two")).one() is True
+
+def test_returning_folder_keeps_inactive_titles_inactive(tmp_path):
+    indexer = make_indexer(tmp_path)
+    library = tmp_path / "library"
+    make_book(library, "one", "Poemes")
+    folder = make_book(library, "two", "Contes")
+    indexer.index()
+    for f in folder.iterdir():
+        f.unlink()
+    folder.rmdir()
+    indexer.index()
+    make_book(library, "two", "Contes")
+    indexer.index()
+    with Session(indexer.bind) as db:
+        assert db.exec(select(Title.active).where(Title.library_path == "two")).one() is False
+
+def test_hand_entered_title_is_adopted(tmp_path):
+    indexer = make_indexer(tmp_path)
+    library = tmp_path / "library"
+    make_book(library, "cat/poemes", "Poemes")
+    make_book(library, "cat/repetit-1", "Repetit")
+    make_book(library, "cat/repetit-2", "Repetit")
+    with Session(indexer.bind) as db:
+        db.add(Title(id=7, title="POEMES", author="Ausias March", language="ca", duration_sec=0,
+                     price_retail=12, currency="EUR", active=True))
+        db.add(Title(id=8, title="Repetit", author="Ausiàs March", language="ca", duration_sec=0,
+                     price_retail=5, currency="EUR", active=True))
+        db.commit()
+
+    assert indexer.index().adopted == 1
+    with Session(indexer.bind) as db:
+        poemes = db.exec(select(Title).where(Title.library_path == "cat/poemes")).one()
+        assert (poemes.id, poemes.active, poemes.price_retail, poemes.title) == (7, True, 12, "Poemes")
+        assert len(db.exec(select(Chapter).where(Chapter.title_id == 7)).all()) == 2
+        # Ambigu: dues carpetes amb el mateix títol i autor, el títol a mà no s'adopta
+        assert db.get(Title, 8).library_path is None
+        assert len(db.exec(select(Title)).all()) == 4
+
+def test_reindex_keeps_seek_index_duration(tmp_path):
+    indexer = make_indexer(tmp_path)
+    make_book(tmp_path / "library", "one", "Poemes")
+    indexer.index()
+    with indexer.bind.begin() as conn:
+        conn.execute(update(Title).values(duration_sec=260))  # com fa seek_index.build_all
+    indexer.index(full=True)
+    with Session(indexer.bind) as db:
+        assert db.exec(select(Title.duration_sec)).one() == 260
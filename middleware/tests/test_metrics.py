@@ -0,0 +1,33 @@
+from app import metrics
+
+def test_histogram_renders_cumulative_buckets():
+    h = metrics.histogram("test_latency_seconds", "Test latency", buckets=(0.1, 1.0))
+    h.observe(0.05, route="a")
+    h.observe(0.5, route="a")
+    h.observe(5, route="a")
+    text = metrics.render_latest()
+    assert 'test_latency_seconds_bucket{route="a",le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{route="a",le="1.0"} 2' in text
+    assert 'test_latency_seconds_bucket{route="a",le="+Inf"} 3' in text
+    assert 'test_latency_seconds_count{route="a"} 3' in text
+
+def test_gauge_function_is_evaluated_at_scrape_time():
+    value = {"n": 1}
+    g = metrics.gauge("test_live_value", "Live value")
+    g.set_function(lambda: value["n"], pool="x")
+    value["n"] = 7
+    assert 'test_live_value{pool="x"} 7.0' in metrics.render_latest()
+
+def test_metrics_endpoint_requires_token(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.api import metrics as metrics_api
+    app = FastAPI()
+    app.include_router(metrics_api.router)
+    client = TestClient(app)
+    monkeypatch.setattr(metrics_api, "METRICS_TOKEN", "s3cret")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer nope"}).status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer é".encode("latin-1")}).status_code == 401
+    r = client.get("/metrics", headers={"Authorization": "Bearer s3cret"})
+    assert r.status_code == 200 and "# TYPE" in r.text
@@ -0,0 +1,94 @@
+import base64
+import uuid
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from sqlmodel import Session
+
+from app.auth import get_current_config_superuser
+from app.pagination import decode_cursor, encode_cursor
+
+def test_cursor_round_trip():
+    when = datetime(2025, 1, 2, 3, 4, 5, 600000)
+    cursor = encode_cursor(when, "QR-1")
+    assert "=" not in cursor
+    assert decode_cursor(cursor, 2) == [when.isoformat(), "QR-1"]
+
+@pytest.mark.parametrize("cursor", [
+    "%%%", "bm90IGpzb24", encode_cursor("a", "b"), base64.urlsafe_b64encode(b'{"qr":"a"}').decode(),
+])
+def test_bad_cursor_is_400(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor, 1)
+    assert (exc.value.status_code, exc.value.detail) == (400, "INVALID_CURSOR")
+
+@pytest.fixture
+def admin(client):
+    client.app.dependency_overrides[get_current_config_superuser] = lambda: {"email": "su@example.com"}
+    yield client
+    client.app.dependency_overrides.pop(get_current_config_superuser)
+
+@pytest.fixture
+def cards():
+    """Two titles; five cards of the first share one ``updated_at``."""
+    from app.db import engine
+    from app.models import Card, Title
+
+    tag = uuid.uuid4().hex[:8]
+    same, later = datetime(2025, 5, 1, 12, 0), datetime(2025, 5, 2, 12, 0)
+    with Session(engine) as db:
+        titles = [Title(title=f"P{i}", author="A", language="ca", duration_sec=1,
+                        price_retail=1, currency="EUR") for i in range(2)]
+        db.add_all(titles)
+        db.commit()
+        first, second = titles[0].id, titles[1].id
+        rows = [Card(qr=f"PG-{tag}-{i}", title_id=first, updated_at=same) for i in range(5)]
+        rows.append(Card(qr=f"PG-{tag}-5", title_id=first, updated_at=later, user_state=1))
+        rows += [Card(qr=f"PG-{tag}-{i}", title_id=second, updated_at=later) for i in range(6, 8)]
+        db.add_all(rows)
+        db.commit()
+    return tag, first, second
+
+def _pages(client, **params):
+    """Every page of ``GET /admin/cards`` with ``params``: the list of QR lists."""
+    pages, cursor = [], None
+    while True:
+        response = client.get("/api/v1/admin/cards", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        data = response.json()
+        pages.append([card["qr"] for card in data["items"]])
+        cursor = data["next_cursor"]
+        if cursor is None:
+            return pages
+
+def test_list_cards_by_qr(admin, cards):
+    tag, first, second = cards
+    pages = _pages(admin, q=tag, limit=3)
+    assert pages == [[f"PG-{tag}-{i}" for i in range(j, min(j + 3, 8))] for j in (0, 3, 6)]
+
+def test_list_cards_by_updated_at_with_ties(admin, cards):
+    tag, first, second = cards
+    pages = _pages(admin, q=tag, order="updated_at", limit=2)
+    assert [qr for page in pages for qr in page] == [f"PG-{tag}-{i}" for i in (7, 6, 5, 4, 3, 2, 1, 0)]
+    assert all(len(page) == 2 for page in pages)
+
+def test_list_cards_filters_apply_across_pages(admin, cards):
+    tag, first, second = cards
+    pages = _pages(admin, title=first, order="updated_at", limit=2)
+    assert [qr for page in pages for qr in page] == [f"PG-{tag}-{i}" for i in (5, 4, 3, 2, 1, 0)]
+    pages = _pages(admin, title=first, user_state=0, limit=2)
+    assert [qr for page in pages for qr in page] == [f"PG-{tag}-{i}" for i in range(5)]
+    response = admin.get("/api/v1/admin/cards", params={"q": tag, "with_total": True, "limit": 1})
+    assert response.json()["total"] == 8
+
+@pytest.mark.parametrize("order, cursor", [
+    ("qr", "not-a-cursor"),
+    ("qr", encode_cursor(datetime(2025, 1, 1), "PG")),
+    ("updated_at", encode_cursor("PG")),
+    ("updated_at", encode_cursor("yesterday", "PG")),
+    ("updated_at", encode_cursor(None, "PG")),
+])
+def test_list_cards_rejects_tampered_cursor(admin, order, cursor):
+    response = admin.get("/api/v1/admin/cards", params={"order": order, "cursor": cursor})
+    assert (response.status_code, response.json()["detail"]) == (400, "INVALID_CURSOR")
@@ -0,0 +1,48 @@
+import asyncio
+import os
+import signal
+
+import pytest
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from app.passwords import PasswordHasher
+
+def test_verify_and_update_rehashes_outdated_hash():
+    old_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("secret")
+    hasher = PasswordHasher(workers=0, max_queue=4)
+    valid, new_hash = asyncio.run(hasher.verify_and_update("secret", old_hash))
+    assert valid
+    assert new_hash and new_hash != old_hash
+    assert asyncio.run(hasher.verify("wrong", new_hash)) is False
+
+def test_full_queue_sheds_with_503():
+    hasher = PasswordHasher(workers=0, max_queue=0)
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(hasher.hash("secret"))
+    assert exc.value.status_code == 503
+    assert "Retry-After" in exc.value.headers
+
+def _die(*args):
+    os._exit(1)
+
+def test_pool_is_replaced_after_a_worker_dies():
+    hasher = PasswordHasher(workers=1, max_queue=4)
+
+    async def scenario():
+        first = await hasher.hash("secret")
+        broken = hasher._executor
+        for process in list(broken._processes.values()):
+            os.kill(process.pid, signal.SIGKILL)
+        second = await hasher.hash("secret")
+        assert hasher._executor is not broken
+        assert await hasher.verify("secret", first) and await hasher.verify("secret", second)
+
+        with pytest.raises(HTTPException) as exc:
+            await hasher._submit(_die)
+        assert exc.value.status_code == 503
+        assert await hasher.verify("secret", first)
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        hasher.shutdown()
@@ -0,0 +1,37 @@
+import uuid
+from sqlmodel import SQLModel, Session, create_engine, select
+from sqlalchemy.pool import StaticPool
+from app.models import ListeningProgress
+from app.progress_buffer import ProgressBuffer
+
+def make_buffer():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    return ProgressBuffer(engine, flush_interval=60, max_pending=1000), engine
+
+def test_buffer_keeps_latest_position():
+    buffer, engine = make_buffer()
+    user_id = uuid.uuid4()
+    buffer.record(user_id, "PB-1", 10.0)
+    buffer.record(user_id, "PB-1", 20.0)
+    assert len(buffer) == 1
+    assert buffer.get(user_id, "PB-1") == 20.0
+
+    assert buffer.flush() == 1
+    assert buffer.get(user_id, "PB-1") is None
+    with Session(engine) as db:
+        rows = db.exec(select(ListeningProgress)).all()
+    assert [(r.user_id, r.qr, r.position) for r in rows] == [(user_id, "PB-1", 20.0)]
+
+def test_flush_upserts_existing_row():
+    buffer, engine = make_buffer()
+    user_id = uuid.uuid4()
+    buffer.record(user_id, "PB-2", 5.0)
+    buffer.flush()
+    buffer.record(user_id, "PB-2", 50.0)
+    buffer.record(uuid.uuid4(), "PB-2", 1.0)
+    assert buffer.flush() == 2
+    with Session(engine) as db:
+        rows = db.exec(select(ListeningProgress).where(ListeningProgress.user_id == user_id)).all()
+    assert len(rows) == 1
+    assert rows[0].position == 50.0
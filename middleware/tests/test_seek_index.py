@@ -0,0 +1,49 @@
+import pytest
+
+from app.seek_index import SeekIndex, build_index, build_title, is_current, load_index, parse_frames
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz, sense padding: 417 bytes i 1152 mostres per trama
+FRAME = b"\xff\xfb\x90\x00" + b"\x00" * 413
+FRAME_SEC = 1152 / 44100
+
+def mp3(frames: int, garbage: bytes = b"") -> bytes:
+    id3 = b"ID3\x04\x00\x00\x00\x00\x00\x0a" + b"\x00" * 10
+    xing = b"\xff\xfb\x90\x00" + b"\x00" * 32 + b"Xing" + b"\x00" * 377
+    return id3 + xing + FRAME * (frames // 2) + garbage + FRAME * (frames - frames // 2) + b"TAG" + b"\x00" * 125
+
+def test_parse_frames_skips_tags_info_frame_and_garbage():
+    track = parse_frames(mp3(100, garbage=b"junk!!!"))
+    assert len(track.offsets) == 100
+    assert track.offsets[0] == 20 + 417
+    assert track.offsets[50] == 20 + 417 * 51 + len(b"junk!!!")
+    assert track.duration == pytest.approx(100 * FRAME_SEC)
+    assert track.times[1] == pytest.approx(FRAME_SEC)
+
+def test_build_index_spans_tracks():
+    a, b = parse_frames(mp3(100)), parse_frames(mp3(50))
+    entries = build_index([a, b], granularity=1.0)
+    assert len(entries) == 4  # 150 trames = 3,9 s
+    index = SeekIndex(1.0, a.duration + b.duration, entries)
+    assert index.locate(0) == {"track": 0, "byte_offset": 437, "track_position": 0.0}
+    at = index.locate(3.5)  # entrada de 3 s: dins la segona pista
+    assert at["track"] == 1
+    assert at["track_position"] == pytest.approx(3 - a.duration, abs=FRAME_SEC)
+    assert index.locate(99)["track"] == 1
+
+def test_build_title_saves_a_memory_mapped_index(tmp_path):
+    book = tmp_path / "library" / "book"
+    book.mkdir(parents=True)
+    (book / "01.mp3").write_bytes(mp3(100))
+    (book / "02.mp3").write_bytes(mp3(100))
+    out = tmp_path / "seek"
+    title_id, duration, error = build_title(7, "book", str(tmp_path / "library"), str(out))
+    assert (title_id, error) == (7, None)
+    assert duration == pytest.approx(200 * FRAME_SEC)
+    assert is_current(7, "book", tmp_path / "library", out)
+
+    index = load_index(7, out)
+    assert index.entries.filename and len(index.entries) == 6
+    assert load_index(8, out) is None
+
+    (book / "02.mp3").write_bytes(mp3(90))
+    assert not is_current(7, "book", tmp_path / "library", out)
@@ -0,0 +1,41 @@
+import asyncio
+import pytest
+from app.session_store import MemorySessionStore, RedisSessionStore
+
+def memory_store():
+    return MemorySessionStore()
+
+def redis_store():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    return RedisSessionStore(fakeredis.FakeAsyncRedis())
+
+@pytest.fixture(params=[memory_store, redis_store], ids=["memory", "redis"])
+def store(request):
+    return request.param()
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_acquire_refresh_and_conflict(store):
+    assert run(store.acquire("SS-1", "alice", ttl=60))
+    assert run(store.acquire("SS-1", "alice", ttl=60))
+    assert not run(store.acquire("SS-1", "bob", ttl=60))
+    assert run(store.holder("SS-1")) == "alice"
+
+def test_release_only_by_holder(store):
+    run(store.acquire("SS-2", "alice", ttl=60))
+    assert not run(store.release("SS-2", "bob"))
+    assert run(store.release("SS-2", "alice"))
+    assert run(store.acquire("SS-2", "bob", ttl=60))
+
+def test_expired_session_is_free(store):
+    run(store.acquire("SS-3", "alice", ttl=0.05))
+    run(asyncio.sleep(0.1))
+    assert run(store.holder("SS-3")) is None
+    assert run(store.acquire("SS-3", "bob", ttl=60))
+
+def test_concurrent_acquire_has_one_winner(store):
+    async def race():
+        return await asyncio.gather(*(store.acquire("SS-4", f"user-{i}", ttl=60) for i in range(50)))
+    assert sum(run(race())) == 1
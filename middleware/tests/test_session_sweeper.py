@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta, timezone
+from sqlmodel import SQLModel, Session, create_engine, select
+from app.models import Card, PlaySession, Title
+from app.session_sweeper import ACTIVE_SESSIONS, PlaySessionSweeper
+
+def make_sweeper():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    now = datetime.now(timezone.utc)
+    with Session(engine) as db:
+        db.add(Title(id=7, title="T", author="A", language="ca", duration_sec=1, price_retail=1, currency="EUR"))
+        db.add(Card(qr="SW-1", title_id=7))
+        for minutes in (-120, -60, -1, 30):
+            db.add(PlaySession(qr="SW-1", device_id="d", expires_at=now + timedelta(minutes=minutes)))
+        db.commit()
+    return PlaySessionSweeper(engine, batch_size=2), engine
+
+def test_sweep_deletes_expired_in_batches():
+    sweeper, engine = make_sweeper()
+    assert sweeper.sweep() == 3
+    with Session(engine) as db:
+        remaining = db.exec(select(PlaySession)).all()
+    assert len(remaining) == 1
+    assert sweeper.sweep() == 0
+
+def test_active_sessions_gauge_per_title():
+    sweeper, engine = make_sweeper()
+    sweeper.sweep()
+    assert ACTIVE_SESSIONS.value(title_id="7") == 1
+    with Session(engine) as db:
+        for session in db.exec(select(PlaySession)).all():
+            db.delete(session)
+        db.commit()
+    sweeper.update_metrics()
+    assert ACTIVE_SESSIONS.value(title_id="7") == 0
@@ -0,0 +1,55 @@
+import os
+
+import pytest
+
+from app.streaming import FileHandleCache, audio_tracks, parse_range
+
+def test_parse_range():
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=50-500", 100) == (50, 99)
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    assert parse_range("items=0-1", 100) is None
+    with pytest.raises(ValueError):
+        parse_range("bytes=100-", 100)
+
+def test_audio_tracks_sorted_and_confined(tmp_path):
+    book = tmp_path / "book"
+    book.mkdir()
+    for name in ("02.mp3", "01.MP3", "cover.jpg", "metadata.json"):
+        (book / name).write_bytes(b"x")
+    assert [p.name for p in audio_tracks("book", tmp_path)] == ["01.MP3", "02.mp3"]
+    assert audio_tracks("../", tmp_path / "book") == ()
+    assert audio_tracks("missing", tmp_path) == ()
+
+def test_handles_are_reused_and_closed_after_last_release(tmp_path):
+    a, b = tmp_path / "a.mp3", tmp_path / "b.mp3"
+    a.write_bytes(b"aaaa")
+    b.write_bytes(b"bbbb")
+    cache = FileHandleCache(maxsize=1, check_interval=3600)
+    first = cache.acquire(a)
+    assert cache.acquire(a) is first
+    cache.release(first)
+
+    cache.acquire(b)  # expulsa a.mp3, però encara hi ha una resposta en curs
+    assert not first.file.closed
+    cache.release(first)
+    assert first.file.closed
+
+def test_replaced_file_is_reopened(tmp_path):
+    path = tmp_path / "a.mp3"
+    path.write_bytes(b"old")
+    cache = FileHandleCache(maxsize=4, check_interval=0)
+    old = cache.acquire(path)
+    cache.release(old)
+    path.write_bytes(b"newer")
+    os.utime(path, ns=(old.stat.st_mtime_ns + 10**9,) * 2)
+    new = cache.acquire(path)
+    assert new is not old and new.size == 5
+    assert old.file.closed
+    assert os.pread(new.file.fileno(), 5, 0) == b"newer"
+    cache.release(new)
+    cache.close()
+    assert new.file.closed
@@ -0,0 +1,79 @@
+import asyncio
+import json
+import os
+
+import httpx
+from fastapi import FastAPI
+from passlib.context import CryptContext
+
+from app.passwords import PasswordHasher
+from app.superuser import LoginThrottle, SuperuserConfig
+
+HASH = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("secret")
+
+def _write(path, data, mtime_ns):
+    path.write_text(json.dumps(data))
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+def test_config_reloads_on_change_and_keeps_last_good(tmp_path):
+    path = tmp_path / "superuser.json"
+    _write(path, {"email": "su@example.com", "password_hash": HASH}, 1_000_000_000)
+    config = SuperuserConfig(path, check_interval=0)
+    assert config.get().matches_email("su@example.com")
+
+    _write(path, {"email": "root@example.com", "password_hash": HASH}, 2_000_000_000)
+    assert config.get().email == "root@example.com"
+
+    _write(path, {"email": "x@example.com", "password_hash": "not-a-hash"}, 3_000_000_000)
+    assert config.get().email == "root@example.com"
+
+def test_config_missing_or_invalid(tmp_path):
+    assert SuperuserConfig(tmp_path / "none.json", check_interval=0).get() is None
+    path = tmp_path / "superuser.json"
+    path.write_text("{")
+    assert SuperuserConfig(path, check_interval=0).get() is None
+
+def test_config_check_is_throttled(tmp_path):
+    path = tmp_path / "superuser.json"
+    _write(path, {"email": "su@example.com", "password_hash": HASH}, 1_000_000_000)
+    config = SuperuserConfig(path, check_interval=3600)
+    config.get()
+    _write(path, {"email": "root@example.com", "password_hash": HASH}, 2_000_000_000)
+    assert config.get().email == "su@example.com"
+
+def test_throttle_refunds_successful_logins():
+    throttle = LoginThrottle(burst=2, refill_sec=60)
+    assert throttle.acquire("1.2.3.4") == 0
+    assert throttle.acquire("1.2.3.4") == 0
+    assert 0 < throttle.acquire("1.2.3.4") <= 60
+    assert throttle.acquire("5.6.7.8") == 0
+    throttle.success("1.2.3.4")
+    assert throttle.acquire("1.2.3.4") == 0
+
+def test_throttle_bounds_clients():
+    throttle = LoginThrottle(burst=1, refill_sec=60, max_clients=2)
+    for client in ("a", "b", "c"):
+        throttle.acquire(client)
+    assert throttle.acquire("a") == 0
+    assert throttle.acquire("c") > 0
+
+def test_concurrent_bad_logins_are_throttled(tmp_path, monkeypatch):
+    from app.api import su
+    path = tmp_path / "superuser.json"
+    _write(path, {"email": "su@example.com", "password_hash": HASH}, 1_000_000_000)
+    monkeypatch.setattr(su, "superuser_config", SuperuserConfig(path, check_interval=0))
+    monkeypatch.setattr(su, "login_throttle", LoginThrottle(burst=3, refill_sec=600))
+    monkeypatch.setattr(su, "password_hasher", PasswordHasher(workers=0, max_queue=32))
+    app = FastAPI()
+    app.include_router(su.router)
+
+    async def guess_all():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(
+                client.post("/login", data={"username": "su@example.com", "password": f"guess{i}"})
+                for i in range(10)
+            ))
+
+    codes = sorted(r.status_code for r in asyncio.run(guess_all()))
+    assert codes == [401] * 3 + [429] * 7
@@ -0,0 +1,30 @@
+from sqlmodel import SQLModel, Session, create_engine
+from app import title_search
+from app.models import Title
+
+def make_db():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    db = Session(engine)
+    for title, author in [("Poesies", "Ausiàs March"), ("La fabricanta", "Dolors Monserdà"), ("Cares i noms", "Jaume Nualart")]:
+        db.add(Title(title=title, author=author, language="ca", duration_sec=1, price_retail=1, currency="EUR"))
+    db.commit()
+    title_search.invalidate()
+    return db
+
+def test_search_is_accent_and_case_insensitive():
+    db = make_db()
+    assert [t["title"] for t in title_search.search_titles(db, "AUSIAS")] == ["Poesies"]
+    assert [t["title"] for t in title_search.search_titles(db, "monserdà fabri")] == ["La fabricanta"]
+    assert title_search.search_titles(db, "zzz") == []
+
+def test_update_is_visible_after_invalidate():
+    db = make_db()
+    assert title_search.search_titles(db, "noms")
+    title = db.get(Title, 3)
+    title.title = "Rostres"
+    db.add(title)
+    db.commit()
+    title_search.invalidate()
+    assert title_search.search_titles(db, "noms") == []
+    assert [t["title"] for t in title_search.search_titles(db, "rostres")] == ["Rostres"]
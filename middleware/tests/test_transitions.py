@@ -0,0 +1,49 @@
+import pytest
+
+def _error(response):
+    return response.status_code, response.json()["detail"]
+
+@pytest.fixture
+def lent_card(client, login, new_cards):
+    """A card claimed by ``owner`` and lent to ``friend``."""
+    _, owner = login()
+    friend_email, friend = login()
+    (qr,) = new_cards(prefix="TR")
+    assert client.post(f"/api/v1/claim/{qr}", headers=owner).status_code == 200
+    assert client.post(f"/api/v1/lend/{qr}", json={"borrower_email": friend_email}, headers=owner).status_code == 200
+    return qr, owner, friend_email, friend
+
+def test_claim_errors(client, login, lent_card):
+    qr, owner, _, friend = lent_card
+    assert _error(client.post("/api/v1/claim/TR-unknown", headers=owner)) == (404, "QR_NOT_FOUND")
+    assert _error(client.post(f"/api/v1/claim/{qr}", headers=owner)) == (400, "ALREADY_CLAIMED")
+    assert _error(client.post(f"/api/v1/claim/{qr}", headers=friend)) == (400, "ALREADY_CLAIMED")
+
+def test_lend_errors(client, login, new_cards, lent_card):
+    qr, owner, friend_email, friend = lent_card
+    other_email, other = login()
+    (unclaimed,) = new_cards(prefix="TR")
+
+    def lend(qr, email, headers):
+        return _error(client.post(f"/api/v1/lend/{qr}", json={"borrower_email": email}, headers=headers))
+
+    assert lend("TR-unknown", friend_email, owner) == (404, "QR_NOT_FOUND")
+    assert lend(qr, other_email, other) == (403, "NOT_OWNER")
+    assert lend(unclaimed, other_email, owner) == (403, "NOT_OWNER")
+    assert lend(qr, other_email, owner) == (400, "ALREADY_LENT")
+    assert lend(qr, "nobody@example.com", owner) == (400, "ALREADY_LENT")
+
+def test_lend_to_an_invalid_borrower(client, login, new_cards):
+    owner_email, owner = login()
+    (qr,) = new_cards(prefix="TR")
+    client.post(f"/api/v1/claim/{qr}", headers=owner)
+    for email in ("nobody@example.com", owner_email):
+        response = client.post(f"/api/v1/lend/{qr}", json={"borrower_email": email}, headers=owner)
+        assert _error(response) == (400, "INVALID_BORROWER")
+
+def test_stop_lend_errors(client, lent_card):
+    qr, owner, _, friend = lent_card
+    assert _error(client.post("/api/v1/abook/TR-unknown/stop-lend", headers=owner)) == (404, "QR_NOT_FOUND")
+    assert _error(client.post(f"/api/v1/abook/{qr}/stop-lend", headers=friend)) == (403, "NOT_OWNER")
+    assert client.post(f"/api/v1/abook/{qr}/stop-lend", headers=owner).status_code == 200
+    assert _error(client.post(f"/api/v1/abook/{qr}/stop-lend", headers=owner)) == (400, "Book is not on loan")
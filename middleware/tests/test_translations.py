@@ -0,0 +1,58 @@
+import json
+import os
+
+from app.translations import TranslationCatalog
+
+def _write(path, text, mtime_ns=None):
+    path.write_text(text, encoding="utf-8")
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+def test_load_and_get(tmp_path):
+    _write(tmp_path / "ca.yml", "errors:\n  NOT_FOUND: No trobat\n")
+    _write(tmp_path / "en.yml", "errors:\n  NOT_FOUND: Not found\n")
+    catalog = TranslationCatalog(tmp_path, check_interval=0)
+    assert catalog.load() == 2
+    entry = catalog.get("ca")
+    assert json.loads(entry.body) == {"NOT_FOUND": "No trobat"}
+    assert entry.etag == catalog.get("ca").etag
+    assert entry.etag != catalog.get("en").etag
+
+def test_reloads_when_file_changes(tmp_path):
+    path = tmp_path / "es.yml"
+    _write(path, "errors:\n  A: uno\n", mtime_ns=1_000_000_000)
+    catalog = TranslationCatalog(tmp_path, check_interval=0)
+    catalog.load()
+    before = catalog.get("es")
+    _write(path, "errors:\n  A: dos\n", mtime_ns=2_000_000_000)
+    after = catalog.get("es")
+    assert after.errors["A"] == "dos"
+    assert after.etag != before.etag
+
+def test_check_is_throttled(tmp_path):
+    path = tmp_path / "ca.yml"
+    _write(path, "errors:\n  A: u\n", mtime_ns=1_000_000_000)
+    catalog = TranslationCatalog(tmp_path, check_interval=3600)
+    catalog.load()
+    _write(path, "errors:\n  A: dos\n", mtime_ns=2_000_000_000)
+    assert catalog.get("ca").errors["A"] == "u"
+
+def test_missing_and_invalid_languages(tmp_path):
+    _write(tmp_path / "ca.yml", "errors: {}\n")
+    catalog = TranslationCatalog(tmp_path, check_interval=0)
+    catalog.load()
+    assert catalog.get("fr") is None
+    assert catalog.get("../ca") is None
+    (tmp_path / "ca.yml").unlink()
+    assert catalog.get("ca") is None
+
+def test_unknown_languages_are_not_remembered(tmp_path):
+    _write(tmp_path / "ca.yml", "errors: {}\n")
+    catalog = TranslationCatalog(tmp_path, check_interval=3600)
+    catalog.load()
+    for i in range(100):
+        assert catalog.get(f"x{i}") is None
+    (tmp_path / "ca.yml").unlink()
+    catalog._checked_at["ca"] = 0
+    assert catalog.get("ca") is None
+    assert catalog._checked_at == {} and catalog._entries == {}
@@ -0,0 +1,40 @@
+from urllib.parse import parse_qsl, urlsplit
+
+from app.url_signer import UrlSigner, parse_keys
+
+def _params(url):
+    return dict(parse_qsl(urlsplit(url).query))
+
+def test_sign_and_verify():
+    signer = UrlSigner({"k1": "secret"}, host="abs.local")
+    signed = signer.sign("QR1", "u1", 3600, now=1000)
+    assert signed.url.startswith("http://abs.local/stream/QR1?")
+    assert signed.expires_at == 4600
+    params = _params(signed.url)
+    assert params["kid"] == "k1" and params["sig"] == signed.signature
+    assert signer.verify_query("QR1", params, now=2000)
+    assert not signer.verify_query("QR2", params, now=2000)
+    assert not signer.verify_query("QR1", {**params, "uid": "u2"}, now=2000)
+    assert not signer.verify_query("QR1", {**params, "exp": "9999"}, now=2000)
+    assert not signer.verify_query("QR1", params, now=5000)
+    assert not signer.verify_query("QR1", {"uid": "u1", "exp": "x"}, now=2000)
+
+def test_rotation_keeps_old_signatures_valid():
+    old = UrlSigner({"k1": "old"})
+    params = _params(old.sign("QR1", "u1", 60, now=0).url)
+    rotated = UrlSigner({"k2": "new", "k1": "old"})
+    assert rotated.active_key_id == "k2"
+    assert rotated.verify_query("QR1", params, now=1)
+    assert not UrlSigner({"k2": "new"}).verify_query("QR1", params, now=1)
+
+def test_parse_keys():
+    assert parse_keys("a:x, b:y", "fallback") == {"a": "x", "b": "y"}
+    assert parse_keys("", "fallback") == {"0": "fallback"}
+    assert parse_keys("bad", "fallback") == {"0": "fallback"}
+
+def test_malformed_signature_is_rejected():
+    signer = UrlSigner({"k": "x"})
+    params = _params(signer.sign("QR1", "u1", 60, now=0).url)
+    for sig in ("é", "", "\udcff", params["sig"] + "é"):
+        assert not signer.verify_query("QR1", {**params, "sig": sig}, now=1)
+    assert not signer.verify_query("QR1", {**params, "sig": None}, now=1)